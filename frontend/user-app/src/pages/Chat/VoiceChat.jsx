@@ -5,6 +5,10 @@ const ChatBot = () => {
   const [showSummary, setShowSummary] = useState(false);
   const [manualMode, setManualMode] = useState(true);
 
+  // 대화 번호: 주소의 ?chatNo= 우선, 없으면 마지막으로 연 대화(localStorage), 기본 1
+  const chatNo = Number(new URLSearchParams(window.location.search).get('chatNo') || localStorage.getItem('chatNo') || 1);
+  const modeKey = `chat:${chatNo}`; // 수동모드 키 — 파이썬 voice_turn.mode_key_for(chat_no)와 같은 값
+
   const [messages, setMessages] = useState([
     {
       text: '아이와 대화를 시작해 보세요.',
@@ -77,13 +81,13 @@ useEffect(() => {
     .catch((err) => console.error("메시지 불러오기 실패:", err));
 
     // ✅ (2) 수동모드 상태 불러오기
-  fetch('/chatbot/mode?key=global')
+  fetch(`/chatbot/mode?key=${encodeURIComponent(modeKey)}`)
     .then((res) => res.json())
     .then((data) => {
       setManualMode(!!data.manual); // 수동모드면 true, 자동이면 false
     })
     .catch((err) => console.error("모드 상태 불러오기 실패:", err));
-}, [baseURL]);
+}, [baseURL, modeKey]);
 
 
   // 모드 변경
@@ -94,7 +98,7 @@ const handleToggleManual = async () => {
     await fetch('/chatbot/mode', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ key: 'global', manual: next }), // key는 파이썬에서 get_manual_mode()에 쓴 그 값
+      body: JSON.stringify({ key: modeKey, manual: next }), // 대화별 키 (파이썬 get_manual_mode()가 조회하는 값)
     });
   } catch (err) {
     console.error('모드 전환 실패:', err);
@@ -169,8 +173,9 @@ const handleSend = async () => {
         content: input,
         mode: 'VOICE',        // ✅ 음성 채팅이므로 VOICE로 고정
         summary: '',          // 필요시 'neutral'
-        userNo: 3,               // ✅ 부모의 user_no
-        chatNo: 1
+        userNo: userNo || 3,  // ✅ 로그인한 부모의 user_no (없으면 부모 기본값 3)
+        chatNo,               // ✅ 이 대화 — 파이썬 세션이 chatNo로 자기 대화의 답장만 받음
+        chatFlag: 'PARENTS',  // ✅ 수동모드에서는 부모로 저장
       }),
     });
 
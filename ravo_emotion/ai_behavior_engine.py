@@ -1,515 +1,2327 @@
-# -*- coding: utf-8 -*-
-"""
-AI 전용: 저장된 영상 -> 행동 타임라인 + 반복 패턴 + 이상행동 필터 -> JSON 리포트
-- 행동 분류: TimeSformer/VideoMAE (Kinetics 계열)
-- 이상 필터: UCF-Crime 파생(Non-Normal = 이상 의심)
-- OpenCV로 프레임 읽어 동일 프레임을 두 모델에 재활용(효율↑)
-"""
-
-import os, json, math
-from dataclasses import dataclass
-from typing import List, Dict, Any, Tuple, Optional
-
-import cv2
-import numpy as np
-import torch
-import torch.nn.functional as F
-from tqdm import tqdm
-
-# 🤗
-from transformers import (
-    AutoImageProcessor,
-    VideoMAEImageProcessor,
-    TimesformerForVideoClassification,
-    VideoMAEForVideoClassification,
-)
-
-# -----------------------------
-# 설정 (필요에 맞게 바꿔도 됨)
-# -----------------------------
-# 행동 분류(일상 동작) 모델
-ACTION_MODEL_ARCH   = "timesformer"  # "timesformer" | "videomae"
-ACTION_MODEL_NAME   = "facebook/timesformer-base-finetuned-k400"   # 또는 "MCG-NJU/videomae-base-finetuned-kinetics"
-
-# 이상행동 필터 모델
-ABNORMAL_MODEL_ARCH = "videomae"
-ABNORMAL_MODEL_NAME = "mitegvg/videomae-base-finetuned-xd-violence"
-
-
-# 샘플링/클립 파라미터
-SAMPLE_FPS   = 10   # 원본에서 다운샘플링할 FPS
-NUM_FRAMES   = 16   # 모델 인퍼런스에 쓸 프레임 수
-STRIDE       = 8    # 윈도우 stride (프레임 단위, 50% overlap)
-
-# 행동 타임라인/플래그 기준
-ACTION_CONF_THRESH    = 0.35
-REPETITION_TARGETS    = {"running", "jumping"}  # 장기 지속 시 플래그할 행동
-REPETITION_MIN_SEC    = 10.0
-# ABNORMAL_PROB_THRESH  = 0.50  # 이상 필터 모델의 임계 확률
-
-# 상단 설정부에 추가/수정 (ai_behavior_engine.py)
-ABNORMAL_PROB_THRESH  = 0.70   # 0.5 → 0.70 권장
-ABNORMAL_MARGIN       = 0.15   # 정상보다 0.15 이상 높을 때만 이상
-ABNORMAL_MIN_CONSEC   = 10   # 연속 3클립(대략 2~3초) 이상일 때만 이벤트로 인정
-
-# Kinetics 라벨을 간단한 코어 라벨로 매핑(휴리스틱)
-COARSE_KEYS = {
-    "walking":  ["walk", "walking"],
-    "running":  ["run", "running", "jogging"],
-    "sitting":  ["sitting", "sit"],
-    "lying":    ["lying", "sleep", "sleeping", "laying"],
-    "jumping":  ["jump", "jumping", "hopping"],
-    "standing": ["standing", "stand"],
-    "playing":  [
-        "playing", "clapping", "throwing", "catching", "dancing",
-        "juggling soccer ball", "kicking soccer ball", "shooting goal (soccer)",
-        "dribbling basketball", "robot dancing", "pumping fist", "skipping rope",
-        "golf putting", "tossing coin", "exercising arm", "stretching arm", "stretching leg",
-        "squat", "lunge", "high kick", "deadlifting", "front raises", "jumpstyle dancing"
-    ]
-
-    
-}
-
-
-# -----------------------------
-# 데이터 구조
-# -----------------------------
-@dataclass
-class ClipPred:
-    t_start: float
-    t_end: float
-    action_topk: List[Tuple[str, float]]
-    action_top1: str
-    action_prob: float
-    coarse: str
-    abnormal_label: str
-    abnormal_prob: float
-    abnormal_flag: bool
-
-@dataclass
-class Event:
-    type: str
-    t_start: float
-    t_end: float
-    avg_conf: float
-
-@dataclass
-class Report:
-    video_path: str
-    duration_sec: float
-    params: Dict[str, Any]
-    clips: List[ClipPred]
-    action_events: List[Event]
-    repetition_flags: List[Event]
-    abnormal_flags: List[Event]
-    summary: Dict[str, Any]
-
-# -----------------------------
-# 유틸
-# -----------------------------
-def _device_dtype():
-    if torch.cuda.is_available():
-        return torch.device("cuda"), torch.float16
-    elif torch.backends.mps.is_available():
-        return torch.device("mps"), torch.float32
-    return torch.device("cpu"), torch.float32
-
-def _read_meta(path) -> Tuple[float, int]:
-    cap = cv2.VideoCapture(path)
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    n   = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-    cap.release()
-    return float(fps), n
-
-def _sample_indices(orig_fps: float, frame_count: int, sample_fps: int) -> List[int]:
-    if sample_fps >= orig_fps:
-        return list(range(frame_count))
-    step = max(1, int(round(orig_fps / sample_fps)))
-    return list(range(0, frame_count, step))
-
-def _make_windows(idxs: List[int], num_frames: int, stride: int) -> List[List[int]]:
-    windows = []
-    for s in range(0, max(0, len(idxs) - num_frames + 1), stride):
-        win = idxs[s:s+num_frames]
-        if len(win) == num_frames:
-            windows.append(win)
-    return windows
-
-def _coarse(label: str) -> str:
-    L = label.lower()
-    for k, keys in COARSE_KEYS.items():
-        if any(x in L for x in keys):
-            return k
-    return "other"
-
-def _group_events(labels: List[str], confs: List[float], starts: List[float], ends: List[float]) -> List[Event]:
-    if not labels: return []
-    res: List[Event] = []
-    cur = labels[0]; cur_s = starts[0]; buf=[confs[0]]
-    for i in range(1, len(labels)):
-        if labels[i] == cur:
-            buf.append(confs[i])
-        else:
-            res.append(Event(cur, cur_s, ends[i-1], float(np.mean(buf))))
-            cur = labels[i]; cur_s = starts[i]; buf=[confs[i]]
-    res.append(Event(cur, cur_s, ends[-1], float(np.mean(buf))))
-    return res
-
-def _summarize(duration: float, action_events: List[Event], rep_flags: List[Event], ab_flags: List[Event]) -> Dict[str, Any]:
-    per_sec = {}
-    for ev in action_events:
-        per_sec.setdefault(ev.type, 0.0)
-        per_sec[ev.type] += (ev.t_end - ev.t_start)
-    total = sum(per_sec.values()) or 1e-6
-    dist = {k: round(v/total, 4) for k, v in per_sec.items()}
-    return {
-        "duration_sec": round(duration, 2),
-        "action_time_sec": {k: round(v,2) for k,v in per_sec.items()},
-        "action_time_ratio": dist,
-        "top_actions": sorted(dist.items(), key=lambda x:x[1], reverse=True)[:5],
-        "repetition_flags_count": len(rep_flags),
-        "abnormal_flags_count": len(ab_flags),
-    }
-
-# -----------------------------
-# 분류기 래퍼
-# -----------------------------
-class VideoClassifier:
-    def __init__(self, arch: str, model_name: str, device: torch.device, dtype: torch.dtype):
-        self.arch = arch
-        self.model_name = model_name
-        self.device = device
-        self.dtype = dtype
-
-        if arch == "timesformer":
-            # ▶▶ 수정 시작: 프로세서 로딩에 베이스 모델 폴백 추가
-            try:
-                # 1차 시도: 대상 레포에서 프로세서 로드 (있으면 사용)
-                self.processor = AutoImageProcessor.from_pretrained(model_name)
-            except Exception as e:
-                print(f"[WARN] Processor not found for {model_name}: {e}")
-                print("[INFO] Fallback to base processor: facebook/timesformer-base-finetuned-k400")
-                # 2차 시도: 베이스 모델 프로세서 사용
-                self.processor = AutoImageProcessor.from_pretrained(
-                    "facebook/timesformer-base-finetuned-k400"
-                )
-            # ▶▶ 수정 끝
-
-            self.model = TimesformerForVideoClassification.from_pretrained(
-                model_name,
-                torch_dtype=(dtype if dtype in (torch.float16, torch.bfloat16) else None)
-            ).to(device).eval()
-            self.id2label = self.model.config.id2label
-
-        elif arch == "videomae":
-            self.processor = VideoMAEImageProcessor.from_pretrained(model_name)
-            self.model = VideoMAEForVideoClassification.from_pretrained(
-                model_name, torch_dtype=(dtype if dtype in (torch.float16, torch.bfloat16) else None)
-            ).to(device).eval()
-            self.id2label = self.model.config.id2label
-        else:
-            raise ValueError("arch must be 'timesformer' or 'videomae'")
-        
-    @torch.inference_mode()
-    def predict(self, frames: List[np.ndarray]) -> List[Tuple[str, float]]:
-        """
-        frames: RGB 이미지 리스트 (길이 = NUM_FRAMES), 각 원소 shape = HxWxC
-        반환: [(label, prob), ...] top-5
-        """
-        # 모델/프로세서별 입력 키워드 다름 → 분기
-        try:
-            if self.arch == "videomae":
-                # VideoMAE 계열은 videos= 를 기대
-                inputs = self.processor(videos=frames, return_tensors="pt")
-            else:
-                # TimeSformer 계열은 images= (또는 위치 인자) 를 기대
-                inputs = self.processor(images=frames, return_tensors="pt")
-        except TypeError:
-            # 일부 버전 호환(위치 인자)
-            inputs = self.processor(frames, return_tensors="pt")
-
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        logits = self.model(**inputs).logits
-        probs = F.softmax(logits, dim=-1)[0].float().cpu().numpy()
-        top_idx = probs.argsort()[-5:][::-1]
-        return [(self.id2label[int(i)], float(probs[int(i)])) for i in top_idx]
-    
-
-    # ai_behavior_engine.py 내 VideoClassifier에 추가
-    @torch.inference_mode()
-    def predict_proba(self, frames: List[np.ndarray]) -> Tuple[np.ndarray, Dict[int, str]]:
-        # frames -> 전체 클래스 확률 벡터 반환
-        try:
-            if self.arch == "videomae":
-                inputs = self.processor(videos=frames, return_tensors="pt")
-            else:
-                inputs = self.processor(images=frames, return_tensors="pt")
-        except TypeError:
-            inputs = self.processor(frames, return_tensors="pt")
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        logits = self.model(**inputs).logits
-        probs = F.softmax(logits, dim=-1)[0].float().cpu().numpy()  # shape: [num_cls]
-        return probs, self.id2label
-
-
-
-
-# -----------------------------
-# 메인 엔진
-# -----------------------------
-class AIBehaviorEngine:
-    def __init__(self,
-                 action_arch: str = ACTION_MODEL_ARCH,
-                 action_model: str = ACTION_MODEL_NAME,
-                 abnormal_arch: str = ABNORMAL_MODEL_ARCH,
-                 abnormal_model: str = ABNORMAL_MODEL_NAME,
-                 sample_fps: int = SAMPLE_FPS,
-                 num_frames: int = NUM_FRAMES,
-                 stride: int = STRIDE,
-                 action_conf_thresh: float = ACTION_CONF_THRESH,
-                 repetition_targets: Optional[set] = None,
-                 repetition_min_sec: float = REPETITION_MIN_SEC,
-                 abnormal_prob_thresh: float = ABNORMAL_PROB_THRESH,
-                 abnormal_margin: float = ABNORMAL_MARGIN,
-                 abnormal_min_consec: int = ABNORMAL_MIN_CONSEC):
-        self.device, self.dtype = _device_dtype()
-        self.action = VideoClassifier(action_arch, action_model, self.device, self.dtype)
-        self.abnorm = VideoClassifier(abnormal_arch, abnormal_model, self.device, self.dtype)
-        self.sample_fps = sample_fps
-        self.num_frames = num_frames
-        self.stride = stride
-        self.action_conf_thresh = action_conf_thresh
-        self.rep_targets = repetition_targets or set(REPETITION_TARGETS)
-        self.rep_min_sec = repetition_min_sec
-        self.ab_thresh = abnormal_prob_thresh
-        self.ab_margin = abnormal_margin
-        self.ab_min_consec = abnormal_min_consec
-
-    @torch.inference_mode()
-    def analyze(self, video_path: str, save_json: Optional[str] = None) -> Report:
-        assert os.path.exists(video_path), f"영상 없음: {video_path}"
-        cap = cv2.VideoCapture(video_path)
-        orig_fps, frame_count = _read_meta(video_path)
-        duration = frame_count / (orig_fps or 1.0)
-
-        # 샘플링 인덱스 & 윈도우
-        samp_idxs = _sample_indices(orig_fps, frame_count, self.sample_fps)
-        windows = _make_windows(samp_idxs, self.num_frames, self.stride)
-
-        # 프레임 캐시
-        cache: Dict[int, np.ndarray] = {}
-        read_ptr = 0
-
-        clips: List[ClipPred] = []
-
-        for win in tqdm(windows, desc="클립 추론"):
-            frames=[]
-            for idx in win:
-                if idx in cache:
-                    frames.append(cache[idx]); continue
-                if idx < read_ptr:
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-                    read_ptr = idx
-                while read_ptr <= idx:
-                    ok, bgr = cap.read()
-                    if not ok: break
-                    if read_ptr == idx:
-                        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-                        cache[idx] = rgb; frames.append(rgb)
-                    read_ptr += 1
-            if len(frames) != self.num_frames:
-                continue
-
-            t0 = win[0] / (orig_fps or 1.0)
-            t1 = win[-1] / (orig_fps or 1.0)
-
-            # 행동 예측
-            a_topk = self.action.predict(frames)
-            a_label, a_prob = a_topk[0]
-            coarse = _coarse(a_label)
-            if a_prob < self.action_conf_thresh:
-                coarse = "other"
-
-            # 이상 필터
-            # 교체:
-            # # analyze()의 이상 판정 부분 교체
-            b_probs, id2label = self.abnorm.predict_proba(frames)
-            labels = [id2label[i].lower() for i in range(len(id2label))]
-
-            violence_idx = None; normal_idx = None
-            for i, L in enumerate(labels):
-                if any(k in L for k in ["violence","abnormal","fight","assault","aggression"]):
-                    violence_idx = i
-                if any(k in L for k in ["non","normal","benign"]):
-                    normal_idx = i
-            if violence_idx is None and len(labels) == 2: violence_idx = 1
-            if normal_idx  is None and len(labels) == 2: normal_idx  = 0
-
-            p_ab = float(b_probs[violence_idx]) if violence_idx is not None else float(b_probs.max())
-            p_nm = float(b_probs[normal_idx])  if normal_idx  is not None else 1.0 - p_ab
-
-            ab_flag = (p_ab >= self.ab_thresh) and ((p_ab - p_nm) >= self.ab_margin)
-
-            b_label = id2label[int(np.argmax(b_probs))]
-            b_prob  = p_ab  # 보고/평균 계산은 "이상 확률"로
-
-
-
-
-
-
-            # b_probs, id2label = self.abnorm.predict_proba(frames)
-            # labels = [id2label[i].lower() for i in range(len(id2label))]
-
-            # # violence/abnormal 쪽 인덱스 추정
-            # violence_idx = None
-            # normal_idx = None
-            # for i, L in enumerate(labels):
-            #     if any(k in L for k in ["violence", "abnormal", "fight", "assault", "aggression"]):
-            #         violence_idx = i
-            #     if any(k in L for k in ["non", "normal", "benign"]):
-            #         normal_idx = i
-
-            # # 이진모델 대응: 라벨명이 애매하면 관례적으로 idx=1을 폭력으로 가정(많은 이진모델 관례)
-            # if violence_idx is None and len(labels) == 2:
-            #     violence_idx = 1
-            # if normal_idx is None and len(labels) == 2:
-            #     normal_idx = 0
-
-            # p_ab = float(b_probs[violence_idx]) if violence_idx is not None else float(b_probs.max())
-            # p_nm = float(b_probs[normal_idx]) if normal_idx is not None else 1.0 - p_ab
-
-            # ab_flag = (p_ab >= self.ab_thresh) and (p_ab > p_nm)
-            # b_label = id2label[int(np.argmax(b_probs))]
-            # b_prob  = p_ab  # 보고용으로는 "비정상 확률"을 기록
-
-            # b_topk = self.abnorm.predict(frames)
-            # b_label, b_prob = b_topk[0]
-            # Normal 판단 규칙(모델별 라벨 편차 대응)
-            # lower = b_label.lower()
-            # is_normal = ("normal" == lower) or ("normal videos" in lower)
-            # ab_flag = (not is_normal) and (b_prob >= self.ab_thresh)
-            # def _is_normal_label(lbl: str) -> bool:
-            #     l = lbl.lower()
-            #     normal_keys = [
-            #       "normal", "normal videos",   # UCF-Crime 류
-            #       "non-violence", "nonviolence", "no violence",  # XD-Violence 류
-            #       "benign"
-            #     ]
-            #     return any(k in l for k in normal_keys)
-
-            # is_normal = _is_normal_label(b_label)
-            # ab_flag = (not is_normal) and (b_prob >= self.ab_thresh)
-
-            
-
-            clips.append(ClipPred(
-                t_start=round(t0,2), t_end=round(t1,2),
-                action_topk=[(l, round(p,4)) for l,p in a_topk],
-                action_top1=a_label, action_prob=float(round(a_prob,4)),
-                coarse=coarse,
-                abnormal_label=b_label, abnormal_prob=float(round(b_prob,4)),
-                abnormal_flag=bool(ab_flag)
-            ))
-
-        cap.release()
-
-
-
-        # 행동 이벤트 병합
-        act_labels = [c.coarse for c in clips]
-        act_confs  = [c.action_prob for c in clips]
-        starts     = [c.t_start for c in clips]
-        ends       = [c.t_end for c in clips]
-        action_events = _group_events(act_labels, act_confs, starts, ends)
-
-        # 반복행동 플래그(장기 지속)
-        repetition_flags = [ev for ev in action_events
-                            if ev.type in self.rep_targets and (ev.t_end - ev.t_start) >= self.rep_min_sec]
-
-        # 이상행동 플래그(클립→병합)
-        # ab_labels = []; ab_confs=[]; ab_starts=[]; ab_ends=[]
-        # for c in clips:
-        #     if c.abnormal_flag:
-        #         ab_labels.append("abnormal"); ab_confs.append(c.abnormal_prob)
-        #         ab_starts.append(c.t_start);  ab_ends.append(c.t_end)
-        # abnormal_flags = _group_events(ab_labels, ab_confs, ab_starts, ab_ends)
-
-        # === (기존) 반복행동 플래그 계산 바로 아래에 넣기 ===
-        # 이상행동 플래그(연속 길이 필터 적용: run-length encoding)
-        flags  = [c.abnormal_flag for c in clips]
-        starts = [c.t_start for c in clips]
-        ends   = [c.t_end   for c in clips]
-
-        abnormal_flags = []
-        i = 0
-        while i < len(flags):
-            if not flags[i]:
-                i += 1
-                continue
-        j = i
-        buf_conf = []
-        while j < len(flags) and flags[j]:
-            buf_conf.append(clips[j].abnormal_prob)
-        j += 1
-        # 연속 길이 조건 충족 시에만 이벤트로 등록
-        if (j - i) >= self.ab_min_consec:
-            abnormal_flags.append(
-                Event("abnormal", starts[i], ends[j-1], float(np.mean(buf_conf)))
-            )
-        i = j
-
-
-        summary = _summarize(duration, action_events, repetition_flags, abnormal_flags)
-
-        report = Report(
-            video_path=os.path.abspath(video_path),
-            duration_sec=round(duration,2),
-            params={
-                "action_model": f"{self.action.model_name} ({self.action.arch})",
-                "abnormal_model": f"{self.abnorm.model_name} ({self.abnorm.arch})",
-                "sample_fps": self.sample_fps,
-                "num_frames": self.num_frames,
-                "stride": self.stride,
-                "action_conf_thresh": self.action_conf_thresh,
-                "repetition_targets": list(self.rep_targets),
-                "repetition_min_sec": self.rep_min_sec,
-                "abnormal_prob_thresh": self.ab_thresh
-            },
-            clips=clips,
-            action_events=action_events,
-            repetition_flags=repetition_flags,
-            abnormal_flags=abnormal_flags,
-            summary=summary
-        )
-
-        if save_json:
-            os.makedirs(os.path.dirname(os.path.abspath(save_json)) or ".", exist_ok=True)
-            def ev2d(e: Event): return {"type":e.type,"t_start":round(e.t_start,2),"t_end":round(e.t_end,2),"avg_conf":round(e.avg_conf,4)}
-            payload = {
-                "video_path": report.video_path,
-                "duration_sec": report.duration_sec,
-                "params": report.params,
-                "clips": [c.__dict__ for c in report.clips],
-                "action_events": [ev2d(e) for e in report.action_events],
-                "repetition_flags": [ev2d(e) for e in report.repetition_flags],
-                "abnormal_flags": [ev2d(e) for e in report.abnormal_flags],
-                "summary": report.summary
-            }
-            with open(save_json, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
-
-        return report
-
-# 간단 실행 예시(직접 실행 시)
-if __name__ == "__main__":
-    import argparse, pprint
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--video", required=True, help="분석할 MP4 경로")
-    ap.add_argument("--out", default="report.json", help="JSON 저장 경로")
-    args = ap.parse_args()
-    eng = AIBehaviorEngine()
-    rep = eng.analyze(args.video, save_json=args.out)
-    pprint.pp(rep.summary)
-    print(f"[OK] JSON 저장 → {os.path.abspath(args.out)}")
+# -*- coding: utf-8 -*-
+"""
+AI 전용: 저장된 영상 -> 행동 타임라인 + 반복 패턴 + 이상행동 필터 -> JSON 리포트
+- 행동 분류: TimeSformer/VideoMAE (Kinetics 계열)
+- 이상 필터: UCF-Crime 파생(Non-Normal = 이상 의심)
+- OpenCV로 프레임 읽어 동일 프레임을 두 모델에 재활용(효율↑)
+"""
+
+import os, json, math, threading, queue, time, hashlib, contextlib
+from collections import OrderedDict, deque
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Tuple, Optional, Callable
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from tqdm import tqdm
+
+# 🤗
+from transformers import (
+    AutoImageProcessor,
+    VideoMAEImageProcessor,
+    TimesformerForVideoClassification,
+    VideoMAEForVideoClassification,
+)
+
+# -----------------------------
+# 설정 (필요에 맞게 바꿔도 됨)
+# -----------------------------
+# 행동 분류(일상 동작) 모델
+ACTION_MODEL_ARCH   = "timesformer"  # "timesformer" | "videomae"
+ACTION_MODEL_NAME   = "facebook/timesformer-base-finetuned-k400"   # 또는 "MCG-NJU/videomae-base-finetuned-kinetics"
+
+# 이상행동 필터 모델
+ABNORMAL_MODEL_ARCH = "videomae"
+ABNORMAL_MODEL_NAME = "mitegvg/videomae-base-finetuned-xd-violence"
+
+
+# 샘플링/클립 파라미터
+SAMPLE_FPS   = 10   # 원본에서 다운샘플링할 FPS
+NUM_FRAMES   = 16   # 모델 인퍼런스에 쓸 프레임 수
+STRIDE       = 8    # 윈도우 stride (프레임 단위, 50% overlap)
+BATCH_SIZE   = 4    # 한 번에 모델에 넣을 윈도우 수 (1이면 윈도우별 단건 추론)
+SHARED_PREPROCESS = True  # 프레임 단위 전처리 캐시 사용 (False면 모델마다 HF processor 호출)
+FRAME_CACHE_MB    = 512   # 디코딩 프레임 버퍼 메모리 상한(MB)
+DECODE_RESIZE     = False # 디코딩 직후 모델 입력 해상도(짧은 변)로 축소 (INTER_AREA라 HF 전처리와 픽셀값이 달라짐 → 켜기 전 --drift-check --decode-resize로 확인)
+THREADED_READER   = False # 별도 스레드에서 프레임 미리 디코딩
+READER_PREFETCH   = 32    # 스레드 리더 큐 크기(프레임 수)
+PIPELINE          = True  # 디코딩(생산자 스레드) / 추론(소비자) 분리
+PIPELINE_DEPTH    = 8     # 준비된 윈도우 대기열 크기 (가득 차면 디코딩 스레드 대기)
+
+# 모델 레지스트리: 프로세스 안의 엔진/스레드가 같은 모델 객체를 공유 (엔진마다 from_pretrained 반복 안 함)
+SHARED_MODELS     = True
+
+# 윈도우별 원시 확률 캐시 (임계값만 바꿔 재분석할 때 모델 재실행 생략). None이면 사용 안 함
+PRED_CACHE_DIR    = os.getenv("RAVO_PRED_CACHE_DIR")
+
+# 모션 게이트: 움직임 없는 윈도우(빈 방 등)는 두 모델을 건너뛰고 "static"(coarse=other) 클립으로 처리
+MOTION_GATE       = False
+MOTION_SIZE       = 96     # 프레임 차분 계산 해상도(짧은 변)
+MOTION_PIXEL_DIFF = 15     # 이 값(0~255) 이상 밝기가 바뀐 픽셀 = 움직임
+MOTION_THRESH     = 0.002  # 윈도우 내 연속 프레임 쌍 중 최대 "움직인 픽셀 비율"이 이보다 작으면 정적
+
+# 이상 필터 온디맨드: 대상 윈도우에서만, 희소 stride로 먼저 돌리고 이상 플래그 주변만 촘촘히 추론
+ABNORMAL_ON_DEMAND     = False
+ABNORMAL_SPARSE_STRIDE = 4      # 윈도우 번호가 이 배수인 곳만 먼저 추론 (ABNORMAL_MIN_CONSEC 이하로 자동 제한)
+ABNORMAL_TRIGGERS      = {"other", "running", "jumping", "playing"}  # 이 coarse 행동이면 대상
+ABNORMAL_LOW_CONF      = 0.50   # 행동 top-1 확률이 이보다 낮으면(애매) 대상
+ABNORMAL_MOTION_MIN    = 0.02   # 움직인 픽셀 비율(MotionGate.energy)이 이 이상이면 대상
+
+# 적응형 윈도우: STRIDE*ADAPTIVE_FACTOR 간격으로 먼저 훑고, 행동 라벨이 바뀌거나 이상 확률이 튀는 구간만 STRIDE로 촘촘히
+ADAPTIVE_STRIDE          = False
+ADAPTIVE_FACTOR          = 4     # 거친 stride 배수
+ADAPTIVE_ABNORMAL_SPIKE  = 0.50  # 거친 윈도우 이상 확률이 이 값(또는 ABNORMAL_PROB_THRESH 중 작은 쪽) 이상이면 촘촘히
+READER_SEEK_GAP          = 300   # 정밀 패스 리더: 다음 필요 프레임이 이만큼(원본 프레임) 떨어져 있으면 grab 대신 seek
+
+# CPU 추론 백엔드 (GPU 없는 서버용). "eager" | "int8" | "compile" | "torchscript", "+"로 조합 (예: "int8+torchscript")
+CPU_BACKEND       = os.getenv("RAVO_CPU_BACKEND", "eager")
+CPU_THREADS       = None  # torch intra-op 스레드 수 (None이면 torch 기본값)
+# 백엔드 정확도 드리프트 허용치 (fp32 eager 대비, 샘플 영상 기준)
+DRIFT_MAX_PROB    = 0.05  # 클래스 확률 최대 절대 오차
+DRIFT_MIN_TOP1    = 0.95  # 행동 top-1 일치율 하한
+
+# 성능 계측: 폴더를 지정하면 analyze마다 torch.profiler trace(chrome://tracing 형식)를 저장하고 상위 연산을 리포트에 요약
+PROFILE_DIR       = os.getenv("RAVO_PROFILE_DIR")
+PROFILE_TOP_OPS   = 15    # 리포트 timings.profile에 남길 연산 수 (self CPU 시간 순)
+
+# 스트리밍(라이브 홈캠) 모드
+STREAM_BATCH_SIZE   = 1     # 라이브는 지연이 우선 → 윈도우 나오는 즉시 추론
+STREAM_POLL_SEC     = 0.5   # 커지는 파일(follow) 모드에서 새 프레임 확인 간격
+STREAM_IDLE_TIMEOUT = 10.0  # follow 모드에서 이 시간 동안 새 프레임 없으면 종료
+
+# 행동 타임라인/플래그 기준
+ACTION_CONF_THRESH    = 0.35
+REPETITION_TARGETS    = {"running", "jumping"}  # 장기 지속 시 플래그할 행동
+REPETITION_MIN_SEC    = 10.0
+# ABNORMAL_PROB_THRESH  = 0.50  # 이상 필터 모델의 임계 확률
+
+# 상단 설정부에 추가/수정 (ai_behavior_engine.py)
+ABNORMAL_PROB_THRESH  = 0.70   # 0.5 → 0.70 권장
+ABNORMAL_MARGIN       = 0.15   # 정상보다 0.15 이상 높을 때만 이상
+ABNORMAL_MIN_CONSEC   = 10   # 연속 3클립(대략 2~3초) 이상일 때만 이벤트로 인정
+
+# Kinetics 라벨을 간단한 코어 라벨로 매핑(휴리스틱)
+COARSE_KEYS = {
+    "walking":  ["walk", "walking"],
+    "running":  ["run", "running", "jogging"],
+    "sitting":  ["sitting", "sit"],
+    "lying":    ["lying", "sleep", "sleeping", "laying"],
+    "jumping":  ["jump", "jumping", "hopping"],
+    "standing": ["standing", "stand"],
+    "playing":  [
+        "playing", "clapping", "throwing", "catching", "dancing",
+        "juggling soccer ball", "kicking soccer ball", "shooting goal (soccer)",
+        "dribbling basketball", "robot dancing", "pumping fist", "skipping rope",
+        "golf putting", "tossing coin", "exercising arm", "stretching arm", "stretching leg",
+        "squat", "lunge", "high kick", "deadlifting", "front raises", "jumpstyle dancing"
+    ]
+
+    
+}
+
+
+# -----------------------------
+# 데이터 구조
+# -----------------------------
+@dataclass
+class ClipPred:
+    t_start: float
+    t_end: float
+    action_topk: List[Tuple[str, float]]
+    action_top1: str
+    action_prob: float
+    coarse: str
+    abnormal_label: str
+    abnormal_prob: float
+    abnormal_flag: bool
+
+@dataclass
+class Event:
+    type: str
+    t_start: float
+    t_end: float
+    avg_conf: float
+
+@dataclass
+class Report:
+    video_path: str
+    duration_sec: float
+    params: Dict[str, Any]
+    clips: List[ClipPred]
+    action_events: List[Event]
+    repetition_flags: List[Event]
+    abnormal_flags: List[Event]
+    summary: Dict[str, Any]
+    # 단계별 wall/CPU/호출 수 (StageTimer.detail) + 전체 시간, 프로파일 요약. 예전 리포트는 빈 dict
+    timings: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class WindowPreds:
+    """윈도우별 원시 모델 출력 (임계값/후처리와 무관한 부분)"""
+    orig_fps: float
+    win_first: np.ndarray        # [W] 윈도우 첫 프레임 인덱스
+    win_last: np.ndarray         # [W] 윈도우 마지막 프레임 인덱스
+    a_probs: np.ndarray          # [W, num_action_cls]
+    b_probs: np.ndarray          # [W, num_abnormal_cls]
+    action_labels: List[str]     # id2label 순서
+    abnormal_labels: List[str]
+    gated: Optional[np.ndarray] = None  # [W] bool, 모션 게이트로 추론 생략된 윈도우 (확률 행은 0)
+    b_done: Optional[np.ndarray] = None # [W] bool, 이상 모델을 실제로 돌린 윈도우 (None = 전부)
+    filled: Optional[np.ndarray] = None # [W] bool, 적응형 윈도우에서 추론 없이 가까운 윈도우 값으로 채운 것
+
+# -----------------------------
+# 유틸
+# -----------------------------
+def _device_dtype():
+    if torch.cuda.is_available():
+        return torch.device("cuda"), torch.float16
+    elif torch.backends.mps.is_available():
+        return torch.device("mps"), torch.float32
+    return torch.device("cpu"), torch.float32
+
+def _read_meta(path) -> Tuple[float, int]:
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    n   = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    return float(fps), n
+
+def _sample_indices(orig_fps: float, frame_count: int, sample_fps: int) -> List[int]:
+    if sample_fps >= orig_fps:
+        return list(range(frame_count))
+    step = max(1, int(round(orig_fps / sample_fps)))
+    return list(range(0, frame_count, step))
+
+def _make_windows(idxs: List[int], num_frames: int, stride: int) -> List[List[int]]:
+    windows = []
+    for s in range(0, max(0, len(idxs) - num_frames + 1), stride):
+        win = idxs[s:s+num_frames]
+        if len(win) == num_frames:
+            windows.append(win)
+    return windows
+
+def _coarse(label: str) -> str:
+    L = label.lower()
+    for k, keys in COARSE_KEYS.items():
+        if any(x in L for x in keys):
+            return k
+    return "other"
+
+COARSE_LABELS = list(COARSE_KEYS) + ["other"]   # coarse 라벨 ↔ 정수 코드
+
+# 이상 필터 라벨 판별 키워드 (모델별 라벨 편차 대응)
+ABNORMAL_LABEL_KEYS = ["violence", "abnormal", "fight", "assault", "aggression"]
+NORMAL_LABEL_KEYS   = ["non", "normal", "benign"]
+
+def _abnormal_indices(labels: List[str]) -> Tuple[Optional[int], Optional[int]]:
+    """이상 필터 라벨 목록 → (이상 클래스 idx, 정상 클래스 idx)"""
+    labels = [l.lower() for l in labels]
+    violence_idx = None; normal_idx = None
+    for i, L in enumerate(labels):
+        if any(k in L for k in ABNORMAL_LABEL_KEYS):
+            violence_idx = i
+        if any(k in L for k in NORMAL_LABEL_KEYS):
+            normal_idx = i
+    # 이진모델 대응: 라벨명이 애매하면 관례적으로 idx=1을 폭력으로 가정
+    if violence_idx is None and len(labels) == 2: violence_idx = 1
+    if normal_idx  is None and len(labels) == 2: normal_idx  = 0
+    return violence_idx, normal_idx
+
+def _abnormal_pn(b: np.ndarray, labels: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """이상 필터 확률 행렬 [N, C] → (이상 확률, 정상 확률) float64"""
+    b = b.astype(np.float64)
+    v_idx, n_idx = _abnormal_indices(labels)
+    p_ab = b[:, v_idx] if v_idx is not None else b.max(axis=1)
+    p_nm = b[:, n_idx] if n_idx is not None else 1.0 - p_ab
+    return p_ab, p_nm
+
+class AbnormalScheduler:
+    """
+    이상 모델 온디맨드 스케줄 (윈도우 번호만 다룸, 프레임/추론은 엔진 담당)
+    - 윈도우 번호가 stride 배수인 "희소 지점" 중 대상(eligible)인 것만 먼저 추론
+    - 양옆 희소 지점 중 하나라도 이상 플래그면 그 사이 대상 윈도우를 전부 추론(densify)
+    stride <= ab_min_consec 이면 그 길이 이상의 연속 구간은 반드시 희소 지점을 포함하고, 구간 안 모든 윈도우는
+    양옆 희소 지점 중 하나가 구간 안에 있음 → 대상 윈도우 전수 추론과 같은 run 검출
+    사용: add() → sampled() 추론 후 set_flag() → resolve() 추론 … 마지막에 finish()
+    """
+    def __init__(self, stride: int):
+        self.stride = max(1, int(stride))
+        self._elig: Dict[int, bool] = {}
+        self._flag: Dict[int, bool] = {}   # 희소 지점 플래그 (대상 아님 = False)
+        self._asked: set = set()
+        self._lo = 0                       # 아직 확정 안 된 첫 윈도우
+        self._prev_flag = False            # 직전 희소 지점 플래그
+        self.eligible = 0; self.sparse = 0; self.dense = 0
+
+    def add(self, i: int, eligible: bool):
+        self._elig[i] = eligible
+        self.eligible += int(eligible)
+        if i % self.stride == 0 and not eligible:
+            self._flag[i] = False
+
+    def sampled(self) -> List[int]:
+        """지금 추론해야 할 희소 지점 (결과는 set_flag로)"""
+        out = sorted(i for i, e in self._elig.items() if e and i % self.stride == 0 and i not in self._asked)
+        self._asked.update(out)
+        self.sparse += len(out)
+        return out
+
+    def set_flag(self, i: int, flag: bool):
+        self._flag[i] = bool(flag)
+
+    def resolve(self) -> List[int]:
+        """양옆 희소 지점이 확정된 구간들 → densify로 추론할 윈도우"""
+        out: List[int] = []
+        j = self._lo
+        while True:
+            s = -(-j // self.stride) * self.stride  # j 이상 첫 희소 지점
+            if s not in self._flag or any(x not in self._elig for x in range(j, s)):
+                break
+            if self._prev_flag or self._flag[s]:
+                out.extend(x for x in range(j, s) if self._elig[x])
+            for x in range(j, s + 1):
+                self._elig.pop(x, None); self._asked.discard(x)
+            self._prev_flag = self._flag.pop(s)
+            j = s + 1
+        self._lo = j
+        self.dense += len(out)
+        return out
+
+    def finish(self) -> List[int]:
+        """영상 끝: 마지막 희소 지점 뒤 남은 윈도우 (직전 지점이 이상일 때만)"""
+        out = self.resolve()
+        tail = sorted(x for x, e in self._elig.items() if e and x >= self._lo) if self._prev_flag else []
+        self._elig.clear()
+        self.dense += len(tail)
+        return out + tail
+
+    @property
+    def resolved_before(self) -> int:
+        """이 번호 이전 윈도우는 추론 여부가 확정됨"""
+        return self._lo
+
+    def stats(self) -> Dict[str, int]:
+        return {"stride": self.stride, "eligible": self.eligible, "sparse": self.sparse, "densified": self.dense}
+
+def _topk(probs: np.ndarray, id2label: Dict[int, str], k: int = 5) -> List[Tuple[str, float]]:
+    top_idx = probs.argsort()[-k:][::-1]
+    return [(id2label[int(i)], float(probs[int(i)])) for i in top_idx]
+
+def _runs(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """같은 값이 이어지는 구간(run-length) → (시작 idx, 끝 idx(포함))"""
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    change = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    run_s = np.concatenate(([0], change))
+    run_e = np.concatenate((change - 1, [n - 1]))
+    return run_s, run_e
+
+def _group_events_arr(codes: np.ndarray, confs: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                      names: List[str]) -> Tuple[List[Event], np.ndarray, np.ndarray]:
+    """라벨 코드 타임라인 → 연속 구간 이벤트 (+ 이벤트별 코드, 지속시간 배열)"""
+    run_s, run_e = _runs(codes)
+    if len(run_s) == 0:
+        return [], np.zeros(0, np.int64), np.zeros(0, np.float64)
+    means = np.add.reduceat(np.asarray(confs, np.float64), run_s) / (run_e - run_s + 1)
+    ev_codes = codes[run_s]
+    ev_s, ev_e = starts[run_s], ends[run_e]
+    events = [Event(names[c], t0, t1, m) for c, t0, t1, m in
+              zip(ev_codes.tolist(), ev_s.tolist(), ev_e.tolist(), means.tolist())]
+    return events, ev_codes, ev_e - ev_s
+
+def _group_events(labels: List[str], confs: List[float], starts: List[float], ends: List[float]) -> List[Event]:
+    if not len(labels): return []
+    names, codes = np.unique(np.asarray(labels), return_inverse=True)
+    events, _, _ = _group_events_arr(codes, np.asarray(confs), np.asarray(starts), np.asarray(ends), names.tolist())
+    return events
+
+def _abnormal_runs(flags: np.ndarray, probs: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                   min_consec: int) -> List[Event]:
+    """이상 플래그가 min_consec 클립 이상 연속된 구간만 이벤트로 (run-length encoding)"""
+    edge = np.diff(np.concatenate(([0], flags.astype(np.int8), [0])))
+    run_s = np.flatnonzero(edge == 1)
+    run_e = np.flatnonzero(edge == -1)            # 구간 끝 다음 idx
+    keep = (run_e - run_s) >= max(1, min_consec)
+    run_s, run_e = run_s[keep], run_e[keep]
+    if len(run_s) == 0:
+        return []
+    # 구간별 합은 reduceat로 (전체 누적합 차이는 긴 타임라인에서 오차가 커짐)
+    p = np.concatenate((np.asarray(probs, np.float64), [0.0]))
+    means = np.add.reduceat(p, np.stack((run_s, run_e), axis=1).ravel())[::2] / (run_e - run_s)
+    return [Event("abnormal", t0, t1, m) for t0, t1, m in
+            zip(starts[run_s].tolist(), ends[run_e - 1].tolist(), means.tolist())]
+
+def _action_time(ev_codes: np.ndarray, ev_dur: np.ndarray, names: List[str]) -> Dict[str, float]:
+    """이벤트 타입별 총 시간. 키 순서 = 타입이 처음 나온 순서"""
+    if len(ev_codes) == 0:
+        return {}
+    uniq, first = np.unique(ev_codes, return_index=True)
+    order = uniq[np.argsort(first)]
+    sums = np.bincount(ev_codes, weights=ev_dur, minlength=len(names))
+    return {names[c]: float(sums[c]) for c in order.tolist()}
+
+def _summarize(duration: float, action_events: List[Event], rep_flags: List[Event], ab_flags: List[Event],
+               per_sec: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """per_sec(타입별 총 시간)를 넘기면 이벤트 목록 재순회 없이 사용"""
+    if per_sec is None:
+        names, codes = np.unique(np.asarray([ev.type for ev in action_events], dtype=str), return_inverse=True)
+        dur = np.asarray([ev.t_end - ev.t_start for ev in action_events], np.float64)
+        per_sec = _action_time(codes, dur, names.tolist())
+    total = sum(per_sec.values()) or 1e-6
+    dist = {k: round(v/total, 4) for k, v in per_sec.items()}
+    return {
+        "duration_sec": round(duration, 2),
+        "action_time_sec": {k: round(v,2) for k,v in per_sec.items()},
+        "action_time_ratio": dist,
+        "top_actions": sorted(dist.items(), key=lambda x:x[1], reverse=True)[:5],
+        "repetition_flags_count": len(rep_flags),
+        "abnormal_flags_count": len(ab_flags),
+    }
+
+@dataclass
+class ClipArrays:
+    """클립 타임라인을 열 단위 NumPy 배열로 보관 (후처리는 전부 배열 연산)"""
+    t_start: np.ndarray       # [N] float64 (소수 2자리)
+    t_end: np.ndarray
+    top_idx: np.ndarray       # [N, k] 행동 top-k 클래스 idx
+    top_prob: np.ndarray      # [N, k] (소수 4자리)
+    action_prob: np.ndarray   # [N] top-1 확률 (소수 4자리)
+    coarse: np.ndarray        # [N] COARSE_LABELS 코드
+    ab_label: np.ndarray      # [N] 이상 필터 argmax 클래스 idx
+    ab_prob: np.ndarray       # [N] 이상 확률 (소수 4자리)
+    ab_flag: np.ndarray       # [N] bool
+    gated: np.ndarray         # [N] bool, 모션 게이트로 추론 생략
+    ab_done: np.ndarray       # [N] bool, 이상 모델 실행 여부
+    action_labels: List[str]
+    abnormal_labels: List[str]
+
+    def to_clips(self, lo: int = 0, hi: Optional[int] = None) -> List[ClipPred]:
+        """[lo:hi] 구간 클립을 ClipPred로"""
+        a_names, b_names = self.action_labels, self.abnormal_labels
+        sl = slice(lo, hi)
+        return [
+            ClipPred(t_start=t0, t_end=t1, action_topk=[], action_top1="static", action_prob=0.0,
+                     coarse="other", abnormal_label="static", abnormal_prob=0.0, abnormal_flag=False)
+            if g else
+            ClipPred(t_start=t0, t_end=t1,
+                     action_topk=[(a_names[i], p) for i, p in zip(ti, tp)],
+                     action_top1=a_names[ti[0]], action_prob=ap,
+                     coarse=COARSE_LABELS[c],
+                     abnormal_label=b_names[bl] if bd else "skipped", abnormal_prob=bp, abnormal_flag=bf)
+            for t0, t1, ti, tp, ap, c, bl, bp, bf, g, bd in zip(
+                self.t_start[sl].tolist(), self.t_end[sl].tolist(), self.top_idx[sl].tolist(),
+                self.top_prob[sl].tolist(), self.action_prob[sl].tolist(), self.coarse[sl].tolist(),
+                self.ab_label[sl].tolist(), self.ab_prob[sl].tolist(), self.ab_flag[sl].tolist(),
+                self.gated[sl].tolist(), self.ab_done[sl].tolist())
+        ]
+
+class ClipList(Sequence):
+    """
+    ClipArrays를 ClipPred 목록처럼 읽기 (len/인덱스/순회) — ClipPred는 읽는 부분만 그때그때 생성
+    JSON 스트리밍 저장 시 Report.clips로 사용 (긴 영상의 ClipPred 수십만 개를 한꺼번에 만들지 않음)
+    """
+    CHUNK = 1024
+
+    def __init__(self, ca: ClipArrays):
+        self.arrays = ca
+
+    def __len__(self) -> int:
+        return len(self.arrays.t_start)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            lo, hi, step = i.indices(len(self))
+            return self.arrays.to_clips(lo, hi) if step == 1 else [self[j] for j in range(lo, hi, step)]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        return self.arrays.to_clips(i, i + 1)[0]
+
+    def __iter__(self):
+        for lo in range(0, len(self), self.CHUNK):
+            yield from self.arrays.to_clips(lo, lo + self.CHUNK)
+
+class OnlineEventTracker:
+    """
+    ClipPred를 시간순으로 하나씩 받아 이벤트를 온라인으로 확정 (_group_events + 이상 run-length 의 스트리밍 버전)
+    update()/finish() 반환: 새로 확정된 (kind, Event) 리스트
+      - "action_event"   : coarse 라벨이 바뀌어 닫힌 행동 구간
+      - "repetition_flag": 닫힌 행동 구간 중 반복 대상 + 최소 지속시간 충족
+      - "abnormal_alert" : 진행 중인 이상 구간이 ab_min_consec 클립에 처음 도달한 순간 (즉시 알림용)
+      - "abnormal_flag"  : 닫힌 이상 구간 (ab_min_consec 이상만)
+    """
+    def __init__(self, rep_targets: set, rep_min_sec: float, ab_min_consec: int):
+        self.rep_targets = rep_targets
+        self.rep_min_sec = rep_min_sec
+        self.ab_min_consec = ab_min_consec
+        self._act: Optional[list] = None  # [label, t_start, t_end, confs]
+        self._ab: Optional[list] = None   # [t_start, t_end, probs, alerted]
+
+    def _close_action(self) -> List[Tuple[str, Event]]:
+        label, t0, t1, confs = self._act
+        self._act = None
+        ev = Event(label, t0, t1, float(np.mean(confs)))
+        out = [("action_event", ev)]
+        if label in self.rep_targets and (t1 - t0) >= self.rep_min_sec:
+            out.append(("repetition_flag", ev))
+        return out
+
+    def _close_abnormal(self) -> List[Tuple[str, Event]]:
+        t0, t1, probs, _ = self._ab
+        self._ab = None
+        if len(probs) >= self.ab_min_consec:
+            return [("abnormal_flag", Event("abnormal", t0, t1, float(np.mean(probs))))]
+        return []
+
+    def update(self, c: ClipPred) -> List[Tuple[str, Event]]:
+        out: List[Tuple[str, Event]] = []
+        if self._act is not None and self._act[0] == c.coarse:
+            self._act[2] = c.t_end; self._act[3].append(c.action_prob)
+        else:
+            if self._act is not None:
+                out += self._close_action()
+            self._act = [c.coarse, c.t_start, c.t_end, [c.action_prob]]
+
+        if c.abnormal_flag:
+            if self._ab is None:
+                self._ab = [c.t_start, c.t_end, [c.abnormal_prob], False]
+            else:
+                self._ab[1] = c.t_end; self._ab[2].append(c.abnormal_prob)
+            t0, t1, probs, alerted = self._ab
+            if not alerted and len(probs) >= self.ab_min_consec:
+                self._ab[3] = True
+                out.append(("abnormal_alert", Event("abnormal", t0, t1, float(np.mean(probs)))))
+        elif self._ab is not None:
+            out += self._close_abnormal()
+        return out
+
+    def finish(self) -> List[Tuple[str, Event]]:
+        out: List[Tuple[str, Event]] = []
+        if self._act is not None:
+            out += self._close_action()
+        if self._ab is not None:
+            out += self._close_abnormal()
+        return out
+
+def _peak_rss_mb() -> Optional[float]:
+    """프로세스 최대 RSS(MB). resource 모듈 없는 OS(Windows)면 None"""
+    try:
+        import resource, sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # mac은 byte, linux는 KB
+    except Exception:
+        return None
+
+class _Stage:
+    """StageTimer.stage() 컨텍스트 (프레임 단위 호출도 있어서 객체 하나로 재사용)"""
+    __slots__ = ("timer", "name", "t0", "c0", "rf")
+
+    def __init__(self, timer: "StageTimer", name: str):
+        self.timer, self.name, self.rf = timer, name, None
+
+    def __enter__(self):
+        if self.timer.profiling:
+            self.rf = torch.profiler.record_function(self.name)
+            self.rf.__enter__()
+        self.t0, self.c0 = time.perf_counter(), time.thread_time()
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.t0, time.thread_time() - self.c0)
+        if self.rf is not None:
+            self.rf.__exit__(*exc)
+            self.rf = None
+
+class StageTimer:
+    """
+    단계별 누적 시간. 생산자/소비자 스레드가 함께 기록하므로 lock 사용
+    - wall(perf_counter) / cpu(그 단계를 실행한 스레드의 CPU 시간) / 호출 횟수
+    - "decode.grab"처럼 "."이 들어간 이름은 하위 단계 (상위 단계 시간에 이미 포함됨)
+    - profiling=True면 단계마다 torch.profiler.record_function → 프로파일 trace에 단계 이름 표시
+    """
+    def __init__(self, profiling: bool = False):
+        self._lock = threading.Lock()
+        self.profiling = profiling
+        self.sec: Dict[str, float] = {}
+        self.cpu: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self._stages: Dict[Tuple[int, str], _Stage] = {}
+
+    def add(self, name: str, sec: float, cpu: float = 0.0, calls: int = 1):
+        with self._lock:
+            self.sec[name] = self.sec.get(name, 0.0) + sec
+            self.cpu[name] = self.cpu.get(name, 0.0) + cpu
+            self.calls[name] = self.calls.get(name, 0) + calls
+
+    def stage(self, name: str) -> _Stage:
+        # 같은 이름이라도 스레드마다 따로 (생산자/소비자가 동시에 같은 단계를 잴 수 있음)
+        key = (threading.get_ident(), name)
+        st = self._stages.get(key)
+        if st is None:
+            st = self._stages.setdefault(key, _Stage(self, name))
+        return st
+
+    def as_dict(self) -> Dict[str, float]:
+        """최상위 단계 wall 시간(초) — 기존 params["timings"] 형식"""
+        with self._lock:
+            return {k: round(v, 4) for k, v in self.sec.items() if "." not in k}
+
+    def detail(self) -> Dict[str, Dict[str, Any]]:
+        """단계별 {wall_sec, cpu_sec, calls} (하위 단계 포함, 이름순)"""
+        with self._lock:
+            return {k: {"wall_sec": round(self.sec[k], 4), "cpu_sec": round(self.cpu[k], 4),
+                        "calls": self.calls[k]} for k in sorted(self.sec)}
+
+def _new_profiler():
+    """analyze 전체를 감싸는 torch.profiler (CUDA 있으면 GPU 커널도)"""
+    acts = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        acts.append(torch.profiler.ProfilerActivity.CUDA)
+    return torch.profiler.profile(activities=acts, record_shapes=False)
+
+def _profile_summary(prof, out_dir: str, video_path: str) -> Dict[str, Any]:
+    """프로파일 결과 → chrome trace 파일 저장 + self CPU 시간 상위 연산 요약"""
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    trace = os.path.join(out_dir, f"{stem}.{time.strftime('%Y%m%d-%H%M%S')}.{os.getpid()}.trace.json")
+    prof.export_chrome_trace(trace)
+    ops = sorted(prof.key_averages(), key=lambda e: e.self_cpu_time_total, reverse=True)[:PROFILE_TOP_OPS]
+    return {"trace": os.path.abspath(trace),
+            "top_ops": [{"name": e.key, "calls": e.count, "self_cpu_ms": round(e.self_cpu_time_total / 1000, 3),
+                         "cpu_total_ms": round(e.cpu_time_total / 1000, 3)} for e in ops]}
+
+def format_timings(timings: Dict[str, Any], top: int = 6) -> str:
+    """report.timings → 한 줄 요약 (로그용). 최상위 단계만 wall 시간 큰 순"""
+    stages = {k: v for k, v in timings.get("stages", {}).items() if "." not in k and k != "inference_wall"}
+    parts = [f"{k} {v['wall_sec']:.2f}s" for k, v in
+             sorted(stages.items(), key=lambda kv: kv[1]["wall_sec"], reverse=True)[:top]]
+    return (f"총 {timings.get('total_wall_sec', 0.0):.2f}s (CPU {timings.get('total_cpu_sec', 0.0):.2f}s) | "
+            + " · ".join(parts))
+
+class _Prefetcher:
+    """
+    제너레이터를 별도 스레드에서 돌려 bounded queue로 넘겨줌
+    - 큐가 가득 차면 생산자 대기(backpressure)
+    - 생산자 예외는 소비자 쪽에서 그대로 다시 raise
+    - 소비자가 중간에 멈추면(close) 생산자도 stop 이벤트로 종료
+    """
+    _END = object()
+
+    def __init__(self, gen_fn, maxsize: int, name: str = "prefetch"):
+        self._gen_fn = gen_fn
+        self._q: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.put_wait = 0.0   # 생산자가 큐 자리를 기다린 시간
+        self.get_wait = 0.0   # 소비자가 데이터를 기다린 시간
+
+    def _put(self, item) -> bool:
+        t0 = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self._q.put(item, timeout=0.1)
+                self.put_wait += time.perf_counter() - t0
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        gen = self._gen_fn()
+        try:
+            for item in gen:
+                if not self._put(item):
+                    return
+            self._put(self._END)
+        except BaseException as e:
+            self._put(e)
+        finally:
+            gen.close()
+
+    def __iter__(self):
+        self._thread.start()
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = self._q.get()
+                self.get_wait += time.perf_counter() - t0
+                if item is self._END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        # 큐를 비워서 put 대기 중인 생산자를 풀어줌
+        while True:
+            try:
+                self._q.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+# -----------------------------
+# 디코딩 (샘플 프레임만 retrieve)
+# -----------------------------
+def _shrink_to_short(bgr: np.ndarray, short: Optional[int]) -> np.ndarray:
+    """짧은 변이 short보다 크면 그 크기로 축소 (확대는 안 함)"""
+    if not short:
+        return bgr
+    h, w = bgr.shape[:2]
+    if min(h, w) <= short:
+        return bgr
+    if h <= w:
+        nh, nw = short, int(short * w / h)
+    else:
+        nh, nw = int(short * h / w), short
+    return cv2.resize(bgr, (nw, nh), interpolation=cv2.INTER_AREA)
+
+class SampledFrameReader:
+    """
+    샘플 인덱스만 골라 디코딩하는 순차 리더 → (idx, RGB) 순서대로 yield
+    - 건너뛰는 프레임은 grab()만 (BGR 버퍼 복사/색변환 생략), 샘플 프레임만 retrieve()
+    - resize_short: 디코딩 직후 축소 → 색변환/캐시/전처리 모두 작은 프레임으로 처리
+    - threaded: 디코딩을 별도 스레드에서 미리 수행 (HW 디코더와 무관한 순수 스레드 리더)
+    - timer: decode.seek / decode.grab(건너뛰기) / decode.retrieve(샘플 디코딩) / decode.color(축소+색변환) 기록
+    """
+    def __init__(self, video_path: str, idxs: List[int], resize_short: Optional[int] = None,
+                 threaded: bool = False, prefetch: int = READER_PREFETCH, seek_gap: Optional[int] = None,
+                 timer: Optional[StageTimer] = None):
+        self.video_path = video_path
+        self.idxs = list(idxs)
+        self.resize_short = resize_short
+        self.seek_gap = seek_gap  # None이면 항상 grab으로 건너뜀
+        self.threaded = threaded
+        self.prefetch = max(1, prefetch)
+        self.grabbed = 0     # grab만 한(건너뛴) 프레임 수
+        self.retrieved = 0   # 실제 디코딩 결과를 꺼낸 프레임 수
+        self.seeks = 0       # seek으로 건너뛴 횟수
+        self.timer = timer or StageTimer()
+        self._seek_cap = None
+        self._prefetcher: Optional[_Prefetcher] = None
+
+    def _convert(self, bgr: np.ndarray) -> np.ndarray:
+        with self.timer.stage("decode.color"):
+            return cv2.cvtColor(_shrink_to_short(bgr, self.resize_short), cv2.COLOR_BGR2RGB)
+
+    def _iter_sync(self):
+        cap = cv2.VideoCapture(self.video_path)
+        t_seek, t_grab, t_retr = (self.timer.stage(n) for n in ("decode.seek", "decode.grab", "decode.retrieve"))
+        try:
+            pos = 0
+            for idx in self.idxs:
+                if self.seek_gap is not None and idx - pos > self.seek_gap:
+                    with t_seek:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+                    self.seeks += 1
+                    pos = idx
+                if pos < idx:
+                    with t_grab:
+                        while pos < idx:
+                            if not cap.grab():
+                                return
+                            self.grabbed += 1
+                            pos += 1
+                with t_retr:
+                    if not cap.grab():
+                        return
+                    ok, bgr = cap.retrieve()
+                pos += 1
+                if not ok:
+                    return
+                self.retrieved += 1
+                yield idx, self._convert(bgr)
+        finally:
+            cap.release()
+
+    def __iter__(self):
+        if not self.threaded:
+            yield from self._iter_sync()
+            return
+        self._prefetcher = _Prefetcher(self._iter_sync, self.prefetch, name="frame-reader")
+        yield from self._prefetcher
+
+    def read_at(self, idx: int) -> Optional[np.ndarray]:
+        """임의 위치 프레임 1장 (버퍼 상한으로 밀려난 프레임 재디코딩용, 별도 캡처 사용)"""
+        if self._seek_cap is None:
+            self._seek_cap = cv2.VideoCapture(self.video_path)
+        with self.timer.stage("decode.reseek"):
+            self._seek_cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            ok, bgr = self._seek_cap.read()
+        return self._convert(bgr) if ok else None
+
+    def close(self):
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+        if self._seek_cap is not None:
+            self._seek_cap.release()
+            self._seek_cap = None
+
+def _iter_stream_frames(source, step: int, resize_short: Optional[int],
+                        follow: bool, poll_sec: float, idle_timeout: float):
+    """
+    스트림 소스 → 샘플 프레임 (frame_idx, RGB)
+    - str/int: cv2.VideoCapture (파일·RTSP·카메라). follow=True면 커지는 파일을 끝에서 기다렸다 이어 읽음
+    - 그 외 iterable: RGB 프레임 또는 프레임 리스트(chunk)를 차례로 넘겨받음
+    """
+    if isinstance(source, (str, int)):
+        cap = cv2.VideoCapture(source)
+        pos = 0
+        idle_since = None
+        try:
+            while True:
+                if not cap.grab():
+                    if not follow:
+                        return
+                    # 파일 끝: 잠시 후 다시 열고 마지막 위치부터 재시도
+                    idle_since = idle_since or time.monotonic()
+                    if time.monotonic() - idle_since >= idle_timeout:
+                        return
+                    time.sleep(poll_sec)
+                    cap.release()
+                    cap = cv2.VideoCapture(source)
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+                    continue
+                idle_since = None
+                if pos % step == 0:
+                    ok, bgr = cap.retrieve()
+                    if ok:
+                        yield pos, cv2.cvtColor(_shrink_to_short(bgr, resize_short), cv2.COLOR_BGR2RGB)
+                pos += 1
+        finally:
+            cap.release()
+    else:
+        pos = 0
+        for item in source:
+            chunk = item if isinstance(item, (list, tuple)) else [item]
+            for rgb in chunk:
+                if pos % step == 0:
+                    yield pos, _shrink_to_short(rgb, resize_short)
+                pos += 1
+
+# -----------------------------
+# 디코딩 프레임 버퍼
+# -----------------------------
+class FrameBuffer:
+    """
+    디코딩된 RGB 프레임 슬라이딩 버퍼 (프레임 인덱스 키)
+    - 윈도우는 시간순 → 다음 윈도우 시작 이전 프레임은 evict_before로 제거
+    - max_bytes 초과 시 오래된 프레임부터 강제 제거 (다시 필요하면 seek 후 재디코딩)
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self._frames: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self.nbytes = 0
+        self.peak_bytes = 0
+        self.peak_frames = 0
+        self.evicted = 0
+        self.forced_evictions = 0
+
+    def __contains__(self, idx: int) -> bool:
+        return idx in self._frames
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def get(self, idx: int) -> np.ndarray:
+        return self._frames[idx]
+
+    def put(self, idx: int, frame: np.ndarray):
+        if idx in self._frames:
+            return
+        # 상한 넘으면 가장 오래된 것부터 제거 (최소 1장은 유지)
+        while self._frames and self.nbytes + frame.nbytes > self.max_bytes:
+            self._pop_oldest()
+            self.forced_evictions += 1
+        self._frames[idx] = frame
+        self.nbytes += frame.nbytes
+        self.peak_bytes = max(self.peak_bytes, self.nbytes)
+        self.peak_frames = max(self.peak_frames, len(self._frames))
+
+    def _pop_oldest(self):
+        _, fr = self._frames.popitem(last=False)
+        self.nbytes -= fr.nbytes
+        self.evicted += 1
+
+    def evict_before(self, idx: int):
+        """idx 미만 프레임 제거 (삽입 순서 = 프레임 순서)"""
+        while self._frames and next(iter(self._frames)) < idx:
+            self._pop_oldest()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cap_mb": round(self.max_bytes / 2**20, 1),
+            "peak_mb": round(self.peak_bytes / 2**20, 1),
+            "peak_frames": self.peak_frames,
+            "evicted": self.evicted,
+            "forced_evictions": self.forced_evictions,
+        }
+
+# -----------------------------
+# 공유 전처리 (프레임 단위 캐시)
+# -----------------------------
+@dataclass(frozen=True)
+class PreprocSpec:
+    """VideoMAEImageProcessor 계열 설정 중 프레임별 연산에 필요한 값만 추린 것"""
+    short_edge: int
+    crop_h: int
+    crop_w: int
+    rescale: float
+    mean: Tuple[float, ...]
+    std: Tuple[float, ...]
+    resample: int = Image.BILINEAR
+
+    @property
+    def geometry(self) -> Tuple[int, int, int]:
+        return (self.short_edge, self.crop_h, self.crop_w)
+
+def _preproc_spec(processor) -> Optional[PreprocSpec]:
+    """
+    HF processor 설정 → PreprocSpec
+    resize(shortest_edge) → center crop → rescale → normalize 조합만 재현 가능. 그 외엔 None(HF 경로 유지)
+    """
+    size = getattr(processor, "size", None) or {}
+    crop = getattr(processor, "crop_size", None) or {}
+    if not (getattr(processor, "do_resize", False) and getattr(processor, "do_center_crop", False)):
+        return None
+    if "shortest_edge" not in size or "height" not in crop or "width" not in crop:
+        return None
+    short, ch, cw = int(size["shortest_edge"]), int(crop["height"]), int(crop["width"])
+    if ch > short or cw > short:
+        return None  # 크롭이 리사이즈 결과보다 크면 HF는 패딩 → 재현 안 함
+    rescale = float(processor.rescale_factor) if getattr(processor, "do_rescale", False) else 1.0
+    if getattr(processor, "do_normalize", False):
+        mean = tuple(float(x) for x in processor.image_mean)
+        std  = tuple(float(x) for x in processor.image_std)
+    else:
+        mean, std = (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+    resample = int(getattr(processor, "resample", Image.BILINEAR))
+    return PreprocSpec(short, ch, cw, rescale, mean, std, resample)
+
+def _resize_crop(rgb: np.ndarray, spec: PreprocSpec) -> np.ndarray:
+    """짧은 변을 short_edge로 맞추고 가운데 crop → uint8 HxWxC (HF와 같은 PIL 리사이즈)"""
+    h, w = rgb.shape[:2]
+    if h <= w:
+        nh, nw = spec.short_edge, int(spec.short_edge * w / h)
+    else:
+        nh, nw = int(spec.short_edge * h / w), spec.short_edge
+    if (nh, nw) != (h, w):
+        rgb = np.asarray(Image.fromarray(rgb).resize((nw, nh), resample=spec.resample))
+    top, left = (nh - spec.crop_h) // 2, (nw - spec.crop_w) // 2
+    return np.ascontiguousarray(rgb[top:top + spec.crop_h, left:left + spec.crop_w])
+
+def _normalize(u8: np.ndarray, spec: PreprocSpec) -> np.ndarray:
+    """uint8 HxWxC → float32 CxHxW (rescale + normalize)"""
+    x = u8.astype(np.float32) * spec.rescale
+    x = (x - np.asarray(spec.mean, np.float32)) / np.asarray(spec.std, np.float32)
+    return x.transpose(2, 0, 1)
+
+class FrameTensorCache:
+    """
+    샘플 프레임 전처리 결과를 프레임 인덱스 키로 보관
+    - u8 : resize+crop 끝난 uint8 (기하 설정이 같은 모델끼리 공유)
+    - f32: normalize까지 끝난 float32 CxHxW (스펙이 같은 모델끼리 공유)
+    50% overlap 윈도우에서 같은 프레임은 한 번만 전처리됨
+    """
+    def __init__(self):
+        self._u8: Dict[Tuple[int, int, int], Dict[int, np.ndarray]] = {}
+        self._f32: Dict[PreprocSpec, Dict[int, np.ndarray]] = {}
+
+    def _get_u8(self, idx: int, rgb: np.ndarray, spec: PreprocSpec) -> np.ndarray:
+        store = self._u8.setdefault(spec.geometry, {})
+        if idx not in store:
+            store[idx] = _resize_crop(rgb, spec)
+        return store[idx]
+
+    def _get_f32(self, idx: int, rgb: np.ndarray, spec: PreprocSpec) -> np.ndarray:
+        store = self._f32.setdefault(spec, {})
+        if idx not in store:
+            store[idx] = _normalize(self._get_u8(idx, rgb, spec), spec)
+        return store[idx]
+
+    def pixel_values(self, wins: List[List[int]], frames_batch: List[List[np.ndarray]],
+                     spec: PreprocSpec) -> torch.Tensor:
+        """윈도우 B개 → [B, T, C, H, W] float32"""
+        arr = np.stack([
+            np.stack([self._get_f32(idx, rgb, spec) for idx, rgb in zip(win, frames)])
+            for win, frames in zip(wins, frames_batch)
+        ])
+        return torch.from_numpy(arr)
+
+    def evict_before(self, idx: int):
+        """idx 이전 프레임 제거 (윈도우는 시간순이라 다시 쓰이지 않음)"""
+        for stores in (self._u8, self._f32):
+            for store in stores.values():
+                for k in [k for k in store if k < idx]:
+                    del store[k]
+
+class MotionGate:
+    """
+    프레임 차분 기반 저비용 움직임 판정 (모델 앞단 게이트)
+    프레임별 축소 흑백 이미지와 연속 샘플 프레임 쌍의 "움직인 픽셀 비율"을 캐시 → 겹치는 윈도우에서 재계산 없음
+    """
+    def __init__(self, thresh: float = MOTION_THRESH, pixel_diff: int = MOTION_PIXEL_DIFF, size: int = MOTION_SIZE):
+        self.thresh = thresh
+        self.pixel_diff = pixel_diff
+        self.size = size
+        self._gray: Dict[int, np.ndarray] = {}
+        self._diff: Dict[Tuple[int, int], float] = {}
+
+    def _get_gray(self, idx: int, rgb: np.ndarray) -> np.ndarray:
+        if idx not in self._gray:
+            g = cv2.cvtColor(_shrink_to_short(rgb, self.size), cv2.COLOR_RGB2GRAY)
+            self._gray[idx] = cv2.GaussianBlur(g, (5, 5), 0)  # 센서 노이즈 억제
+        return self._gray[idx]
+
+    def energy(self, win: List[int], frames: List[np.ndarray]) -> float:
+        """윈도우 움직임 = 연속 프레임 쌍별 움직인 픽셀 비율의 최대값"""
+        e = 0.0
+        for (i0, f0), (i1, f1) in zip(zip(win, frames), zip(win[1:], frames[1:])):
+            key = (i0, i1)
+            if key not in self._diff:
+                d = cv2.absdiff(self._get_gray(i0, f0), self._get_gray(i1, f1))
+                self._diff[key] = float(np.count_nonzero(d >= self.pixel_diff)) / d.size
+            e = max(e, self._diff[key])
+        return e
+
+    def is_static(self, win: List[int], frames: List[np.ndarray]) -> bool:
+        return self.energy(win, frames) < self.thresh
+
+    def evict_before(self, idx: int):
+        for k in [k for k in self._gray if k < idx]:
+            del self._gray[k]
+        for k in [k for k in self._diff if k[0] < idx]:
+            del self._diff[k]
+
+# -----------------------------
+# 예측 캐시 (디스크, 내용 주소 기반)
+# -----------------------------
+_SHA_MEMO: Dict[Tuple[str, int, float], str] = {}
+
+def _file_sha256(path: str, chunk: int = 4 * 2**20) -> str:
+    """영상 내용 해시. 같은 프로세스에선 (경로, 크기, mtime) 기준으로 재사용"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    if memo_key not in _SHA_MEMO:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(chunk), b""):
+                h.update(block)
+        _SHA_MEMO[memo_key] = h.hexdigest()
+    return _SHA_MEMO[memo_key]
+
+class PredictionCache:
+    """
+    윈도우별 원시 확률 벡터를 .npz 로 보관
+    키 = 영상 내용 해시 + 모델 이름 + 샘플링 설정 → 임계값(ABNORMAL_*, ACTION_CONF_THRESH, REPETITION_MIN_SEC)을
+    바꿔 다시 돌릴 때는 모델 없이 후처리만 수행
+    """
+    VERSION = 1
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, video_path: str, params: Dict[str, Any]) -> str:
+        h = hashlib.sha256()
+        h.update(_file_sha256(video_path).encode())
+        h.update(json.dumps({"v": self.VERSION, **params}, sort_keys=True).encode())
+        return h.hexdigest()[:32]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.npz")
+
+    def load(self, key: str) -> Optional[WindowPreds]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                return WindowPreds(
+                    orig_fps=float(z["orig_fps"]),
+                    win_first=z["win_first"], win_last=z["win_last"],
+                    a_probs=z["a_probs"], b_probs=z["b_probs"],
+                    action_labels=[str(x) for x in z["action_labels"]],
+                    abnormal_labels=[str(x) for x in z["abnormal_labels"]],
+                    gated=z["gated"] if "gated" in z.files else None,
+                    b_done=z["b_done"] if "b_done" in z.files else None,
+                    filled=z["filled"] if "filled" in z.files else None,
+                )
+        except Exception as e:
+            print(f"[WARN] 예측 캐시 손상, 무시: {path}: {e}")
+            return None
+
+    def save(self, key: str, preds: WindowPreds):
+        # 임시 파일에 쓰고 교체 → 워커 여러 개가 같은 키를 써도 깨진 파일이 안 보임
+        tmp = self._path(key) + f".{os.getpid()}.tmp.npz"
+        np.savez(tmp, orig_fps=np.float64(preds.orig_fps),
+                 win_first=preds.win_first, win_last=preds.win_last,
+                 a_probs=preds.a_probs, b_probs=preds.b_probs,
+                 action_labels=np.array(preds.action_labels), abnormal_labels=np.array(preds.abnormal_labels),
+                 **({"gated": preds.gated} if preds.gated is not None else {}),
+                 **({"b_done": preds.b_done} if preds.b_done is not None else {}),
+                 **({"filled": preds.filled} if preds.filled is not None else {}))
+        os.replace(tmp, self._path(key))
+
+# -----------------------------
+# 분류기 래퍼
+# -----------------------------
+CPU_BACKENDS = ("eager", "int8", "compile", "torchscript")
+
+def _parse_backend(backend: Optional[str]) -> List[str]:
+    """"int8+torchscript" → ["int8", "torchscript"] (eager는 빈 리스트)"""
+    opts = [p.strip().lower() for p in (backend or "eager").split("+") if p.strip()]
+    bad = [p for p in opts if p not in CPU_BACKENDS]
+    if bad:
+        raise ValueError(f"unknown cpu backend {bad} (choose from {CPU_BACKENDS})")
+    if "compile" in opts and "torchscript" in opts:
+        raise ValueError("cpu backend: compile과 torchscript는 함께 쓸 수 없음")
+    return [p for p in CPU_BACKENDS if p in opts and p != "eager"]
+
+def _quantizable_linears(model: torch.nn.Module) -> set:
+    """
+    동적 양자화할 Linear 모듈 이름들
+    VideoMAE(qkv_bias) attention은 query/key/value의 .weight를 직접 F.linear에 넘김 → 양자화하면 깨지므로 제외
+    """
+    skip = set()
+    for name, mod in model.named_modules():
+        if getattr(mod, "q_bias", None) is not None:
+            skip.update(f"{name}.{c}" for c in ("query", "key", "value"))
+    return {name for name, mod in model.named_modules()
+            if isinstance(mod, torch.nn.Linear) and name not in skip}
+
+class _LogitsOnly(torch.nn.Module):
+    """HF 모델 출력(ModelOutput) → logits 텐서만 (TorchScript trace용)"""
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model(pixel_values=pixel_values).logits
+
+class VideoClassifier:
+    def __init__(self, arch: str, model_name: str, device: torch.device, dtype: torch.dtype,
+                 backend: Optional[str] = None):
+        self.arch = arch
+        self.model_name = model_name
+        self.device = device
+        self.dtype = dtype
+
+        if arch == "timesformer":
+            # ▶▶ 수정 시작: 프로세서 로딩에 베이스 모델 폴백 추가
+            try:
+                # 1차 시도: 대상 레포에서 프로세서 로드 (있으면 사용)
+                self.processor = AutoImageProcessor.from_pretrained(model_name)
+            except Exception as e:
+                print(f"[WARN] Processor not found for {model_name}: {e}")
+                print("[INFO] Fallback to base processor: facebook/timesformer-base-finetuned-k400")
+                # 2차 시도: 베이스 모델 프로세서 사용
+                self.processor = AutoImageProcessor.from_pretrained(
+                    "facebook/timesformer-base-finetuned-k400"
+                )
+            # ▶▶ 수정 끝
+
+            self.model = TimesformerForVideoClassification.from_pretrained(
+                model_name,
+                torch_dtype=(dtype if dtype in (torch.float16, torch.bfloat16) else None)
+            ).to(device).eval()
+            self.id2label = self.model.config.id2label
+
+        elif arch == "videomae":
+            self.processor = VideoMAEImageProcessor.from_pretrained(model_name)
+            self.model = VideoMAEForVideoClassification.from_pretrained(
+                model_name, torch_dtype=(dtype if dtype in (torch.float16, torch.bfloat16) else None)
+            ).to(device).eval()
+            self.id2label = self.model.config.id2label
+        else:
+            raise ValueError("arch must be 'timesformer' or 'videomae'")
+
+        # 공유 전처리로 재현 가능한 processor면 스펙 보관 (None이면 항상 HF processor 사용)
+        self.spec = _preproc_spec(self.processor)
+
+        # CPU 백엔드 (GPU에선 무시)
+        self.backend = "eager"
+        self._compiled = None
+        self._traced: Dict[Tuple[int, ...], torch.jit.ScriptModule] = {}
+        self._trace_lock = threading.Lock()  # 레지스트리로 공유될 때 같은 shape를 두 스레드가 동시에 trace하지 않게
+        opts = _parse_backend(backend)
+        if opts and device.type != "cpu":
+            print(f"[WARN] cpu backend '{backend}' ignored on {device.type}")
+        elif opts:
+            self._apply_cpu_backend(opts)
+
+    def _apply_cpu_backend(self, opts: List[str]):
+        if "int8" in opts:
+            # Linear 가중치만 int8 동적 양자화 (ViT 계열 연산량 대부분이 Linear, 활성값은 실행 시 양자화)
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, _quantizable_linears(self.model),
+                                                                dtype=torch.qint8)
+        if "compile" in opts:
+            self._compiled = torch.compile(self.model)
+        # torchscript: 입력 shape별로 첫 호출 때 trace (_logits)
+        self.backend = "+".join(opts)
+
+    def _logits(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        if "torchscript" in self.backend:
+            key = tuple(pixel_values.shape)
+            fn = self._traced.get(key)
+            if fn is None:
+                with self._trace_lock:
+                    fn = self._traced.get(key)
+                    if fn is None:
+                        # trace는 inference tensor를 못 다룸 → no_grad로 1회 기록 후 freeze
+                        with torch.inference_mode(False), torch.no_grad():
+                            fn = torch.jit.freeze(torch.jit.trace(_LogitsOnly(self.model).eval(),
+                                                                  pixel_values.clone(), check_trace=False))
+                        self._traced[key] = fn
+            return fn(pixel_values)
+        model = self._compiled if self._compiled is not None else self.model
+        return model(pixel_values=pixel_values).logits
+
+    def _inputs(self, clips: List[List[np.ndarray]]) -> Dict[str, torch.Tensor]:
+        """
+        clips: 윈도우(프레임 리스트) 여러 개 → processor 한 번으로 [B, T, C, H, W] 배치 생성
+        """
+        # 모델/프로세서별 입력 키워드 다름 → 분기
+        try:
+            if self.arch == "videomae":
+                # VideoMAE 계열은 videos= 를 기대
+                inputs = self.processor(videos=clips, return_tensors="pt")
+            else:
+                # TimeSformer 계열은 images= (또는 위치 인자) 를 기대
+                inputs = self.processor(images=clips, return_tensors="pt")
+        except TypeError:
+            # 일부 버전 호환(위치 인자)
+            inputs = self.processor(clips, return_tensors="pt")
+        return {k: v.to(self.device) for k, v in inputs.items()}
+
+    def topk(self, probs: np.ndarray, k: int = 5) -> List[Tuple[str, float]]:
+        return _topk(probs, self.id2label, k)
+
+    @torch.inference_mode()
+    def predict_proba_batch(self, clips: List[List[np.ndarray]]) -> np.ndarray:
+        """
+        clips: 윈도우 B개 (각각 길이 = NUM_FRAMES 의 RGB 프레임 리스트)
+        반환: 클래스 확률 행렬, shape = [B, num_cls] (행 순서 = 입력 순서)
+        """
+        logits = self._logits(self._inputs(clips)["pixel_values"])
+        return F.softmax(logits, dim=-1).float().cpu().numpy()
+
+    @torch.inference_mode()
+    def predict_proba_pixels(self, pixel_values: torch.Tensor) -> np.ndarray:
+        """
+        이미 전처리된 [B, T, C, H, W] 텐서로 추론 (processor 생략)
+        반환: shape = [B, num_cls]
+        """
+        pixel_values = pixel_values.to(self.device, dtype=self.model.dtype)
+        logits = self._logits(pixel_values)
+        return F.softmax(logits, dim=-1).float().cpu().numpy()
+
+    @torch.inference_mode()
+    def predict(self, frames: List[np.ndarray]) -> List[Tuple[str, float]]:
+        """
+        frames: RGB 이미지 리스트 (길이 = NUM_FRAMES), 각 원소 shape = HxWxC
+        반환: [(label, prob), ...] top-5
+        """
+        return self.topk(self.predict_proba_batch([frames])[0])
+
+    # ai_behavior_engine.py 내 VideoClassifier에 추가
+    @torch.inference_mode()
+    def predict_proba(self, frames: List[np.ndarray]) -> Tuple[np.ndarray, Dict[int, str]]:
+        # frames -> 전체 클래스 확률 벡터 반환
+        probs = self.predict_proba_batch([frames])[0]  # shape: [num_cls]
+        return probs, self.id2label
+
+
+class ModelRegistry:
+    """
+    프로세스 전역 VideoClassifier 레지스트리: (arch, model_name, device, dtype, backend)당 1번만 로드
+    - 엔진/스레드끼리 같은 객체 공유 (추론은 inference_mode + 읽기 전용이라 상태 없음)
+    - 같은 키를 여러 스레드가 동시에 요청하면 하나만 로드하고 나머지는 기다렸다 같은 객체를 받음
+    - backend도 키에 포함: int8/compile은 모델 객체 자체가 달라짐
+      (실제 적용되는 값 기준 — GPU에선 VideoClassifier가 무시하고 eager → warmup의 clf.backend와 같은 키)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple, VideoClassifier] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._info: Dict[Tuple, Dict[str, Any]] = {}
+
+    @staticmethod
+    def key(arch: str, model_name: str, device: torch.device, dtype: torch.dtype,
+            backend: Optional[str] = None) -> Tuple:
+        device = torch.device(device)
+        opts = _parse_backend(backend) if device.type == "cpu" else []
+        return (arch, model_name, str(device), str(dtype), "+".join(opts) or "eager")
+
+    def get(self, arch: str, model_name: str, device: torch.device, dtype: torch.dtype,
+            backend: Optional[str] = None) -> Tuple[VideoClassifier, bool]:
+        """(모델, 이미 로드돼 있었는지)"""
+        key = self.key(arch, model_name, device, dtype, backend)
+        with self._lock:
+            clf = self._models.get(key)
+            if clf is not None:
+                return clf, True
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                clf = self._models.get(key)
+            if clf is not None:
+                return clf, True
+            t0 = time.perf_counter()
+            clf = VideoClassifier(arch, model_name, device, dtype, backend=backend)
+            with self._lock:
+                self._models[key] = clf
+                self._info[key] = {"load_sec": round(time.perf_counter() - t0, 3), "warmup_sec": None}
+            return clf, False
+
+    def warmup(self, clf: VideoClassifier, num_frames: int = NUM_FRAMES, batch_size: int = 1) -> float:
+        """더미 배치 1회 추론 (첫 호출의 커널 선택/메모리 할당/trace 비용을 미리 치름). 걸린 시간(초)"""
+        frames = [np.zeros((224, 224, 3), np.uint8)] * num_frames
+        t0 = time.perf_counter()
+        with torch.inference_mode():
+            clf.predict_proba_batch([frames] * max(1, batch_size))
+        sec = round(time.perf_counter() - t0, 3)
+        key = self.key(clf.arch, clf.model_name, clf.device, clf.dtype, clf.backend)
+        with self._lock:
+            if key in self._info:
+                self._info[key]["warmup_sec"] = sec
+        return sec
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"arch": k[0], "model": k[1], "device": k[2], "dtype": k[3], "backend": k[4], **v}
+                    for k, v in self._info.items()]
+
+    def clear(self):
+        """로드된 모델 전부 해제 (테스트/메모리 회수용). 이미 모델을 잡고 있는 엔진은 계속 그 객체 사용"""
+        with self._lock:
+            self._models.clear()
+            self._key_locks.clear()
+            self._info.clear()
+
+MODEL_REGISTRY = ModelRegistry()
+
+def warmup_models(action_arch: str = ACTION_MODEL_ARCH, action_model: str = ACTION_MODEL_NAME,
+                  abnormal_arch: str = ABNORMAL_MODEL_ARCH, abnormal_model: str = ABNORMAL_MODEL_NAME,
+                  cpu_backend: str = CPU_BACKEND, batch_size: int = BATCH_SIZE) -> List[Dict[str, Any]]:
+    """
+    서버/워커 시작 시 호출: 두 모델을 레지스트리에 올리고 더미 배치로 1회 추론
+    이후 같은 설정의 AIBehaviorEngine()은 로드 없이 바로 추론 시작. 반환: 모델별 로드/워밍업 시간
+    """
+    device, dtype = _device_dtype()
+    for arch, name in ((action_arch, action_model), (abnormal_arch, abnormal_model)):
+        clf, _ = MODEL_REGISTRY.get(arch, name, device, dtype, backend=cpu_backend)
+        MODEL_REGISTRY.warmup(clf, batch_size=batch_size)
+    return MODEL_REGISTRY.stats()
+
+# -----------------------------
+# 메인 엔진
+# -----------------------------
+class AIBehaviorEngine:
+    def __init__(self,
+                 action_arch: str = ACTION_MODEL_ARCH,
+                 action_model: str = ACTION_MODEL_NAME,
+                 abnormal_arch: str = ABNORMAL_MODEL_ARCH,
+                 abnormal_model: str = ABNORMAL_MODEL_NAME,
+                 sample_fps: int = SAMPLE_FPS,
+                 num_frames: int = NUM_FRAMES,
+                 stride: int = STRIDE,
+                 action_conf_thresh: float = ACTION_CONF_THRESH,
+                 repetition_targets: Optional[set] = None,
+                 repetition_min_sec: float = REPETITION_MIN_SEC,
+                 abnormal_prob_thresh: float = ABNORMAL_PROB_THRESH,
+                 abnormal_margin: float = ABNORMAL_MARGIN,
+                 abnormal_min_consec: int = ABNORMAL_MIN_CONSEC,
+                 batch_size: int = BATCH_SIZE,
+                 shared_preprocess: bool = SHARED_PREPROCESS,
+                 frame_cache_mb: float = FRAME_CACHE_MB,
+                 decode_resize: bool = DECODE_RESIZE,
+                 threaded_reader: bool = THREADED_READER,
+                 pipeline: bool = PIPELINE,
+                 pipeline_depth: int = PIPELINE_DEPTH,
+                 pred_cache_dir: Optional[str] = PRED_CACHE_DIR,
+                 cpu_backend: str = CPU_BACKEND,
+                 cpu_threads: Optional[int] = CPU_THREADS,
+                 motion_gate: bool = MOTION_GATE,
+                 motion_thresh: float = MOTION_THRESH,
+                 abnormal_on_demand: bool = ABNORMAL_ON_DEMAND,
+                 abnormal_sparse_stride: int = ABNORMAL_SPARSE_STRIDE,
+                 abnormal_triggers: Optional[set] = None,
+                 abnormal_low_conf: float = ABNORMAL_LOW_CONF,
+                 abnormal_motion_min: float = ABNORMAL_MOTION_MIN,
+                 adaptive_stride: bool = ADAPTIVE_STRIDE,
+                 adaptive_factor: int = ADAPTIVE_FACTOR,
+                 profile_dir: Optional[str] = PROFILE_DIR,
+                 on_timings: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 shared_models: bool = SHARED_MODELS,
+                 load_models: bool = True):
+        """
+        load_models=False: 모델은 처음 추론이 필요할 때 로드 (예측 캐시로 임계값만 튜닝할 때)
+        shared_models: MODEL_REGISTRY에서 모델을 받아 씀 (같은 설정의 엔진끼리 공유, 두 번째부터 로드 0초)
+        cpu_backend: CPU 추론 백엔드 (CPU_BACKEND 참고). cpu_threads는 프로세스 전체 torch 설정을 바꿈
+        abnormal_on_demand: 이상 모델은 대상 윈도우(triggers coarse / low_conf 미만 / motion_min 이상)에서만,
+                            희소 stride 후 이상 주변 densify (analyze 전용, 스트리밍은 항상 전수)
+        adaptive_stride: stride*adaptive_factor로 먼저 훑고 변화 구간만 stride로 정밀 추론 (analyze 전용)
+        profile_dir: analyze마다 torch.profiler trace 저장 폴더 (None이면 단계 타이머만)
+        on_timings: analyze 끝날 때 on_timings(video_path, report.timings) 호출 (모니터링 연동용)
+        """
+        if adaptive_stride and abnormal_on_demand:
+            raise ValueError("adaptive_stride와 abnormal_on_demand는 함께 쓸 수 없음 (둘 다 윈도우를 건너뜀)")
+        self.device, self.dtype = _device_dtype()
+        if cpu_threads:
+            torch.set_num_threads(int(cpu_threads))
+        self.cpu_backend = "+".join(_parse_backend(cpu_backend)) or "eager"
+        self.action_arch, self.action_model = action_arch, action_model
+        self.abnormal_arch, self.abnormal_model = abnormal_arch, abnormal_model
+        self.shared_models = shared_models
+        self._action: Optional[VideoClassifier] = None
+        self._abnorm: Optional[VideoClassifier] = None
+        self.model_load: Dict[str, Dict[str, Any]] = {}  # 리포트용: 모델별 로드 시간 / 레지스트리 재사용 여부
+        if load_models:
+            _ = (self.action, self.abnorm)  # 생성 시점에 두 모델 로드
+        self.sample_fps = sample_fps
+        self.num_frames = num_frames
+        self.stride = stride
+        self.action_conf_thresh = action_conf_thresh
+        self.rep_targets = repetition_targets or set(REPETITION_TARGETS)
+        self.rep_min_sec = repetition_min_sec
+        self.ab_thresh = abnormal_prob_thresh
+        self.ab_margin = abnormal_margin
+        self.ab_min_consec = abnormal_min_consec
+        self.batch_size = max(1, int(batch_size))
+        self.shared_preprocess = shared_preprocess
+        self.frame_cache_mb = frame_cache_mb
+        self.decode_resize = decode_resize
+        self.threaded_reader = threaded_reader
+        self.pipeline = pipeline
+        self.pipeline_depth = pipeline_depth
+        self.pred_cache = PredictionCache(pred_cache_dir) if pred_cache_dir else None
+        self.motion_gate = motion_gate
+        self.motion_thresh = motion_thresh
+        self.abnormal_on_demand = abnormal_on_demand
+        # 희소 stride가 최소 연속 길이보다 크면 짧은 run을 놓칠 수 있음 → 제한
+        self.ab_stride = max(1, min(int(abnormal_sparse_stride), int(abnormal_min_consec)))
+        self.ab_triggers = set(ABNORMAL_TRIGGERS if abnormal_triggers is None else abnormal_triggers)
+        self.ab_low_conf = abnormal_low_conf
+        self.ab_motion_min = abnormal_motion_min
+        self.adaptive_stride = adaptive_stride
+        self.adaptive_factor = max(1, int(adaptive_factor))
+        self._tensors = FrameTensorCache()
+        self._gate = self._new_gate()
+        self.profile_dir = profile_dir
+        self.on_timings = on_timings
+        self._timer = StageTimer()
+
+    def _new_gate(self) -> Optional[MotionGate]:
+        # 온디맨드 이상 필터도 움직임 에너지를 씀 (게이트 판정은 motion_gate일 때만)
+        return MotionGate(self.motion_thresh) if (self.motion_gate or self.abnormal_on_demand) else None
+
+    def _load(self, role: str, arch: str, model_name: str) -> VideoClassifier:
+        t0 = time.perf_counter()
+        if self.shared_models:
+            clf, reused = MODEL_REGISTRY.get(arch, model_name, self.device, self.dtype, backend=self.cpu_backend)
+        else:
+            clf, reused = VideoClassifier(arch, model_name, self.device, self.dtype, backend=self.cpu_backend), False
+        self.model_load[role] = {"sec": round(time.perf_counter() - t0, 3), "shared": reused}
+        return clf
+
+    @property
+    def action(self) -> VideoClassifier:
+        if self._action is None:
+            self._action = self._load("action", self.action_arch, self.action_model)
+        return self._action
+
+    @property
+    def abnorm(self) -> VideoClassifier:
+        if self._abnorm is None:
+            self._abnorm = self._load("abnormal", self.abnormal_arch, self.abnormal_model)
+        return self._abnorm
+
+    def warmup(self) -> Dict[str, float]:
+        """두 모델을 더미 배치(batch_size)로 1회 추론 → 첫 영상의 첫 배치 지연 제거. 모델별 시간(초)"""
+        reg = MODEL_REGISTRY
+        return {"action": reg.warmup(self.action, self.num_frames, self.batch_size),
+                "abnormal": reg.warmup(self.abnorm, self.num_frames, self.batch_size)}
+
+    def _decode_short_edge(self) -> Optional[int]:
+        """디코딩 직후 축소할 짧은 변 길이. 두 모델 모두 공유 전처리 가능할 때만 (큰 쪽 기준)"""
+        if not (self.decode_resize and self.shared_preprocess):
+            return None
+        specs = [self.action.spec, self.abnorm.spec]
+        if any(sp is None for sp in specs):
+            return None
+        return max(sp.short_edge for sp in specs)
+
+    def _batch_probs(self, wins: List[List[int]], frames_batch: List[List[np.ndarray]],
+                     models: Tuple[str, ...] = ("action", "abnormal")) -> List[np.ndarray]:
+        """models 순서대로 확률 행렬. 공유 전처리 캐시 사용 시 프레임당 전처리 1회"""
+        pv_cache: Dict[PreprocSpec, torch.Tensor] = {}  # 스펙이 같으면 배치 텐서도 그대로 공유(fast path)
+        clfs = {"action": self.action, "abnormal": self.abnorm}
+        out = []
+        for name, clf in ((m, clfs[m]) for m in models):
+            if not self.shared_preprocess or clf.spec is None:
+                # HF processor 경로: 전처리+forward 합산 (하위 단계로 processor / forward 따로)
+                with self._timer.stage(name):
+                    with self._timer.stage(f"{name}.processor"):
+                        pv = clf._inputs(frames_batch)["pixel_values"]
+                    with self._timer.stage(f"{name}.forward"):
+                        out.append(clf.predict_proba_pixels(pv))
+                continue
+            if clf.spec not in pv_cache:
+                with self._timer.stage("preprocess"):
+                    pv_cache[clf.spec] = self._tensors.pixel_values(wins, frames_batch, clf.spec)
+            with self._timer.stage(name):
+                out.append(clf.predict_proba_pixels(pv_cache[clf.spec]))
+        return out
+
+    def _clip_arrays(self, preds: WindowPreds, k: int = 5) -> ClipArrays:
+        """윈도우별 원시 확률 → 임계값 적용된 클립 배열 (모든 윈도우 한 번에)"""
+        fps = preds.orig_fps or 1.0
+        a = preds.a_probs
+        b = preds.b_probs
+
+        # 행동 예측: top-k, top-1 coarse (확신도 낮으면 other)
+        top_idx = np.argsort(a, axis=1)[:, ::-1][:, :k] if len(a) else np.zeros((0, k), np.int64)
+        top_raw = np.take_along_axis(a, top_idx, axis=1).astype(np.float64)
+        coarse_of_cls = np.array([COARSE_LABELS.index(_coarse(l)) for l in preds.action_labels], np.int64)
+        coarse = coarse_of_cls[top_idx[:, 0]] if len(a) else np.zeros(0, np.int64)
+        coarse = np.where(top_raw[:, 0] < self.action_conf_thresh, COARSE_LABELS.index("other"), coarse)
+
+        # 이상 필터: 이상 확률이 임계값 이상 + 정상 확률보다 margin 이상 높을 때만
+        p_ab, p_nm = _abnormal_pn(b, preds.abnormal_labels)
+        ab_flag = (p_ab >= self.ab_thresh) & ((p_ab - p_nm) >= self.ab_margin)
+
+        # 모션 게이트로 생략된 윈도우: static (coarse=other, 이상 아님)
+        gated = preds.gated if preds.gated is not None else np.zeros(len(a), bool)
+        coarse = np.where(gated, COARSE_LABELS.index("other"), coarse)
+        # 이상 모델을 안 돌린 윈도우 (온디맨드 대상 아님/희소 stride): 이상 아님
+        b_done = preds.b_done if preds.b_done is not None else np.ones(len(a), bool)
+        ab_flag &= ~gated & b_done
+
+        return ClipArrays(
+            t_start=np.round(preds.win_first / fps, 2), t_end=np.round(preds.win_last / fps, 2),
+            top_idx=top_idx, top_prob=np.round(top_raw, 4), action_prob=np.round(top_raw[:, 0], 4),
+            coarse=coarse,
+            ab_label=np.argmax(b, axis=1) if len(b) else np.zeros(0, np.int64),
+            ab_prob=np.round(p_ab, 4),  # 보고/평균 계산은 "이상 확률"로
+            ab_flag=ab_flag, gated=gated, ab_done=b_done,
+            action_labels=preds.action_labels, abnormal_labels=preds.abnormal_labels,
+        )
+
+    def _infer_batch(self, wins: List[List[int]], frames_batch: List[List[np.ndarray]],
+                     orig_fps: float) -> List[ClipPred]:
+        """윈도우 B개를 한 번에 추론 → 입력 순서대로 ClipPred B개 (정적 윈도우는 모델 생략)"""
+        gated = np.array([self._is_static(w, f) for w, f in zip(wins, frames_batch)], dtype=bool)
+        a_probs = np.zeros((len(wins), len(self.action.id2label)), np.float32)  # [B, num_action_cls]
+        b_probs = np.zeros((len(wins), len(self.abnorm.id2label)), np.float32)  # [B, num_abnormal_cls]
+        keep = np.flatnonzero(~gated).tolist()
+        if keep:
+            a_probs[keep], b_probs[keep] = self._batch_probs([wins[i] for i in keep],
+                                                             [frames_batch[i] for i in keep])
+        preds = WindowPreds(
+            orig_fps=orig_fps,
+            win_first=np.array([w[0] for w in wins], dtype=np.int64),
+            win_last=np.array([w[-1] for w in wins], dtype=np.int64),
+            a_probs=a_probs, b_probs=b_probs,
+            action_labels=self._labels(self.action), abnormal_labels=self._labels(self.abnorm),
+            gated=gated,
+        )
+        return self._clip_arrays(preds).to_clips()
+
+    def _ab_flags(self, b_probs: np.ndarray) -> np.ndarray:
+        p_ab, p_nm = _abnormal_pn(b_probs, self._labels(self.abnorm))
+        return (p_ab >= self.ab_thresh) & ((p_ab - p_nm) >= self.ab_margin)
+
+    def _ab_eligible(self, a_probs: np.ndarray, energies: List[float]) -> np.ndarray:
+        """이상 모델 대상: 지정 coarse 행동 | 행동 확신도 낮음 | 움직임 큼"""
+        top, conf = a_probs.argmax(axis=1), a_probs.max(axis=1).astype(np.float64)
+        coarse = [_coarse(self.action.id2label[int(t)]) if c >= self.action_conf_thresh else "other"
+                  for t, c in zip(top, conf)]
+        return (np.array([c in self.ab_triggers for c in coarse], dtype=bool)
+                | (conf < self.ab_low_conf)
+                | (np.asarray(energies, np.float64) >= self.ab_motion_min))
+
+    def _ab_stats(self, preds: WindowPreds) -> Dict[str, Any]:
+        """리포트용 이상 모델 실행 통계"""
+        n = len(preds.win_first)
+        ran = int(preds.b_done.sum()) if preds.b_done is not None else \
+            n - (int(preds.gated.sum()) if preds.gated is not None else 0)
+        return {"on_demand": self.abnormal_on_demand, "windows": n, "inferred": ran,
+                "skip_ratio": round(1 - ran / max(n, 1), 4)}
+
+    def _gate_stats(self, preds: WindowPreds) -> Dict[str, Any]:
+        """리포트용 게이트 통계 (예측 캐시 적중 시에도 저장된 gated 마스크로 계산)"""
+        if not self.motion_gate:
+            return {"enabled": False}
+        n = len(preds.win_first)
+        skipped = int(preds.gated.sum()) if preds.gated is not None else 0
+        return {"enabled": True, "thresh": self.motion_thresh, "windows": n,
+                "inferred": n - skipped, "skipped": skipped, "skip_ratio": round(skipped / max(n, 1), 4)}
+
+    def _is_static(self, win: List[int], frames: List[np.ndarray]) -> bool:
+        if not self.motion_gate:
+            return False
+        with self._timer.stage("motion_gate"):
+            return self._gate.is_static(win, frames)
+
+    @staticmethod
+    def _labels(clf: VideoClassifier) -> List[str]:
+        return [clf.id2label[i] for i in range(len(clf.id2label))]
+
+    def _cache_params(self) -> Dict[str, Any]:
+        """예측 캐시 키에 들어가는 설정 (모델 출력에 영향 주는 것만)"""
+        return {
+            "action_model": f"{self.action_arch}:{self.action_model}",
+            "abnormal_model": f"{self.abnormal_arch}:{self.abnormal_model}",
+            "sample_fps": self.sample_fps,
+            "num_frames": self.num_frames,
+            "stride": self.stride,
+            "decode_resize": bool(self.decode_resize and self.shared_preprocess),
+            # int8 등은 확률이 미세하게 달라짐 → 백엔드별로 캐시 분리
+            "backend": self.cpu_backend if self.device.type == "cpu" else "eager",
+            **({"motion_gate": [self.motion_thresh, MOTION_PIXEL_DIFF, MOTION_SIZE]} if self.motion_gate else {}),
+            # 온디맨드면 어떤 윈도우에 이상 모델을 돌렸는지가 임계값에 따라 달라짐 → 관련 설정 전부 키에 포함
+            **({"abnormal_on_demand": [self.ab_stride, sorted(self.ab_triggers), self.ab_low_conf,
+                                       self.ab_motion_min, self.action_conf_thresh, self.ab_thresh,
+                                       self.ab_margin]} if self.abnormal_on_demand else {}),
+            **({"adaptive": [self.adaptive_factor, ADAPTIVE_ABNORMAL_SPIKE, self.action_conf_thresh,
+                             self.ab_thresh]} if self.adaptive_stride else {}),
+        }
+
+    def _iter_windows(self, reader: SampledFrameReader, windows: List[List[int]],
+                      buffer: FrameBuffer, stats: Dict[str, int]):
+        """디코딩 단계: 윈도우 순서대로 (win, frames) 생성. 파이프라인 모드에선 생산자 스레드에서 실행"""
+        frame_iter = iter(reader)
+        last_read = -1
+        try:
+            for win in windows:
+                t0, c0 = time.perf_counter(), time.thread_time()
+                frames=[]
+                for idx in win:
+                    if idx in buffer:
+                        frames.append(buffer.get(idx)); continue
+                    if idx <= last_read:
+                        # 상한 때문에 밀려난 프레임 → 해당 위치만 다시 읽음
+                        rgb = reader.read_at(idx)
+                        stats["reseeks"] += 1
+                        if rgb is None: break
+                        buffer.put(idx, rgb); frames.append(rgb)
+                        continue
+                    for r_idx, rgb in frame_iter:
+                        last_read = r_idx
+                        buffer.put(r_idx, rgb)
+                        if r_idx == idx:
+                            frames.append(rgb); break
+                    else:
+                        break  # 영상 끝
+                # 다음 윈도우 시작(= 현재 윈도우 + stride 위치) 이전 프레임은 다시 안 씀
+                buffer.evict_before(self._next_start(win))
+                self._timer.add("decode", time.perf_counter() - t0, time.thread_time() - c0)
+                if len(frames) != self.num_frames:
+                    continue
+                yield win, frames
+        finally:
+            frame_iter.close()
+
+    def _next_start(self, win: List[int]) -> int:
+        return win[self.stride] if self.stride < len(win) else win[-1] + 1
+
+    @torch.inference_mode()
+    def analyze_stream(self, source, fps: Optional[float] = None, follow: bool = False,
+                       batch_size: int = STREAM_BATCH_SIZE, poll_sec: float = STREAM_POLL_SEC,
+                       idle_timeout: float = STREAM_IDLE_TIMEOUT):
+        """
+        라이브/증분 분석. 윈도우가 채워지는 대로 추론하고 결과를 바로 yield
+        source: 파일 경로·RTSP URL·카메라 번호(str/int) 또는 RGB 프레임(혹은 프레임 리스트) iterable
+        fps: iterable 소스일 때 필수 (캡처 소스는 메타데이터 사용, 없으면 30)
+        yield: ("clip", ClipPred) | ("action_event" | "repetition_flag" | "abnormal_alert" | "abnormal_flag", Event)
+        """
+        if isinstance(source, (str, int)):
+            if fps is None:
+                cap = cv2.VideoCapture(source)
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+                cap.release()
+        elif fps is None:
+            raise ValueError("frame iterable 소스는 fps를 지정해야 합니다.")
+        fps = float(fps)
+        step = 1 if self.sample_fps >= fps else max(1, int(round(fps / self.sample_fps)))
+
+        tracker = OnlineEventTracker(self.rep_targets, self.rep_min_sec, self.ab_min_consec)
+        self._tensors = FrameTensorCache()
+        self._gate = self._new_gate()
+        batch_size = max(1, int(batch_size))
+
+        # 최근 num_frames개 샘플 프레임 (가득 찬 상태에서 stride마다 윈도우 하나)
+        ring: "deque[Tuple[int, np.ndarray]]" = deque(maxlen=self.num_frames)
+        n_sampled = 0
+        pending_wins: List[List[int]] = []
+        pending_frames: List[List[np.ndarray]] = []
+
+        def _flush():
+            for clip in self._infer_batch(pending_wins, pending_frames, fps):
+                yield ("clip", clip)
+                for item in tracker.update(clip):
+                    yield item
+            self._tensors.evict_before(ring[0][0] if ring else 0)
+            if self._gate is not None:
+                self._gate.evict_before(ring[0][0] if ring else 0)
+            pending_wins.clear(); pending_frames.clear()
+
+        frames_iter = _iter_stream_frames(source, step, self._decode_short_edge(), follow, poll_sec, idle_timeout)
+        try:
+            for idx, rgb in frames_iter:
+                ring.append((idx, rgb))
+                n_sampled += 1
+                # 윈도우 시작 위치 = 0, stride, 2*stride, ... (_make_windows와 동일)
+                last_pos = n_sampled - self.num_frames
+                if last_pos < 0 or last_pos % self.stride:
+                    continue
+                pending_wins.append([i for i, _ in ring])
+                pending_frames.append([f for _, f in ring])
+                if len(pending_wins) >= batch_size:
+                    yield from _flush()
+            if pending_wins:
+                yield from _flush()
+            yield from tracker.finish()
+        finally:
+            frames_iter.close()
+
+    def _infer_video(self, video_path: str, orig_fps: float, frame_count: int,
+                     on_rows: Optional[Callable[[WindowPreds], None]] = None) -> Tuple[WindowPreds, Dict[str, Any]]:
+        """
+        영상 전체 디코딩 + 두 모델 추론 → 윈도우별 원시 확률 (+ 실행 통계)
+        on_rows: 결과가 확정된 윈도우를 시간순 조각(WindowPreds)으로 받음 (_streams_rows()일 때만 호출)
+        """
+        # 샘플링 인덱스 & 윈도우
+        samp_idxs = _sample_indices(orig_fps, frame_count, self.sample_fps)
+        windows = _make_windows(samp_idxs, self.num_frames, self.stride)
+        if self.adaptive_stride:
+            return self._infer_adaptive(video_path, orig_fps, windows)
+        return self._infer_windows(video_path, orig_fps, windows, samp_idxs,
+                                   on_rows=on_rows if self._streams_rows() else None)
+
+    def _streams_rows(self) -> bool:
+        """추론 중에 윈도우 결과를 시간순으로 확정할 수 있는지 (적응형/이상 온디맨드는 뒤 윈도우를 봐야 확정)"""
+        return not (self.adaptive_stride or self.abnormal_on_demand)
+
+    def _infer_adaptive(self, video_path: str, orig_fps: float,
+                        windows: List[List[int]]) -> Tuple[WindowPreds, Dict[str, Any]]:
+        """
+        거친 패스(윈도우 factor개마다 1개) → 이웃 거친 윈도우끼리 coarse 라벨/게이트 상태가 다르거나 이상 확률이
+        높으면 그 사이를 정밀 패스로 추론. 나머지는 가까운 거친 윈도우 값으로 채움
+        → 라벨 변화 구간은 촘촘한 결과와 같은 경계 (변화 없는 긴 구간만 비용 절감)
+        """
+        factor = self.adaptive_factor
+        coarse_ids = sorted(set(range(0, len(windows), factor)) | ({len(windows) - 1} if windows else set()))
+
+        def _pass(ids: List[int], seek_gap: Optional[int]) -> Tuple[WindowPreds, Dict[str, Any], np.ndarray]:
+            wins = [windows[j] for j in ids]
+            idxs = sorted({i for w in wins for i in w})
+            preds, params = self._infer_windows(video_path, orig_fps, wins, idxs, seek_gap=seek_gap)
+            # 디코딩 실패로 빠진 윈도우가 있을 수 있음 → 실제 결과의 원래 윈도우 번호
+            pos = np.searchsorted(first_all, preds.win_first)
+            return preds, params, pos
+
+        first_all = np.array([w[0] for w in windows], dtype=np.int64)
+        p1, run_params, pos1 = _pass(coarse_ids, None)
+
+        # 정밀 추론할 구간: 이웃 거친 윈도우 사이
+        ca = self._clip_arrays(p1)
+        spike = min(ADAPTIVE_ABNORMAL_SPIKE, self.ab_thresh)
+        change = ((ca.coarse[1:] != ca.coarse[:-1]) | (ca.gated[1:] != ca.gated[:-1])
+                  | (np.maximum(ca.ab_prob[1:], ca.ab_prob[:-1]) >= spike))
+        refine_ids = [j for k in np.flatnonzero(change).tolist() for j in range(pos1[k] + 1, pos1[k + 1])]
+        if refine_ids:
+            p2, p2_params, pos2 = _pass(refine_ids, READER_SEEK_GAP)
+        else:
+            p2, p2_params, pos2 = None, {}, np.zeros(0, np.int64)
+
+        # 병합: 첫~마지막 추론 윈도우 범위의 모든 윈도우. 추론 안 한 윈도우는 가까운 거친 윈도우 값
+        n = int(pos1[-1]) + 1 if len(pos1) else 0
+        src_pos = np.concatenate([pos1, pos2])
+        order = np.argsort(src_pos, kind="stable")
+        src_pos = src_pos[order]
+        row = np.maximum(np.searchsorted(src_pos, np.arange(n), side="right") - 1, 0)  # 왼쪽 이웃
+        right = np.minimum(row + 1, len(src_pos) - 1)
+        use_right = (src_pos[right] - np.arange(n)) < (np.arange(n) - src_pos[row])
+        pick = order[np.where(use_right, right, row)]                        # 합친 결과 행 번호
+
+        parts = [p1] + ([p2] if p2 is not None else [])
+        def cat(field):
+            vals = [getattr(p, field) for p in parts]
+            return None if vals[0] is None else np.concatenate(vals)[pick]
+        filled = np.ones(n, bool); filled[src_pos] = False
+        preds = WindowPreds(
+            orig_fps=orig_fps,
+            win_first=first_all[:n], win_last=np.array([w[-1] for w in windows[:n]], dtype=np.int64),
+            a_probs=cat("a_probs"), b_probs=cat("b_probs"),
+            action_labels=p1.action_labels, abnormal_labels=p1.abnormal_labels,
+            gated=cat("gated"), filled=filled,
+        )
+        run_params["adaptive"] = {
+            "factor": factor, "dense_windows": n, "coarse_windows": len(pos1),
+            "refined_gaps": int(change.sum()), "refined_windows": len(pos2), "filled_windows": int(filled.sum()),
+            "refine_decode": p2_params.get("decode"),
+        }
+        return preds, run_params
+
+    def _infer_windows(self, video_path: str, orig_fps: float, windows: List[List[int]], samp_idxs: List[int],
+                       seek_gap: Optional[int] = None,
+                       on_rows: Optional[Callable[[WindowPreds], None]] = None) -> Tuple[WindowPreds, Dict[str, Any]]:
+        """
+        주어진 윈도우들(시간순)만 디코딩 + 추론. samp_idxs = 윈도우들이 쓰는 프레임 인덱스 (정렬)
+        on_rows: 배치마다 그때까지 확정된 윈도우(게이트된 것 포함) 조각 전달 (이상 온디맨드에선 안 씀)
+        """
+        # 샘플 프레임만 순차 디코딩 (grab/retrieve)
+        reader = SampledFrameReader(video_path, samp_idxs, resize_short=self._decode_short_edge(),
+                                    threaded=self.threaded_reader, seek_gap=seek_gap, timer=self._timer)
+
+        # 프레임 버퍼 (슬라이딩 + 메모리 상한)
+        buffer = FrameBuffer(int(self.frame_cache_mb * 2**20))
+        win_stats = {"reseeks": 0}
+
+        self._tensors = FrameTensorCache()
+        self._gate = self._new_gate()
+        t_wall = time.perf_counter()
+
+        # 디코딩 단계: 파이프라인이면 생산자 스레드 + bounded queue, 아니면 같은 스레드에서 순차 실행
+        if self.pipeline:
+            source = _Prefetcher(lambda: self._iter_windows(reader, windows, buffer, win_stats),
+                                 self.pipeline_depth, name="window-producer")
+        else:
+            source = self._iter_windows(reader, windows, buffer, win_stats)
+
+        done_wins: List[List[int]] = []   # 게이트된 윈도우 포함, 시간순
+        gated: List[bool] = []
+        a_rows: List[np.ndarray] = []
+        b_rows: List[np.ndarray] = []
+        # 배치 대기열: batch_size개가 모이면 두 모델에 한 번에 넣음
+        pending_wins: List[List[int]] = []
+        pending_frames: List[List[np.ndarray]] = []
+        pending_ids: List[int] = []        # done_wins 상 윈도우 번호
+        pending_energy: List[float] = []
+
+        # 이상 모델 온디맨드: 행동 모델 결과로 대상 판정 → 스케줄러가 고른 윈도우만 이상 모델
+        sched = AbnormalScheduler(self.ab_stride) if self.abnormal_on_demand else None
+        held: Dict[int, Tuple[List[int], List[np.ndarray]]] = {}  # 이상 모델 판정 대기 윈도우 (프레임 참조)
+        b_by_win: Dict[int, np.ndarray] = {}
+        emitted = 0                        # on_rows로 넘긴 윈도우 수
+
+        def _emit(a_new: np.ndarray, b_new: np.ndarray):
+            """done_wins[emitted:] = 게이트된 윈도우 + 방금 추론한 배치 → 조각 하나로 전달"""
+            nonlocal emitted
+            wins, g = done_wins[emitted:], np.array(gated[emitted:], dtype=bool)
+            a = np.zeros((len(wins), len(self.action.id2label)), np.float32)
+            b = np.zeros((len(wins), len(self.abnorm.id2label)), np.float32)
+            a[~g], b[~g] = a_new, b_new
+            on_rows(WindowPreds(
+                orig_fps=orig_fps,
+                win_first=np.array([w[0] for w in wins], dtype=np.int64),
+                win_last=np.array([w[-1] for w in wins], dtype=np.int64),
+                a_probs=a, b_probs=b,
+                action_labels=self._labels(self.action), abnormal_labels=self._labels(self.abnorm),
+                gated=g if self.motion_gate else None,
+            ))
+            emitted = len(done_wins)
+
+        def _run_abnormal(ids: List[int], sampled: bool = False):
+            for c in range(0, len(ids), self.batch_size):
+                chunk = ids[c:c + self.batch_size]
+                b_probs, = self._batch_probs([held[i][0] for i in chunk], [held[i][1] for i in chunk],
+                                             models=("abnormal",))
+                for i, row, flag in zip(chunk, b_probs, self._ab_flags(b_probs)):
+                    b_by_win[i] = row
+                    del held[i]
+                    if sampled:
+                        sched.set_flag(i, flag)
+
+        def _flush():
+            if sched is None:
+                a_probs, b_probs = self._batch_probs(pending_wins, pending_frames)
+                a_rows.append(a_probs); b_rows.append(b_probs)
+                if on_rows is not None:
+                    _emit(a_probs, b_probs)
+                return
+            a_probs, = self._batch_probs(pending_wins, pending_frames, models=("action",))
+            a_rows.append(a_probs)
+            for i, win, frames, e in zip(pending_ids, pending_wins, pending_frames,
+                                         self._ab_eligible(a_probs, pending_energy)):
+                sched.add(i, bool(e))
+                if e:
+                    held[i] = (win, frames)
+            _run_abnormal(sched.sampled(), sampled=True)
+            _run_abnormal(sched.resolve())
+            # 양옆 희소 지점이 확정됐는데 안 골린 윈도우는 프레임 놓아줌
+            for i in [i for i in held if i < sched.resolved_before]:
+                del held[i]
+
+        try:
+            for win, frames in tqdm(source, total=len(windows), desc="클립 추론"):
+                static = self._is_static(win, frames)
+                i = len(done_wins)
+                done_wins.append(win); gated.append(static)
+                if static:
+                    if sched is not None:
+                        sched.add(i, False)
+                    self._gate.evict_before(win[0])
+                    continue
+                pending_wins.append(win); pending_frames.append(frames); pending_ids.append(i)
+                if sched is not None:
+                    with self._timer.stage("motion_gate"):
+                        pending_energy.append(self._gate.energy(win, frames))
+                if self._gate is not None:
+                    self._gate.evict_before(win[0])
+                if len(pending_wins) >= self.batch_size:
+                    _flush()
+                    # 이상 모델 대기 중인 윈도우의 전처리 결과는 남겨 둠
+                    keep_from = min([w[0] for w, _ in held.values()], default=self._next_start(win))
+                    self._tensors.evict_before(min(keep_from, self._next_start(win)))
+                    pending_wins, pending_frames, pending_ids, pending_energy = [], [], [], []
+
+            # 마지막 남은 윈도우(배치 미만) 처리
+            if pending_wins:
+                _flush()
+            if sched is not None:
+                _run_abnormal(sched.finish())
+            elif on_rows is not None and emitted < len(done_wins):   # 끝부분의 게이트된 윈도우
+                _emit(np.zeros((0, len(self.action.id2label)), np.float32),
+                      np.zeros((0, len(self.abnorm.id2label)), np.float32))
+        finally:
+            source.close()
+            reader.close()
+        self._timer.add("inference_wall", time.perf_counter() - t_wall)
+
+        # 추론한 윈도우 확률을 전체 타임라인 위치로 (게이트된 윈도우 행은 0)
+        gated_arr = np.array(gated, dtype=bool)
+        a_probs = np.zeros((len(done_wins), len(self.action.id2label)), np.float32)
+        b_probs = np.zeros((len(done_wins), len(self.abnorm.id2label)), np.float32)
+        if a_rows:
+            a_probs[~gated_arr] = np.concatenate(a_rows)
+        b_done = None
+        if sched is not None:
+            b_done = np.zeros(len(done_wins), bool)
+            for i, row in b_by_win.items():
+                b_probs[i] = row; b_done[i] = True
+        elif b_rows:
+            b_probs[~gated_arr] = np.concatenate(b_rows)
+        preds = WindowPreds(
+            orig_fps=orig_fps,
+            win_first=np.array([w[0] for w in done_wins], dtype=np.int64),
+            win_last=np.array([w[-1] for w in done_wins], dtype=np.int64),
+            a_probs=a_probs, b_probs=b_probs,
+            action_labels=self._labels(self.action), abnormal_labels=self._labels(self.abnorm),
+            gated=gated_arr if self.motion_gate else None,
+            b_done=b_done,
+        )
+        run_params = {
+            "frame_buffer": {**buffer.stats(), "reseeks": win_stats["reseeks"], "peak_rss_mb": _peak_rss_mb()},
+            "decode": {"resize_short": reader.resize_short, "threaded": reader.threaded,
+                       "grabbed": reader.grabbed, "retrieved": reader.retrieved, "seeks": reader.seeks},
+            "pipeline": {"enabled": self.pipeline, "depth": self.pipeline_depth},
+        }
+        if sched is not None:
+            run_params["abnormal_schedule"] = sched.stats()
+        if self.pipeline:
+            run_params["pipeline"]["consumer_wait"] = round(source.get_wait, 4)    # 추론이 디코딩을 기다린 시간
+            run_params["pipeline"]["producer_blocked"] = round(source.put_wait, 4)  # 디코딩이 큐 자리를 기다린 시간
+        return preds, run_params
+
+    @torch.inference_mode()
+    def analyze(self, video_path: str, save_json: Optional[str] = None, save_npz: Optional[str] = None) -> Report:
+        """
+        save_json: 리포트 JSON — 클립은 추론 배치가 끝날 때마다 바로 기록, 이벤트/요약/params/timings는 끝에
+                   (적응형 stride/이상 온디맨드는 뒤 윈도우를 봐야 확정되므로 추론 후 기록)
+                   이때 report.clips는 ClipList (ClipPred 전체 목록을 메모리에 만들지 않음)
+        save_npz: 열 단위 압축 리포트 (load_report로 다시 읽음)
+        report.timings: 단계별 wall/CPU/호출 수 (+ profile_dir이면 torch.profiler 요약), 끝나면 on_timings 호출
+        """
+        assert os.path.exists(video_path), f"영상 없음: {video_path}"
+        self._timer = StageTimer(profiling=bool(self.profile_dir))
+        t0, c0 = time.perf_counter(), time.process_time()
+        prof = _new_profiler() if self.profile_dir else contextlib.nullcontext()
+        w = JsonReportWriter(save_json) if save_json else None
+        try:
+            with prof:
+                report, ca = self._analyze(video_path, writer=w)
+            profile = _profile_summary(prof, self.profile_dir, video_path) if self.profile_dir else None
+            report.timings = self._timings(t0, c0, profile)
+
+            if w is not None:
+                with self._timer.stage("report_write"):
+                    for key in _EVENT_KEYS:
+                        w.field(key, [_ev2d(e) for e in getattr(report, key)])
+                    w.field("summary", report.summary)
+                    w.field("params", report.params)
+                report.timings = self._timings(t0, c0, profile)
+                w.field("timings", report.timings)
+                w.close()
+        except BaseException:
+            if w is not None:
+                w.abort()
+            raise
+        if save_npz:
+            with self._timer.stage("report_write"):
+                save_report_npz(report, ca, save_npz)
+            report.timings = self._timings(t0, c0, profile)
+
+        if self.on_timings is not None:
+            try:
+                self.on_timings(report.video_path, report.timings)
+            except Exception as e:
+                print(f"⚠️ on_timings 콜백 예외: {e}")
+        return report
+
+    def _timings(self, t0: float, c0: float, profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """리포트 timings 섹션. total_cpu_sec는 프로세스 전체(모든 스레드) CPU 시간"""
+        out = {"total_wall_sec": round(time.perf_counter() - t0, 4),
+               "total_cpu_sec": round(time.process_time() - c0, 4),
+               "stages": self._timer.detail()}
+        if profile:
+            out["profile"] = profile
+        return out
+
+    def _analyze(self, video_path: str, writer: Optional["JsonReportWriter"] = None) -> Tuple[Report, ClipArrays]:
+        """writer: 주면 video_path/duration_sec/clips까지 기록 (클립은 가능하면 추론 중에)"""
+        orig_fps, frame_count = _read_meta(video_path)
+        duration = frame_count / (orig_fps or 1.0)
+        on_rows = None
+        if writer is not None:
+            writer.field("video_path", os.path.abspath(video_path))
+            writer.field("duration_sec", round(duration, 2))
+
+            def on_rows(part: WindowPreds):
+                with self._timer.stage("report_write"):
+                    for c in self._clip_arrays(part).to_clips():
+                        writer.clip(c)
+
+        # 예측 캐시 확인 → 있으면 디코딩/모델 생략
+        preds, cache_key = None, None
+        if self.pred_cache is not None:
+            cache_key = self.pred_cache.key(video_path, self._cache_params())
+            preds = self.pred_cache.load(cache_key)
+        run_params: Dict[str, Any] = {}
+        cache_hit = preds is not None
+        if not cache_hit:
+            preds, run_params = self._infer_video(video_path, orig_fps, frame_count, on_rows=on_rows)
+            if self.pred_cache is not None:
+                self.pred_cache.save(cache_key, preds)
+        if self.pred_cache is not None:
+            run_params["prediction_cache"] = {"key": cache_key, "hit": cache_hit}
+
+        # 후처리: 전부 NumPy 배열 연산 (긴 타임라인에서도 선형 시간)
+        t_post, c_post = time.perf_counter(), time.thread_time()
+        with self._timer.stage("postprocess.clips"):
+            ca = self._clip_arrays(preds)
+            clips = ca.to_clips() if writer is None else ClipList(ca)
+        if writer is not None and (cache_hit or not self._streams_rows()):
+            with self._timer.stage("report_write"):   # 추론 중에 못 쓴 클립 (캐시 적중/적응형/온디맨드)
+                for c in clips:
+                    writer.clip(c)
+
+        with self._timer.stage("postprocess.events"):
+            # 행동 이벤트 병합 (coarse 코드 run-length)
+            action_events, ev_codes, ev_dur = _group_events_arr(ca.coarse, ca.action_prob, ca.t_start, ca.t_end,
+                                                                COARSE_LABELS)
+
+            # 반복행동 플래그(장기 지속)
+            rep_codes = [COARSE_LABELS.index(t) for t in self.rep_targets if t in COARSE_LABELS]
+            rep_mask = np.isin(ev_codes, rep_codes) & (ev_dur >= self.rep_min_sec)
+            repetition_flags = [action_events[i] for i in np.flatnonzero(rep_mask).tolist()]
+
+            # 이상행동 플래그(연속 길이 필터 적용: run-length encoding)
+            abnormal_flags = _abnormal_runs(ca.ab_flag, ca.ab_prob, ca.t_start, ca.t_end, self.ab_min_consec)
+
+        with self._timer.stage("postprocess.summary"):
+            summary = _summarize(duration, action_events, repetition_flags, abnormal_flags,
+                                 per_sec=_action_time(ev_codes, ev_dur, COARSE_LABELS))
+        self._timer.add("postprocess", time.perf_counter() - t_post, time.thread_time() - c_post)
+
+        timings = self._timer.as_dict()
+        if "inference_wall" in timings:
+            # 직렬 실행 대비 겹침 효과: (디코딩 + 전처리 + 두 모델) / 실제 경과
+            busy = sum(timings.get(k, 0.0) for k in ("decode", "preprocess", "action", "abnormal"))
+            timings["overlap_gain"] = round(busy / max(timings["inference_wall"], 1e-9), 3)
+
+        report = Report(
+            video_path=os.path.abspath(video_path),
+            duration_sec=round(duration,2),
+            params={
+                **self._report_params(),
+                "batch_size": self.batch_size,
+                "shared_preprocess": self.shared_preprocess,
+                "device": self.device.type,
+                "cpu_backend": self.cpu_backend if self.device.type == "cpu" else None,
+                "torch_threads": torch.get_num_threads(),
+                "model_load": self.model_load,
+                "motion_gate": self._gate_stats(preds),
+                "abnormal_model_runs": self._ab_stats(preds),
+                **run_params,
+                "timings": timings
+            },
+            clips=clips,
+            action_events=action_events,
+            repetition_flags=repetition_flags,
+            abnormal_flags=abnormal_flags,
+            summary=summary
+        )
+        return report, ca
+
+    def _report_params(self) -> Dict[str, Any]:
+        """리포트 params 중 설정값 부분 (배치/스트리밍 공통)"""
+        return {
+            "action_model": f"{self.action_model} ({self.action_arch})",
+            "abnormal_model": f"{self.abnormal_model} ({self.abnormal_arch})",
+            "sample_fps": self.sample_fps,
+            "num_frames": self.num_frames,
+            "stride": self.stride,
+            "action_conf_thresh": self.action_conf_thresh,
+            "repetition_targets": list(self.rep_targets),
+            "repetition_min_sec": self.rep_min_sec,
+            "abnormal_prob_thresh": self.ab_thresh,
+        }
+
+# -----------------------------
+# 리포트 저장/로드
+# -----------------------------
+def _ev2d(e: Event) -> Dict[str, Any]:
+    return {"type": e.type, "t_start": round(e.t_start, 2), "t_end": round(e.t_end, 2), "avg_conf": round(e.avg_conf, 4)}
+
+class JsonReportWriter:
+    """
+    리포트 JSON 스트리밍 저장 (payload dict를 통째로 만들지 않음)
+    - 최상위 키는 호출 순서대로 한 줄씩, 클립은 나오는 대로 한 줄(compact)씩 → indent=2 대비 크기/파싱 비용↓
+    - 구조(키 이름/중첩)는 기존 리포트 JSON과 동일
+    - 임시 파일에 쓰고 close()에서 교체 → 중간에 실패해도 깨진 리포트가 남지 않음
+    """
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)) or ".", exist_ok=True)
+        self.path = path
+        self._tmp = f"{path}.{os.getpid()}.tmp"
+        self._f = open(self._tmp, "w", encoding="utf-8")
+        self._f.write("{")
+        self._fields = 0
+        self._clips: Optional[int] = None  # None: 아직 안 씀, int: 열려 있음(쓴 개수), -1: 닫힘
+
+    def _key(self, key: str):
+        self._f.write(("," if self._fields else "") + f"\n  {json.dumps(key)}: ")
+        self._fields += 1
+
+    def field(self, key: str, value: Any):
+        if self._clips is not None and self._clips >= 0:
+            self.end_clips()
+        self._key(key)
+        self._f.write(json.dumps(value, ensure_ascii=False))
+
+    def clip(self, clip: ClipPred):
+        if self._clips is None:
+            self._key("clips")
+            self._f.write("[")
+            self._clips = 0
+        elif self._clips < 0:
+            raise RuntimeError("clips 배열이 이미 닫힘")
+        self._f.write(("," if self._clips else "") + "\n    " + json.dumps(clip.__dict__, ensure_ascii=False))
+        self._clips += 1
+
+    def end_clips(self):
+        """clips 배열 닫기 (클립이 하나도 없었으면 빈 배열로)"""
+        if self._clips is None:
+            self._key("clips")
+            self._f.write("[]")
+        elif self._clips >= 0:
+            self._f.write("\n  ]" if self._clips else "]")
+        self._clips = -1
+
+    def close(self):
+        self.end_clips()
+        self._f.write("\n}\n")
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._f.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+REPORT_NPZ_VERSION = 1
+_EVENT_KEYS = ("action_events", "repetition_flags", "abnormal_flags")
+
+def save_report_npz(report: Report, ca: ClipArrays, path: str):
+    """
+    열 단위 압축 리포트 (.npz): 클립은 ClipArrays 배열 그대로, 메타/요약만 JSON 문자열
+    확률은 float32 저장 (원래 소수 4자리 → 로드 시 복원), 시간은 float64
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)) or ".", exist_ok=True)
+    meta = {"version": REPORT_NPZ_VERSION, "video_path": report.video_path, "duration_sec": report.duration_sec,
+            "params": report.params, "summary": report.summary, "timings": report.timings}
+    cols: Dict[str, np.ndarray] = {
+        "meta": np.array(json.dumps(meta, ensure_ascii=False)),
+        "t_start": ca.t_start, "t_end": ca.t_end,
+        "top_idx": ca.top_idx.astype(np.int32), "top_prob": ca.top_prob.astype(np.float32),
+        "action_prob": ca.action_prob.astype(np.float32), "coarse": ca.coarse.astype(np.int8),
+        "ab_label": ca.ab_label.astype(np.int32), "ab_prob": ca.ab_prob.astype(np.float32),
+        "ab_flag": ca.ab_flag, "gated": ca.gated, "ab_done": ca.ab_done,
+        "action_labels": np.array(ca.action_labels), "abnormal_labels": np.array(ca.abnormal_labels),
+        "coarse_labels": np.array(COARSE_LABELS),
+    }
+    for key in _EVENT_KEYS:
+        evs = getattr(report, key)
+        cols[f"{key}_type"] = np.array([e.type for e in evs], dtype=str)
+        cols[f"{key}_t"] = np.array([[e.t_start, e.t_end] for e in evs], np.float64).reshape(-1, 2)
+        cols[f"{key}_conf"] = np.array([e.avg_conf for e in evs], np.float64)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp, **cols)
+    os.replace(tmp, path)
+
+def load_report(path: str) -> Report:
+    """저장된 리포트(.json 또는 .npz) → Report"""
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            r4 = lambda x: np.round(x.astype(np.float64), 4)
+            ca = ClipArrays(
+                t_start=z["t_start"], t_end=z["t_end"], top_idx=z["top_idx"], top_prob=r4(z["top_prob"]),
+                action_prob=r4(z["action_prob"]),
+                # coarse 코드 → 현재 COARSE_LABELS 기준 코드로 (라벨 목록이 바뀌어도 로드 가능)
+                coarse=np.array([COARSE_LABELS.index(str(l)) for l in z["coarse_labels"]], np.int64)[z["coarse"]],
+                ab_label=z["ab_label"], ab_prob=r4(z["ab_prob"]), ab_flag=z["ab_flag"], gated=z["gated"],
+                ab_done=z["ab_done"],
+                action_labels=[str(x) for x in z["action_labels"]],
+                abnormal_labels=[str(x) for x in z["abnormal_labels"]],
+            )
+            events = {key: [Event(str(t), float(a), float(b), float(c)) for t, (a, b), c in
+                            zip(z[f"{key}_type"], z[f"{key}_t"], z[f"{key}_conf"])] for key in _EVENT_KEYS}
+        return Report(video_path=meta["video_path"], duration_sec=meta["duration_sec"], params=meta["params"],
+                      clips=ca.to_clips(), summary=meta["summary"], timings=meta.get("timings", {}), **events)
+
+    with open(path, "r", encoding="utf-8") as f:
+        d = json.load(f)
+    clips = [ClipPred(**{**c, "action_topk": [tuple(x) for x in c["action_topk"]]}) for c in d["clips"]]
+    events = {key: [Event(**e) for e in d[key]] for key in _EVENT_KEYS}
+    return Report(video_path=d["video_path"], duration_sec=d["duration_sec"], params=d["params"],
+                  clips=clips, summary=d["summary"], timings=d.get("timings", {}), **events)
+
+def check_backend_drift(video_path: str, backend: str, k: int = 5, decode_resize: bool = False,
+                        **engine_kwargs) -> Dict[str, Any]:
+    """
+    CPU 백엔드 정확도/속도 점검: 같은 영상을 fp32 eager와 backend로 각각 추론해 윈도우별 확률 비교
+    (각 백엔드 1회 워밍업 후 2번째 실행 시간을 잼 — compile/trace 비용 제외)
+    decode_resize: 비교 대상 쪽만 디코딩 직후 축소(DECODE_RESIZE)를 켬 → 축소로 인한 드리프트도 같은 기준으로 확인
+    """
+    orig_fps, frame_count = _read_meta(video_path)
+    runs = {}
+    for name, opts in (("ref", {"cpu_backend": "eager", "decode_resize": False}),
+                       ("got", {"cpu_backend": backend, "decode_resize": decode_resize})):
+        eng = AIBehaviorEngine(pred_cache_dir=None, **{**engine_kwargs, **opts})
+        eng._infer_video(video_path, orig_fps, frame_count)
+        t0 = time.perf_counter()
+        preds, _ = eng._infer_video(video_path, orig_fps, frame_count)
+        runs[name] = (eng, preds, time.perf_counter() - t0)
+
+    eng, ref, ref_sec = runs["ref"]
+    _, got, got_sec = runs["got"]
+    ca_ref, ca_got = eng._clip_arrays(ref, k), eng._clip_arrays(got, k)
+    n = len(ref.a_probs)
+    top1 = float(np.mean(ca_ref.top_idx[:, 0] == ca_got.top_idx[:, 0])) if n else 1.0
+    overlap = float(np.mean([len(set(x) & set(y)) / k for x, y in
+                             zip(ca_ref.top_idx.tolist(), ca_got.top_idx.tolist())])) if n else 1.0
+    a_diff = float(np.abs(ref.a_probs - got.a_probs).max()) if n else 0.0
+    b_diff = float(np.abs(ref.b_probs - got.b_probs).max()) if n else 0.0
+    return {
+        "backend": backend,
+        "decode_resize": decode_resize,
+        "windows": n,
+        "action_top1_agree": round(top1, 4),
+        f"action_top{k}_overlap": round(overlap, 4),
+        "action_max_abs_diff": round(a_diff, 5),
+        "abnormal_max_abs_diff": round(b_diff, 5),
+        "abnormal_flag_agree": round(float(np.mean(ca_ref.ab_flag == ca_got.ab_flag)) if n else 1.0, 4),
+        "eager_sec": round(ref_sec, 3),
+        "backend_sec": round(got_sec, 3),
+        "speedup": round(ref_sec / max(got_sec, 1e-9), 2),
+        "passed": top1 >= DRIFT_MIN_TOP1 and max(a_diff, b_diff) <= DRIFT_MAX_PROB,
+    }
+
+# 간단 실행 예시(직접 실행 시)
+if __name__ == "__main__":
+    import argparse, pprint
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--video", required=True, help="분석할 MP4 경로")
+    ap.add_argument("--out", default="report.json", help="리포트 저장 경로 (.json | .npz 열 단위 압축)")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="한 번에 추론할 윈도우 수")
+    ap.add_argument("--frame-cache-mb", type=float, default=FRAME_CACHE_MB, help="디코딩 프레임 버퍼 상한(MB)")
+    ap.add_argument("--threaded-reader", action="store_true", help="별도 스레드에서 프레임 디코딩")
+    ap.add_argument("--no-pipeline", action="store_true", help="디코딩/추론을 한 스레드에서 순차 실행")
+    ap.add_argument("--stream", action="store_true", help="스트리밍 모드: 이벤트가 확정되는 대로 출력 (--video에 RTSP URL도 가능)")
+    ap.add_argument("--follow", action="store_true", help="스트리밍 모드에서 녹화 중인(커지는) 파일을 계속 따라감")
+    ap.add_argument("--pred-cache", default=PRED_CACHE_DIR, help="윈도우별 예측 캐시 폴더 (임계값 튜닝 시 재추론 생략)")
+    ap.add_argument("--cpu-backend", default=CPU_BACKEND, help="CPU 추론 백엔드: eager | int8 | compile | torchscript (+로 조합)")
+    ap.add_argument("--threads", type=int, default=CPU_THREADS, help="torch CPU 스레드 수")
+    ap.add_argument("--motion-gate", action="store_true", help="움직임 없는 윈도우는 모델 생략 (정적 구간 많은 홈캠용)")
+    ap.add_argument("--abnormal-on-demand", action="store_true", help="이상 필터는 대상 윈도우에서만 희소 추론 후 이상 주변만 촘촘히")
+    ap.add_argument("--adaptive-stride", action="store_true", help="거친 stride로 먼저 훑고 변화 구간만 촘촘히 추론 (긴 녹화용)")
+    ap.add_argument("--profile", default=PROFILE_DIR, metavar="DIR", help="torch.profiler trace 저장 폴더 (단계 이름 포함)")
+    ap.add_argument("--decode-resize", action="store_true", help="디코딩 직후 모델 입력 해상도로 축소 (HF 전처리와 픽셀값이 조금 달라짐)")
+    ap.add_argument("--drift-check", action="store_true", help="--cpu-backend(+ --decode-resize)를 fp32 eager와 비교 (정확도 드리프트 + 속도)")
+    args = ap.parse_args()
+    if args.drift_check:
+        res = check_backend_drift(args.video, args.cpu_backend, decode_resize=args.decode_resize,
+                                  batch_size=args.batch_size, cpu_threads=args.threads)
+        pprint.pp(res)
+        raise SystemExit(0 if res["passed"] else 1)
+    eng = AIBehaviorEngine(batch_size=args.batch_size, frame_cache_mb=args.frame_cache_mb,
+                           decode_resize=args.decode_resize, threaded_reader=args.threaded_reader, pipeline=not args.no_pipeline,
+                           pred_cache_dir=args.pred_cache, cpu_backend=args.cpu_backend, cpu_threads=args.threads,
+                           motion_gate=args.motion_gate, abnormal_on_demand=args.abnormal_on_demand,
+                           adaptive_stride=args.adaptive_stride, profile_dir=args.profile)
+    npz = args.out.endswith(".npz")
+    if args.stream:
+        if npz:
+            raise SystemExit("--stream은 JSON 저장만 지원")
+        # 클립은 나오는 대로 기록, 이벤트/요약은 끝에
+        kind_key = {"action_event": "action_events", "repetition_flag": "repetition_flags",
+                    "abnormal_flag": "abnormal_flags"}
+        events: Dict[str, List[Event]] = {key: [] for key in _EVENT_KEYS}
+        t_end = 0.0
+        with JsonReportWriter(args.out) as w:
+            w.field("video_path", args.video)
+            w.field("params", eng._report_params())
+            for kind, item in eng.analyze_stream(args.video, follow=args.follow):
+                if kind == "clip":
+                    w.clip(item); t_end = item.t_end
+                    continue
+                print(f"[{kind}] {item}")
+                if kind in kind_key:
+                    events[kind_key[kind]].append(item)
+            w.field("duration_sec", t_end)
+            for key in _EVENT_KEYS:
+                w.field(key, [_ev2d(e) for e in events[key]])
+            w.field("summary", _summarize(t_end, *(events[key] for key in _EVENT_KEYS)))
+        print(f"[OK] JSON 저장 → {os.path.abspath(args.out)}")
+        raise SystemExit(0)
+    rep = eng.analyze(args.video, save_json=None if npz else args.out, save_npz=args.out if npz else None)
+    pprint.pp(rep.summary)
+    print(format_timings(rep.timings))
+    pprint.pp(rep.timings["stages"])
+    if "profile" in rep.timings:
+        print(f"[OK] 프로파일 trace → {rep.timings['profile']['trace']}")
+    print(f"[OK] {'NPZ' if npz else 'JSON'} 저장 → {os.path.abspath(args.out)}")
@@ -0,0 +1,107 @@
+# backend_client.py
+# 목적: 백엔드(Node, 기본 localhost:3000) 호출 공용 클라이언트
+# - requests.Session 하나를 프로세스 안에서 공유 → keep-alive 연결 재사용 (호출마다 새 TCP 연결 X)
+# - 모든 호출에 같은 기본 타임아웃 (연결/읽기 따로)
+# - 재시도 + 지수 백오프: 연결 실패는 모든 메서드, 502/503/504/429 응답은 GET 같은 멱등 메서드만
+#   (POST는 서버가 이미 저장했을 수 있어 응답 오류로는 재시도 안 함)
+# - 동기 API(get_backend) + asyncio API(AsyncBackendClient, 같은 세션을 스레드 풀에서 사용)
+# 사용: from backend_client import get_backend
+#      r = get_backend().get("/messages")
+#      async with AsyncBackendClient() as api: r = await api.post("/messages/send", json=payload)
+
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BACKEND_BASE    = os.getenv("RAVO_BACKEND_BASE", "http://localhost:3000")
+CONNECT_TIMEOUT = 3.0    # 연결 타임아웃(초)
+READ_TIMEOUT    = 10.0   # 응답 대기 타임아웃(초)
+RETRIES         = 3      # 최대 재시도 횟수
+BACKOFF         = 0.3    # 재시도 대기: BACKOFF * 2^(n-1) 초
+RETRY_STATUS    = (429, 502, 503, 504)
+POOL_SIZE       = 16     # 호스트당 유지할 keep-alive 연결 수 (동시 요청 스레드 수 이상 권장)
+ASYNC_WORKERS   = 8      # AsyncBackendClient가 쓰는 스레드 수
+
+
+class BackendClient:
+    """동기 클라이언트 (스레드 간 공유 가능: 연결 풀은 urllib3가 스레드 안전하게 관리)"""
+    def __init__(self, base: str = BACKEND_BASE,
+                 timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+                 retries: int = RETRIES, backoff: float = BACKOFF, pool_size: int = POOL_SIZE):
+        self.base = base.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff, status_forcelist=RETRY_STATUS,
+                      raise_on_status=False)  # 재시도 끝나면 마지막 응답 그대로 반환 (호출부가 status 확인)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path: str) -> str:
+        """'/messages' → base + path. 완전한 URL(서명 URL, 다른 서버)은 그대로"""
+        return path if path.startswith(("http://", "https://")) else f"{self.base}{path}"
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_CLIENT: Optional[BackendClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_backend() -> BackendClient:
+    """프로세스 공용 클라이언트 (처음 호출 때 생성)"""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = BackendClient()
+    return _CLIENT
+
+
+class AsyncBackendClient:
+    """
+    asyncio API: await api.get(...) / await api.post(...)
+    - 요청은 스레드 풀에서 동기 클라이언트로 실행 → 연결 풀/타임아웃/재시도 설정이 동기 API와 같음
+    - 이벤트 루프는 응답을 기다리는 동안 막히지 않음 (여러 요청을 asyncio.gather로 동시에)
+    """
+    def __init__(self, client: Optional[BackendClient] = None, workers: int = ASYNC_WORKERS):
+        self.client = client or get_backend()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="backend-async")
+
+    async def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(self.client.request, method, path, **kwargs))
+
+    async def get(self, path: str, **kwargs) -> requests.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> requests.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def aclose(self):
+        self._pool.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
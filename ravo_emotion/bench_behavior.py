@@ -0,0 +1,305 @@
+# bench_behavior.py
+# 목적: ai_behavior_engine(AIBehaviorEngine.analyze) 성능 측정 → 최적화 전/후 비교
+# - 길이/해상도/fps를 지정한 합성 영상을 만들어 분석
+# - 기본은 로컬에서 만든 랜덤 가중치 스텁 모델(다운로드 없음), --models real 이면 실제 HF 모델
+# - 시나리오(엔진 설정 조합)마다 새 프로세스 → 모델 로드/peak RSS가 서로 섞이지 않음
+# - 결과는 JSON (커밋 해시 포함) → --compare 로 두 결과 비교
+# 사용: python bench_behavior.py --seconds 120 --resolution 1280x720 --scenario base --scenario gate:motion_gate=true
+#      python bench_behavior.py --compare bench/before.json bench/after.json
+
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BENCH_VERSION = 1
+WORK_DIR      = os.path.join(tempfile.gettempdir(), "ravo_bench")  # 합성 영상/스텁 모델 캐시
+
+# 스텁 행동 모델 라벨: coarse 매핑(_coarse)이 골고루 걸리도록 Kinetics 라벨 일부
+STUB_ACTION_LABELS = [
+    "walking the dog", "jogging", "sitting", "sleeping", "jumping into pool", "standing",
+    "clapping", "dancing ballet", "eating burger", "reading book", "drinking", "texting",
+    "yawning", "stretching arm", "crawling baby", "washing hands",
+]
+STUB_ABNORMAL_LABELS = ["non-violence", "violence"]
+
+# 비교 표에 보여줄 지표 (값, 작을수록 좋은지)
+COMPARE_METRICS = [
+    ("wall_sec", True), ("windows_per_sec", False), ("decode_fps", False),
+    ("preprocess_ms_per_window", True), ("action_ms_per_window", True), ("abnormal_ms_per_window", True),
+    ("postprocess_sec", True), ("peak_rss_mb", True), ("realtime_x", False),
+]
+
+
+# -----------------------------
+# 합성 영상 / 스텁 모델
+# -----------------------------
+def make_synthetic_video(path: str, seconds: float, fps: float = 30.0, width: int = 1280, height: int = 720,
+                         static_ratio: float = 0.5, seed: int = 0) -> str:
+    """
+    배경 + 센서 노이즈 위로 사각형/원이 움직이는 영상. static_ratio 비율만큼은 움직임 없는 구간(빈 방)
+    같은 인자면 같은 영상 (시드 고정)
+    """
+    rng = np.random.default_rng(seed)
+    n = int(round(seconds * fps))
+    period = max(1, int(fps * 10))  # 10초 단위로 정적/동적 구간 교대
+    bg = cv2.GaussianBlur(rng.integers(40, 200, (height, width, 3), dtype=np.uint8), (0, 0), 15)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    try:
+        for i in range(n):
+            frame = bg.copy()
+            if (i % period) / period >= static_ratio:
+                t = i / fps
+                cx = int((0.5 + 0.4 * np.sin(t * 1.3)) * width)
+                cy = int((0.5 + 0.3 * np.cos(t * 0.7)) * height)
+                s = max(8, min(width, height) // 8)
+                cv2.rectangle(frame, (cx - s, cy - s), (cx + s, cy + s), (30, 160, 220), -1)
+                cv2.circle(frame, (width - cx, cy), s // 2, (220, 60, 60), -1)
+            noise = rng.integers(-3, 4, (height, width, 1), dtype=np.int16)
+            writer.write(np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    finally:
+        writer.release()
+    return path
+
+
+def build_stub_models(root: str, size: str = "tiny") -> Dict[str, str]:
+    """
+    랜덤 가중치 TimeSformer/VideoMAE를 로컬 폴더에 save_pretrained → 엔진엔 폴더 경로를 모델 이름으로 넘김
+    size: "tiny"(파이프라인 오버헤드 측정용) | "base"(실제 모델과 같은 구조/연산량)
+    """
+    from transformers import (TimesformerConfig, TimesformerForVideoClassification,
+                              VideoMAEConfig, VideoMAEForVideoClassification, VideoMAEImageProcessor)
+    from ai_behavior_engine import NUM_FRAMES
+
+    if size == "tiny":
+        arch = dict(hidden_size=32, num_hidden_layers=1, num_attention_heads=2, intermediate_size=64, patch_size=32)
+    elif size == "base":
+        arch = {}  # HF 기본값 = base (hidden 768, 12 layers, patch 16)
+    else:
+        raise ValueError("size must be 'tiny' or 'base'")
+
+    action_dir = os.path.join(root, f"stub-timesformer-{size}")
+    abnormal_dir = os.path.join(root, f"stub-videomae-{size}")
+    if not os.path.exists(os.path.join(action_dir, "config.json")):
+        import torch
+        torch.manual_seed(0)
+        a_labels = STUB_ACTION_LABELS if size == "tiny" else \
+            STUB_ACTION_LABELS + [f"kinetics class {i}" for i in range(400 - len(STUB_ACTION_LABELS))]
+        model = TimesformerForVideoClassification(TimesformerConfig(
+            image_size=224, num_frames=NUM_FRAMES, id2label=dict(enumerate(a_labels)),
+            label2id={l: i for i, l in enumerate(a_labels)}, **arch))
+        model.save_pretrained(action_dir)
+        VideoMAEImageProcessor(image_mean=[0.45] * 3, image_std=[0.225] * 3).save_pretrained(action_dir)
+        model = VideoMAEForVideoClassification(VideoMAEConfig(
+            image_size=224, num_frames=NUM_FRAMES, id2label=dict(enumerate(STUB_ABNORMAL_LABELS)),
+            label2id={l: i for i, l in enumerate(STUB_ABNORMAL_LABELS)}, **arch))
+        model.save_pretrained(abnormal_dir)
+        VideoMAEImageProcessor().save_pretrained(abnormal_dir)
+    return {"action_arch": "timesformer", "action_model": action_dir,
+            "abnormal_arch": "videomae", "abnormal_model": abnormal_dir}
+
+
+# -----------------------------
+# 시나리오 실행 (자식 프로세스)
+# -----------------------------
+def _median(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    keys = [k for k, v in runs[0].items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    return {k: round(statistics.median(r[k] for r in runs), 4) for k in keys}
+
+
+def _metrics(rep, wall: float) -> Dict[str, Any]:
+    """Report.params → 비교용 지표"""
+    p = rep.params
+    t = p.get("timings", {})
+    windows = len(rep.clips)
+    # 게이트/온디맨드로 모델을 건너뛴 윈도우는 모델 지연 계산에서 제외
+    a_runs = p.get("motion_gate", {}).get("inferred", windows) if p.get("motion_gate", {}).get("enabled") else windows
+    b_runs = p.get("abnormal_model_runs", {}).get("inferred", a_runs)
+    per_ms = lambda sec, n: round(1000 * sec / n, 3) if n else 0.0
+    decoded = p.get("decode", {}).get("retrieved", 0)
+    return {
+        "wall_sec": round(wall, 4),
+        "windows": windows,
+        "windows_per_sec": round(windows / max(wall, 1e-9), 3),
+        "decode_sec": t.get("decode", 0.0),
+        "decode_fps": round(decoded / t["decode"], 1) if t.get("decode") else 0.0,
+        "preprocess_sec": t.get("preprocess", 0.0),
+        "preprocess_ms_per_window": per_ms(t.get("preprocess", 0.0), a_runs),
+        "action_sec": t.get("action", 0.0),
+        "action_ms_per_window": per_ms(t.get("action", 0.0), a_runs),
+        "abnormal_sec": t.get("abnormal", 0.0),
+        "abnormal_ms_per_window": per_ms(t.get("abnormal", 0.0), b_runs),
+        "inference_wall_sec": t.get("inference_wall", 0.0),
+        "postprocess_sec": t.get("postprocess", 0.0),
+        "overlap_gain": t.get("overlap_gain", 0.0),
+        "peak_rss_mb": p.get("frame_buffer", {}).get("peak_rss_mb", 0.0),
+        "realtime_x": round(rep.duration_sec / max(wall, 1e-9), 3),  # 영상 길이 / 분석 시간
+        "timings": t,
+    }
+
+
+def _run_scenario(video_path: str, engine_kwargs: Dict[str, Any], repeat: int, warmup: bool,
+                  threads: Optional[int]) -> Dict[str, Any]:
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+    from ai_behavior_engine import AIBehaviorEngine, _peak_rss_mb
+
+    t0 = time.perf_counter()
+    eng = AIBehaviorEngine(**{"pred_cache_dir": None, **engine_kwargs})
+    load_sec = time.perf_counter() - t0
+    if warmup:
+        eng.analyze(video_path)
+    runs = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        rep = eng.analyze(video_path)
+        runs.append(_metrics(rep, time.perf_counter() - t0))
+    return {"load_sec": round(load_sec, 3), "torch_threads": torch.get_num_threads(),
+            "peak_rss_mb": _peak_rss_mb(), "runs": runs, "median": _median(runs)}
+
+
+# -----------------------------
+# 실행 / 비교
+# -----------------------------
+def _parse_value(v: str) -> Any:
+    try:
+        return json.loads(v)
+    except ValueError:
+        return v
+
+
+def _parse_scenario(spec: str) -> Tuple[str, Dict[str, Any]]:
+    """'gate:motion_gate=true,batch_size=8' → ("gate", {...})"""
+    name, _, rest = spec.partition(":")
+    kw = {}
+    for item in filter(None, rest.split(",")):
+        k, _, v = item.partition("=")
+        kw[k.strip()] = _parse_value(v.strip())
+    return name, kw
+
+
+def _git_commit() -> Optional[str]:
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, capture_output=True,
+                             text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                               capture_output=True, text=True, timeout=30).stdout.strip()
+        return f"{rev}{'-dirty' if dirty else ''}" if rev else None
+    except Exception:
+        return None
+
+
+def run_benchmark(seconds: float = 60.0, fps: float = 30.0, resolution: Tuple[int, int] = (1280, 720),
+                  static_ratio: float = 0.5, models: str = "stub", stub_size: str = "tiny",
+                  scenarios: Optional[List[Tuple[str, Dict[str, Any]]]] = None,
+                  repeat: int = 1, warmup: bool = False, threads: Optional[int] = None,
+                  work_dir: str = WORK_DIR) -> Dict[str, Any]:
+    os.makedirs(work_dir, exist_ok=True)
+    w, h = resolution
+    video = os.path.join(work_dir, f"synthetic_{seconds:g}s_{w}x{h}_{fps:g}fps_s{static_ratio:g}.mp4")
+    if not os.path.exists(video):
+        print(f"🎞️ 합성 영상 생성: {video}")
+        make_synthetic_video(video, seconds, fps, w, h, static_ratio)
+    model_kw = build_stub_models(work_dir, stub_size) if models == "stub" else {}
+
+    import torch
+    result = {
+        "version": BENCH_VERSION,
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "env": {"python": platform.python_version(), "platform": platform.platform(),
+                "cpu_count": os.cpu_count(), "torch": torch.__version__, "opencv": cv2.__version__,
+                "numpy": np.__version__, "cuda": torch.cuda.is_available()},
+        "video": {"seconds": seconds, "fps": fps, "width": w, "height": h, "static_ratio": static_ratio},
+        "models": f"stub-{stub_size}" if models == "stub" else "real",
+        "scenarios": [],
+    }
+    ctx = mp.get_context("spawn")
+    for name, kw in scenarios or [("default", {})]:
+        print(f"⏱️ [{name}] {kw or '(기본 설정)'}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            out = pool.submit(_run_scenario, video, {**model_kw, **kw}, repeat, warmup, threads).result()
+        result["scenarios"].append({"name": name, "engine_kwargs": kw, **out})
+        m = out["median"]
+        print(f"   wall {m['wall_sec']:.2f}s | {m['windows_per_sec']:.2f} win/s | decode {m['decode_fps']:.0f} fps | "
+              f"action {m['action_ms_per_window']:.1f} ms/win | abnormal {m['abnormal_ms_per_window']:.1f} ms/win | "
+              f"peak RSS {out['peak_rss_mb']:.0f} MB")
+    return result
+
+
+def compare_results(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """같은 이름 시나리오끼리 median 지표 비교 → 행 목록 (change = new/old - 1)"""
+    old_by = {s["name"]: s for s in old.get("scenarios", [])}
+    rows = []
+    for s in new.get("scenarios", []):
+        o = old_by.get(s["name"])
+        if o is None:
+            continue
+        for key, lower_better in COMPARE_METRICS:
+            a, b = o["median"].get(key), s["median"].get(key)
+            if a is None or b is None:
+                continue
+            change = (b / a - 1) if a else 0.0
+            better = (change < 0) == lower_better if change else None
+            rows.append({"scenario": s["name"], "metric": key, "old": a, "new": b,
+                         "change": round(change, 4), "better": better})
+    return rows
+
+
+def _print_compare(old_path: str, new_path: str):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"old: {old.get('commit')} ({old.get('models')})  →  new: {new.get('commit')} ({new.get('models')})")
+    if old.get("video") != new.get("video"):
+        print("⚠️ 합성 영상 설정이 다름:", old.get("video"), new.get("video"))
+    for r in compare_results(old, new):
+        mark = {True: "✅", False: "❌", None: "  "}[r["better"]]
+        print(f"{mark} {r['scenario']:<12} {r['metric']:<26} {r['old']:>10} → {r['new']:>10} ({r['change']:+.1%})")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="AIBehaviorEngine 성능 벤치마크")
+    ap.add_argument("--seconds", type=float, default=60.0, help="합성 영상 길이(초)")
+    ap.add_argument("--fps", type=float, default=30.0, help="합성 영상 fps")
+    ap.add_argument("--resolution", default="1280x720", help="합성 영상 해상도 WxH")
+    ap.add_argument("--static-ratio", type=float, default=0.5, help="움직임 없는 구간 비율 (0~1)")
+    ap.add_argument("--models", choices=["stub", "real"], default="stub", help="stub: 로컬 랜덤 모델, real: 실제 HF 모델")
+    ap.add_argument("--stub-size", choices=["tiny", "base"], default="tiny", help="스텁 모델 크기")
+    ap.add_argument("--scenario", action="append", default=[],
+                    help="NAME[:key=value,...] 엔진 설정 조합 (여러 번 지정 가능)")
+    ap.add_argument("--repeat", type=int, default=1, help="시나리오당 반복 횟수 (지표는 median)")
+    ap.add_argument("--warmup", action="store_true", help="측정 전 1회 미리 실행")
+    ap.add_argument("--threads", type=int, default=None, help="torch CPU 스레드 수")
+    ap.add_argument("--work-dir", default=WORK_DIR, help="합성 영상/스텁 모델 캐시 폴더")
+    ap.add_argument("--out", default=None, help="결과 JSON 경로 (기본: bench_results/<commit>.json)")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="두 결과 JSON 비교만 수행")
+    args = ap.parse_args()
+
+    if args.compare:
+        _print_compare(*args.compare)
+        sys.exit(0)
+
+    w, h = (int(x) for x in args.resolution.lower().split("x"))
+    res = run_benchmark(args.seconds, args.fps, (w, h), args.static_ratio, args.models, args.stub_size,
+                        [_parse_scenario(s) for s in args.scenario] or None,
+                        args.repeat, args.warmup, args.threads, args.work_dir)
+    out = args.out or os.path.join("bench_results", f"{res['commit'] or time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(res, f, ensure_ascii=False, indent=2)
+    print(f"[OK] 벤치 결과 저장 → {os.path.abspath(out)}")
@@ -1,41 +1,114 @@
-# from transformers import pipeline
-
-# # 허깅페이스 모델 이름
-# model_name = "searle-j/kote_for_easygoing_people"
-
-# # 감정 분류 파이프라인 생성
-# classifier = pipeline("text-classification", model=model_name)
-
-# def classify_emotion(text):
-#     result = classifier(text)
-#     return result[0]["label"]  # 예: '짜증', '무기력' 등
-
-from transformers import pipeline
-
-# KoTE 기반 모델
-model_name = "searle-j/kote_for_easygoing_people"
-classifier = pipeline("text-classification", model=model_name)
-
-# 세부 감정 → 대표 감정 5개 매핑
-emotion_map = {
-    # 기쁨
-    "기쁨": "기쁨", "즐거움": "기쁨", "감동": "기쁨", "설렘": "기쁨", "뿌듯함": "기쁨", "행복": "기쁨", "환영/호의": "기쁨", "감동/감탄": "기쁨", "고마움": "기쁨", "존경": "기쁨", "기대감": "기쁨", "뿌듯함": "기쁨", "편안/쾌적": "기쁨", "아껴주는": "기쁨", "즐거움/신남": "기쁨", "흐뭇함": "기쁨", "귀여움/예쁨": "기쁨", "안심/신뢰": "기쁨",
-    
-    # 슬픔
-    "슬픔": "슬픔", "우울": "슬픔", "무기력": "슬픔", "상실감": "슬픔", "실망": "슬픔", "서운함": "슬픔","안타까움/실망": "슬픔", "절망": "슬픔", "패배/자기혐오": "슬픔", "힘듦/지침": "슬픔", "불행함/연민": "슬픔", "죄책감": "슬픔", "서러움": "슬픔",
-    
-    # 화남
-    "화남": "화남", "짜증": "화남", "불쾌": "화남", "열받음": "화남", "짜증남": "화남", "혐오": "화남", "한심함": "화남", "역겨움/징그러움": "화남", "증오/혐오": "화남", "우쭐댐/무시함": "화남",
-    
-    # 불안
-    "불안": "불안", "초조": "불안", "걱정": "불안", "긴장": "불안", "당황": "불안", "두려움": "불안", "의심/불신": "불안", "부끄러움": "불안", "공포/무서움": "불안", "당황/난처": "불안", "경악": "불안", "부담/안_내킴": "불안", "불안/걱정": "불안", "놀람": "불안",
-    
-    # 중립
-    "중립": "중립", "담담": "중립", "평온": "중립", "무감정": "중립", "혼란": "중립", "귀찮음": "중립", "지긋지긋": "중립", "어이없음": "중립", "재미없음": "중립", "신기하다/관심": "중립", "깨달음": "중립", "비장함": "중립", "없음": "중립"
-}
-
-def classify_emotion(text):
-    result = classifier(text)
-    label = result[0]["label"]
-    mapped_label = emotion_map.get(label, "중립")  # 혹시 없는 감정이면 중립으로 처리
-    return mapped_label
+# from transformers import pipeline
+
+# # 허깅페이스 모델 이름
+# model_name = "searle-j/kote_for_easygoing_people"
+
+# # 감정 분류 파이프라인 생성
+# classifier = pipeline("text-classification", model=model_name)
+
+# def classify_emotion(text):
+#     result = classifier(text)
+#     return result[0]["label"]  # 예: '짜증', '무기력' 등
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+
+from transformers import pipeline
+
+# KoTE 기반 모델
+model_name = "searle-j/kote_for_easygoing_people"
+classifier = pipeline("text-classification", model=model_name)
+
+EMOTION_BATCH_SIZE   = 16     # classify_emotions: 한 번에 모델에 넣을 문장 수
+EMOTION_MAX_LENGTH   = 256    # 토큰 기준 최대 길이 (넘으면 잘라냄)
+EMOTION_CACHE_SIZE   = 4096   # 정규화 텍스트 → 라벨별 점수 LRU 캐시 크기 (0이면 캐시 안 함)
+EMOTION_MULTI_THRESH = 0.3    # 다중 라벨 모드 기본 임계값 (KoTE는 라벨마다 독립 확률)
+
+# 세부 감정 → 대표 감정 5개 매핑
+emotion_map = {
+    # 기쁨
+    "기쁨": "기쁨", "즐거움": "기쁨", "감동": "기쁨", "설렘": "기쁨", "뿌듯함": "기쁨", "행복": "기쁨", "환영/호의": "기쁨", "감동/감탄": "기쁨", "고마움": "기쁨", "존경": "기쁨", "기대감": "기쁨", "뿌듯함": "기쁨", "편안/쾌적": "기쁨", "아껴주는": "기쁨", "즐거움/신남": "기쁨", "흐뭇함": "기쁨", "귀여움/예쁨": "기쁨", "안심/신뢰": "기쁨",
+    
+    # 슬픔
+    "슬픔": "슬픔", "우울": "슬픔", "무기력": "슬픔", "상실감": "슬픔", "실망": "슬픔", "서운함": "슬픔","안타까움/실망": "슬픔", "절망": "슬픔", "패배/자기혐오": "슬픔", "힘듦/지침": "슬픔", "불행함/연민": "슬픔", "죄책감": "슬픔", "서러움": "슬픔",
+    
+    # 화남
+    "화남": "화남", "짜증": "화남", "불쾌": "화남", "열받음": "화남", "짜증남": "화남", "혐오": "화남", "한심함": "화남", "역겨움/징그러움": "화남", "증오/혐오": "화남", "우쭐댐/무시함": "화남",
+    
+    # 불안
+    "불안": "불안", "초조": "불안", "걱정": "불안", "긴장": "불안", "당황": "불안", "두려움": "불안", "의심/불신": "불안", "부끄러움": "불안", "공포/무서움": "불안", "당황/난처": "불안", "경악": "불안", "부담/안_내킴": "불안", "불안/걱정": "불안", "놀람": "불안",
+    
+    # 중립
+    "중립": "중립", "담담": "중립", "평온": "중립", "무감정": "중립", "혼란": "중립", "귀찮음": "중립", "지긋지긋": "중립", "어이없음": "중립", "재미없음": "중립", "신기하다/관심": "중립", "깨달음": "중립", "비장함": "중립", "없음": "중립"
+}
+
+# 라벨별 점수 캐시: AI/부모 답변처럼 같은 문장이 반복되면 모델 생략
+_cache: "OrderedDict[str, List[tuple]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_model_lock = threading.Lock()  # 스트리밍 인식(백그라운드 분류)과 메인 스레드가 동시에 호출할 수 있음
+
+
+def _normalize(text) -> str:
+    """캐시 키: 유니코드 정규화 + 앞뒤/연속 공백 정리"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", str(text or ""))).strip()
+
+
+def _all_scores(texts: List[str]) -> List[List[tuple]]:
+    """
+    정규화된 문장들 → 각 문장의 [(세부 감정, 점수), ...] (점수 내림차순). 캐시에 없는 문장만 배치 추론
+    빈 문장("", 공백뿐)도 예전 classify_emotion처럼 모델에 넣음 (임의로 "중립" 처리하지 않음)
+    """
+    with _cache_lock:
+        found = {t: _cache[t] for t in set(texts) if t in _cache}
+        for t in found:
+            _cache.move_to_end(t)
+    misses = [t for t in dict.fromkeys(texts) if t not in found]
+    if misses:
+        with _model_lock:
+            outs = classifier(misses, batch_size=EMOTION_BATCH_SIZE, top_k=None,
+                              truncation=True, max_length=EMOTION_MAX_LENGTH, padding=True)
+        with _cache_lock:
+            for t, out in zip(misses, outs):
+                found[t] = [(o["label"], float(o["score"])) for o in out]
+                if EMOTION_CACHE_SIZE > 0:
+                    _cache[t] = found[t]
+                    if len(_cache) > EMOTION_CACHE_SIZE:
+                        _cache.popitem(last=False)
+    return [found.get(t, []) for t in texts]
+
+
+def classify_emotions(texts: List[str], top_k: Optional[int] = None,
+                      threshold: Optional[float] = None) -> List[Union[str, Dict]]:
+    """
+    여러 문장 감정 분류 (배치 1번 + 캐시)
+    - 기본: 문장마다 대표 감정 5개 중 하나 (classify_emotion과 같음)
+    - top_k 또는 threshold 지정 시 dict:
+      {"emotion": 대표 감정, "labels": [{"label": 세부 감정, "emotion": 대표 감정, "score": 점수}, ...],
+       "emotions": {대표 감정: 그 대표 감정에 속한 세부 감정 최고 점수}}
+      labels는 점수 상위 top_k개 / threshold 이상 전부 (둘 다 주면 둘 다 만족하는 것)
+    """
+    scores = _all_scores([_normalize(t) for t in texts])
+    if top_k is None and threshold is None:
+        # 혹시 없는 감정이면 중립으로 처리
+        return [emotion_map.get(sc[0][0], "중립") if sc else "중립" for sc in scores]
+    out = []
+    for sc in scores:
+        picked = [(l, p) for l, p in sc if threshold is None or p >= threshold]
+        picked = picked[:top_k] if top_k is not None else picked
+        by_emotion: Dict[str, float] = {}
+        for l, p in picked:
+            e = emotion_map.get(l, "중립")
+            by_emotion[e] = max(by_emotion.get(e, 0.0), round(p, 4))
+        out.append({
+            "emotion": emotion_map.get(sc[0][0], "중립") if sc else "중립",
+            "labels": [{"label": l, "emotion": emotion_map.get(l, "중립"), "score": round(p, 4)} for l, p in picked],
+            "emotions": by_emotion,
+        })
+    return out
+
+
+def classify_emotion(text):
+    return classify_emotions([text])[0]
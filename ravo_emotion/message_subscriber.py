@@ -0,0 +1,196 @@
+# message_subscriber.py
+# 목적: 백엔드 새 메시지 구독 (전체 메시지 목록을 주기적으로 다시 받는 폴링 대체)
+# - 시작 시점의 마지막 메시지 id를 커서로 잡고, 그 이후 메시지만 받음 (기록이 쌓여도 요청 비용 일정)
+# - SSE(/messages/stream) 우선, 안 되면 롱폴링(/messages/poll?since=)으로 자동 전환
+# - 끊기면 커서부터 다시 연결 → 놓치거나 중복되는 메시지 없음
+# - get(timeout, cancel)로 대기 시간 제한/중간 취소 가능
+# 사용: sub = MessageSubscription(modes=("VOICE",), flags=("PARENTS",))
+#      rows = sub.get(timeout=60)   # 새 메시지 목록 (시간 초과면 [])
+#      sub.close()
+
+import json
+import queue
+import socket
+import threading
+import time
+from typing import Optional, Sequence
+
+from backend_client import BackendClient, get_backend
+
+STREAM_PATH      = "/messages/stream"
+POLL_PATH        = "/messages/poll"
+POLL_HOLD_SEC    = 25     # 롱폴링 1번에 서버가 붙잡고 있는 최대 시간
+SSE_IDLE_SEC     = 40     # SSE 하트비트(15초)가 이 시간 동안 없으면 끊고 다시 연결
+RECONNECT_SEC    = 1.0    # 연결 실패 후 첫 재연결 대기, 연속 실패마다 2배
+RECONNECT_MAX    = 30.0
+TRANSPORTS       = ("auto", "sse", "longpoll")
+
+
+class MessageSubscription:
+    """
+    modes/flags: 받을 메시지 조건 (m_mode / chat_flag, 비우면 전체)
+    since: 이 id 이후 메시지부터 (None이면 생성 시점의 마지막 메시지 이후 = 지금부터 오는 것만)
+    transport: "auto"(SSE → 실패 시 롱폴링) | "sse" | "longpoll"
+    """
+    def __init__(self, modes: Sequence[str] = (), flags: Sequence[str] = (),
+                 since: Optional[int] = None, transport: str = "auto",
+                 client: Optional[BackendClient] = None):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"transport는 {TRANSPORTS} 중 하나: {transport}")
+        self.client = client or get_backend()
+        self.params = {}
+        if modes:
+            self.params["mode"] = ",".join(modes)
+        if flags:
+            self.params["flag"] = ",".join(flags)
+        self.transport = "longpoll" if transport == "longpoll" else "sse"
+        self._fallback = transport == "auto"
+        self._rows: "queue.Queue" = queue.Queue()
+        self._closed = threading.Event()
+        self._resp = None  # 열려 있는 SSE 응답 (close()에서 끊음)
+
+        # 커서는 생성자에서 바로 잡음 → 이 시점 이후 저장된 메시지는 하나도 놓치지 않음
+        self.cursor = since if since is not None else self._latest_cursor()
+        self._thread = threading.Thread(target=self._run, name="message-subscription", daemon=True)
+        self._thread.start()
+
+    # ---------- 공개 API ----------
+    def get(self, timeout: Optional[float] = None, cancel: Optional[threading.Event] = None) -> list:
+        """새 메시지가 올 때까지 대기 → 메시지 목록 (id 오름차순). timeout 초과/취소/종료 시 []"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._closed.is_set() and not (cancel and cancel.is_set()):
+            wait = 0.2 if deadline is None else min(0.2, deadline - time.monotonic())
+            if wait <= 0:
+                break
+            try:
+                rows = self._rows.get(timeout=wait)
+            except queue.Empty:
+                continue
+            while True:  # 이미 도착해 있는 것까지 한 번에
+                try:
+                    rows += self._rows.get_nowait()
+                except queue.Empty:
+                    return rows
+        return []
+
+    def close(self):
+        self._closed.set()
+        resp = self._resp
+        if resp is not None:
+            _abort(resp)  # 읽기 대기 중인 SSE 연결 끊기
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 수신 스레드 ----------
+    def _latest_cursor(self) -> Optional[int]:
+        try:
+            r = self.client.get(POLL_PATH, params=self.params, timeout=(3, 10))
+            r.raise_for_status()
+            return int(r.json()["cursor"])
+        except Exception as e:
+            print(f"⚠️ 구독 시작 커서 조회 실패(첫 연결 시점부터 수신): {e}")
+            return None
+
+    def _push(self, rows):
+        if rows:
+            self.cursor = rows[-1]["id"]
+            self._rows.put(rows)
+
+    def _run(self):
+        fails = 0
+        while not self._closed.is_set():
+            try:
+                if self.transport == "sse":
+                    self._run_sse()
+                else:
+                    self._poll_once()
+                fails = 0
+            except _NoStream:
+                print("ℹ️ SSE 미지원 백엔드 → 롱폴링으로 구독")
+                self.transport = "longpoll"
+            except Exception as e:
+                if self._closed.is_set():
+                    return
+                fails += 1
+                if self.transport == "sse" and self._fallback and fails >= 3:
+                    print(f"ℹ️ SSE 연결 반복 실패({e}) → 롱폴링으로 구독")
+                    self.transport, fails = "longpoll", 0
+                    continue
+                delay = min(RECONNECT_MAX, RECONNECT_SEC * 2 ** (fails - 1))
+                print(f"⚠️ 메시지 구독 연결 실패({e}) → {delay:.0f}초 후 재연결")
+                self._closed.wait(delay)
+
+    def _poll_once(self):
+        params = dict(self.params, timeout=POLL_HOLD_SEC)
+        if self.cursor is not None:
+            params["since"] = self.cursor
+        r = self.client.get(POLL_PATH, params=params, timeout=(3, POLL_HOLD_SEC + 10))
+        r.raise_for_status()
+        j = r.json()
+        if self.cursor is None:
+            self.cursor = int(j["cursor"])
+            return
+        self._push(j.get("data") or [])
+
+    def _run_sse(self):
+        params = dict(self.params)
+        if self.cursor is not None:
+            params["since"] = self.cursor
+        resp = self.client.get(STREAM_PATH, params=params, stream=True, timeout=(3, SSE_IDLE_SEC),
+                               headers={"Accept": "text/event-stream"})
+        if resp.status_code == 404 and self._fallback:
+            resp.close()
+            raise _NoStream()
+        resp.raise_for_status()
+        self._resp = resp
+        try:
+            event, data = "message", []
+            for raw in resp.iter_lines(chunk_size=None):
+                if self._closed.is_set():
+                    return
+                line = raw.decode("utf-8")  # SSE는 항상 UTF-8 (헤더에 charset이 없어도)
+                if line:
+                    field, _, value = line.partition(":")
+                    value = value[1:] if value.startswith(" ") else value
+                    if field == "event":
+                        event = value
+                    elif field == "data":
+                        data.append(value)
+                    continue
+                # 빈 줄 = 이벤트 끝 (":" 로 시작하는 하트비트는 data 없이 지나감)
+                if data:
+                    payload = json.loads("\n".join(data))
+                    if event == "ready":
+                        if self.cursor is None:
+                            self.cursor = int(payload["cursor"])
+                    else:
+                        self._push([payload])
+                event, data = "message", []
+        finally:
+            self._resp = None
+            resp.close()
+        if not self._closed.is_set():
+            raise ConnectionError("SSE 연결이 끊김")
+
+
+class _NoStream(Exception):
+    pass
+
+
+def _abort(resp):
+    """
+    다른 스레드가 읽고 있는 스트리밍 응답 끊기
+    resp.close()만 하면 읽는 쪽이 잡은 버퍼 lock 때문에 다음 하트비트(최대 15초)까지 막힘 → 소켓을 먼저 shutdown
+    """
+    conn = getattr(resp.raw, "_connection", None)
+    sock = getattr(conn, "sock", None)
+    try:
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+        resp.close()
+    except OSError:
+        pass
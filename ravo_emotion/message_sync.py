@@ -0,0 +1,214 @@
+# message_sync.py
+# 목적: 백엔드 메시지의 로컬 증분 동기화 + 메모리 인덱스
+# - MessageSubscription으로 커서(id) 이후 새 메시지만 받아 인덱스에 추가 (전체 재다운로드/재정렬 X)
+# - 인덱스 키: (대화, chatFlag, m_mode) 조합별 deque → 조건 조회가 해당 키 크기에만 비례
+#   (대화 = chatNo, 없으면 createdDate의 날짜 — 백엔드 대화 목록(/messages/chatlist)과 같은 기준)
+# - chatNo 없는 메시지(백엔드 DB에 chat_no 컬럼이 아직 없을 때)는 어느 대화로 조회해도 같이 나옴
+# - 키마다 최근 SYNC_HISTORY 건만 보관 → 메시지가 10만 건 넘게 쌓여도 메모리 일정
+# - id는 서버에서 증가 순으로 오므로 deque는 늘 id 오름차순, 새 메시지 조회는 뒤에서부터 커서까지만
+# 사용: sync = MessageSync(modes=("VOICE",))
+#      mark = sync.cursor
+#      rows = sync.wait(mark, flag="PARENTS", timeout=60)   # mark 이후 부모 메시지
+#      sync.watch(mark, on_rows, flag="PARENTS", timeout=60) # 기다리지 않고 콜백으로
+#      sync.close()
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import product
+from typing import Callable, List, Optional, Sequence
+
+from backend_client import BackendClient
+from message_subscriber import MessageSubscription
+
+SYNC_HISTORY = 1000   # 인덱스 키마다 보관할 최근 메시지 수
+
+ANY = "*"
+NO_CHAT = "?"   # chatNo 없이 온 메시지를 따로 모으는 대화 키
+
+
+def chat_key(row: dict) -> str:
+    """메시지가 속한 대화: chatNo가 있으면 그 값, 없으면 저장 날짜(서버 로컬 기준 YYYY-MM-DD)"""
+    chat = row.get("chatNo", row.get("chat_no"))
+    if chat is not None:
+        return str(chat)
+    s = str(row.get("createdDate") or "")
+    try:
+        return datetime.fromisoformat(s.replace("Z", "+00:00")).astimezone().date().isoformat()
+    except ValueError:
+        return s[:10]
+
+
+def _flag(row: dict) -> str:
+    return (row.get("chatFlag") or row.get("chat_flag") or "").upper().strip()
+
+
+def _mode(row: dict) -> str:
+    return (row.get("m_mode") or row.get("mode") or "").upper().strip()
+
+
+class MessageSync:
+    """
+    modes/flags: 동기화할 범위 (구독 조건, 비우면 전체)
+    history: 인덱스 키마다 보관할 최근 메시지 수
+    since: 이 id 이후부터 (None이면 생성 시점 이후 = 지금부터 오는 메시지)
+    """
+    def __init__(self, modes: Sequence[str] = (), flags: Sequence[str] = (),
+                 history: int = SYNC_HISTORY, since: Optional[int] = None,
+                 transport: str = "auto", client: Optional[BackendClient] = None):
+        self.history = max(1, history)
+        self._index = {}   # (chat, flag, mode) → deque(rows, id 오름차순)
+        self._watchers = []   # watch(): (key, after_id, callback, deadline, cancel)
+        self._cond = threading.Condition()
+        self._sub = MessageSubscription(modes=modes, flags=flags, since=since,
+                                        transport=transport, client=client)
+        self.cursor = self._sub.cursor   # 인덱스에 반영된 마지막 id
+        self.last_created = None         # 마지막 메시지의 createdDate
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="message-sync", daemon=True)
+        self._thread.start()
+
+    # ---------- 조회 ----------
+    def after(self, after_id: Optional[int], chat=None, flag=None, mode=None) -> list:
+        """after_id 이후 조건에 맞는 메시지 (id 오름차순). 새로 온 개수만큼만 훑음"""
+        with self._cond:
+            return self._after(after_id, self._key(chat, flag, mode))
+
+    def recent(self, n: int, chat=None, flag=None, mode=None) -> list:
+        """조건에 맞는 최근 n건 (id 오름차순)"""
+        with self._cond:
+            rows = self._index.get(self._key(chat, flag, mode), ())
+            return list(rows)[-n:] if n > 0 else []
+
+    def wait(self, after_id: Optional[int], chat=None, flag=None, mode=None,
+             timeout: Optional[float] = None, cancel: Optional[threading.Event] = None) -> list:
+        """after_id 이후 조건에 맞는 메시지가 생길 때까지 대기 → 메시지 목록 (시간 초과/취소/종료 시 [])"""
+        key = self._key(chat, flag, mode)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                rows = self._after(after_id, key)
+                if rows or self._closed.is_set() or (cancel and cancel.is_set()):
+                    return rows
+                left = 0.2 if deadline is None else min(0.2, deadline - time.monotonic())
+                if left <= 0:
+                    return []
+                self._cond.wait(left)   # 짧게 끊어 기다리며 cancel 확인
+
+    def watch(self, after_id: Optional[int], callback: Callable[[list], None], chat=None, flag=None, mode=None,
+              timeout: Optional[float] = None, cancel: Optional[threading.Event] = None):
+        """
+        wait()의 콜백판 (기다리는 동안 스레드를 붙잡지 않음): 메시지가 생기면 callback(rows) 한 번
+        시간 초과/취소/종료 시 callback([]) — 만료·취소는 동기화 스레드가 1초 간격으로 확인
+        callback은 동기화 스레드(이미 메시지가 있으면 호출한 스레드)에서 불림 → 오래 걸리는 일은 다른 스레드로
+        """
+        key = self._key(chat, flag, mode)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            rows = self._after(after_id, key)
+            if not rows and not self._closed.is_set():
+                self._watchers.append((key, after_id, callback, deadline, cancel))
+                return
+        callback(rows)
+
+    def close(self):
+        self._closed.set()
+        self._sub.close()
+        with self._cond:
+            self._cond.notify_all()
+            fire = self._take_watchers(time.monotonic())
+        self._fire(fire)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 내부 ----------
+    @staticmethod
+    def _key(chat, flag, mode):
+        return (ANY if chat is None else str(chat),
+                ANY if flag is None else flag.upper(),
+                ANY if mode is None else mode.upper())
+
+    def _after(self, after_id, key) -> list:
+        out = self._after_key(after_id, key)
+        if key[0] not in (ANY, NO_CHAT):   # 대화를 지정한 조회 → chatNo 없는 메시지도 (id 순으로 합침)
+            extra = self._after_key(after_id, (NO_CHAT,) + key[1:])
+            if extra:
+                out = sorted({row["id"]: row for row in out + extra}.values(), key=lambda row: row["id"])
+        return out
+
+    def _after_key(self, after_id, key) -> list:
+        rows = self._index.get(key)
+        if not rows:
+            return []
+        if after_id is None:
+            return list(rows)
+        out = []
+        for row in reversed(rows):   # 뒤(최신)에서부터 커서까지만
+            if row["id"] <= after_id:
+                break
+            out.append(row)
+        out.reverse()
+        return out
+
+    def _apply(self, rows):
+        with self._cond:
+            for row in rows:
+                if self.cursor is not None and row["id"] <= self.cursor:
+                    continue  # 재연결로 겹쳐 온 메시지
+                keys = (chat_key(row), _flag(row), _mode(row))
+                # 각 차원을 "값" 또는 "전체(*)"로 둔 8가지 조합 모두에 추가
+                combos = list(product(*((k, ANY) for k in keys)))
+                if row.get("chatNo", row.get("chat_no")) is None:
+                    combos += product((NO_CHAT,), (keys[1], ANY), (keys[2], ANY))
+                for key in combos:
+                    dq = self._index.get(key)
+                    if dq is None:
+                        dq = self._index[key] = deque(maxlen=self.history)
+                    dq.append(row)
+                self.cursor = row["id"]
+                self.last_created = row.get("createdDate")
+            self._cond.notify_all()
+            fire = self._take_watchers()
+        self._fire(fire)
+
+    def _take_watchers(self, now: Optional[float] = None) -> List[tuple]:
+        """(lock 안) 발동할 watch 꺼내기 → [(callback, rows)]. now를 주면 만료/취소된 것도 rows=[]로"""
+        fire, keep = [], []
+        for w in self._watchers:
+            key, after_id, callback, deadline, cancel = w
+            rows = self._after(after_id, key)
+            if rows:
+                fire.append((callback, rows))
+            elif now is not None and (self._closed.is_set() or (cancel is not None and cancel.is_set())
+                                      or (deadline is not None and now >= deadline)):
+                fire.append((callback, []))
+            else:
+                keep.append(w)
+        self._watchers = keep
+        return fire
+
+    @staticmethod
+    def _fire(fire):
+        for callback, rows in fire:   # lock 밖에서 (콜백이 다시 watch 할 수 있음)
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"⚠️ 메시지 watch 콜백 오류: {e}")
+
+    def _run(self):
+        while not self._closed.is_set():
+            rows = self._sub.get(timeout=1.0, cancel=self._closed)
+            if rows:
+                self._apply(rows)
+            elif self.cursor is None and self._sub.cursor is not None:
+                with self._cond:
+                    self.cursor = self._sub.cursor   # 시작 커서를 첫 연결에서 받은 경우
+            if self._watchers:
+                with self._cond:
+                    fire = self._take_watchers(time.monotonic())
+                self._fire(fire)
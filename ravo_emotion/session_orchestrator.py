@@ -0,0 +1,282 @@
+# session_orchestrator.py
+# 목적: 여러 가정(아이)의 음성 대화 세션을 한 프로세스에서 동시에 처리 (아이마다 프로세스 1개 X)
+# - 세션 = 대화(chatNo) 1개: EmotionReport / 수동모드 키("chat:<chatNo>") / STT→감정→대화→TTS 파이프라인 따로
+# - 턴 처리는 공용 스레드 풀에서, 같은 세션의 턴은 항상 하나씩 순서대로 (세션끼리는 동시에)
+# - 모델/외부 API 호출(리포트의 육아 팁/요약 GPT 포함)은 단계별 세마포어로 프로세스 전체 동시 실행 수 제한
+#   (STT/감정 모델은 메모리·GPU 보호, GPT/TTS는 API 폭주 방지)
+# - 부모 답장 대기는 세션들이 MessageSync 1개(VOICE, chatNo 기준 인덱스)를 같이 씀 → 세션 수만큼 연결 X
+#   기다리는 동안은 풀 스레드를 놓고(MessageSync.watch) 답장이 오면 풀에서 이어서 처리
+# 사용: python main.py --mode sessions --sessions-dir ./sessions
+#      (sessions/<chatNo>/1.wav, 2.wav ... 폴더 하나 = 세션 하나)
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from stt_module import transcribe_audio
+from tts_module import speak_text
+from message_sync import MessageSync
+from write_behind import get_writer
+from voice_turn import (PARENT_REPLY_TIMEOUT, EmotionReport, begin_turn, finish_parent_turn, finish_report,
+                        mode_key_for, own_child_id, pick_parent_reply)
+
+MAX_TURN_WORKERS = 32   # 동시에 처리할 수 있는 턴 수 (부모 답장 대기 중인 세션은 스레드를 차지하지 않음)
+STAGE_LIMITS = {        # 단계별 프로세스 전체 동시 실행 수
+    "stt": 1,           # whisper 모델 1개 공유
+    "emotion": 2,       # KoTE 분류 모델 1개 공유
+    "chat": 8,          # GPT API
+    "tts": 4,           # gTTS API
+}
+
+
+class StageLimiter:
+    """단계 이름별 세마포어 + 대기/실행 시간 집계 (어느 단계가 병목인지 확인용)"""
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = {**STAGE_LIMITS, **(limits or {})}
+        self._sems = {k: threading.BoundedSemaphore(max(1, v)) for k, v in self.limits.items()}
+        self._lock = threading.Lock()
+        self.stats = {k: {"calls": 0, "wait_sec": 0.0, "run_sec": 0.0} for k in self.limits}
+
+    def run(self, stage: str, fn: Callable, *args):
+        sem = self._sems[stage]
+        t0 = time.perf_counter()
+        with sem:
+            t1 = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                t2 = time.perf_counter()
+                with self._lock:
+                    st = self.stats[stage]
+                    st["calls"] += 1
+                    st["wait_sec"] += t1 - t0
+                    st["run_sec"] += t2 - t1
+
+
+@dataclass
+class SessionConfig:
+    chat_no: int
+    user_no: int = 1                 # 아이 메시지의 user_no (항상 1)
+    mode_key: Optional[str] = None   # 수동모드 키 (None이면 "chat:<chat_no>")
+    speak: Callable = speak_text     # TTS 출력 (가정별 기기로 보내려면 교체)
+
+    @property
+    def session_id(self) -> str:
+        return f"chat{self.chat_no}"
+
+
+class ConversationSession:
+    """대화 세션 1개: 자기 리포트와 턴 대기열을 가지고, 턴을 하나씩 처리"""
+    def __init__(self, config: SessionConfig, orchestrator: "SessionOrchestrator"):
+        self.config = config
+        self.id = config.session_id
+        self.mode_key = config.mode_key or mode_key_for(config.chat_no)
+        self.report = EmotionReport(user_no=config.user_no, chat_no=config.chat_no, run=orchestrator.limiter.run)
+        self.cancel = threading.Event()   # 중단 시 부모 답장 대기/남은 턴 건너뜀
+        self.closed = False
+        self.turns = 0
+        self.errors = 0
+        self._orch = orchestrator
+        self._pending = deque()           # (audio_path, Future)
+        self._running = False
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def submit(self, audio_path: str) -> Future:
+        """턴 1개(아이 음성 파일) 등록 → 처리 끝나면 인식 텍스트가 결과인 Future"""
+        fut = Future()
+        with self._lock:
+            if self.closed:
+                raise RuntimeError(f"세션 {self.id}는 이미 닫혔습니다")
+            self._pending.append((audio_path, fut))
+            self._idle.clear()
+            if not self._running:   # 처리 중이 아니면 풀에 이 세션 차례를 하나 넣음
+                self._running = True
+                self._orch.pool.submit(self._drain)
+        return fut
+
+    def _drain(self, resume=None):
+        """
+        대기열이 빌 때까지 이 세션의 턴을 순서대로 처리 (세션당 동시 실행 1개)
+        수동모드 턴은 부모 답장을 기다리는 동안 스레드를 풀에 돌려주고(_await_parent),
+        답장이 오거나 시간이 지나면 resume=(fut, audio_path, user_text, parent_msg)로 다시 불림
+        """
+        if resume is not None:
+            fut, audio_path, user_text, parent_msg = resume
+            try:
+                finish_parent_turn(self.report, parent_msg, speak=self.config.speak,
+                                   run=self._orch.limiter.run, tag=self.id)
+                self.turns += 1
+                fut.set_result(user_text)
+            except Exception as e:
+                self._fail(fut, audio_path, e)
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    self._idle.set()
+                    return
+                audio_path, fut = self._pending.popleft()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                user_text, manual, mark = self._run_turn(audio_path)
+            except Exception as e:
+                self._fail(fut, audio_path, e)
+                continue
+            if manual:
+                # 답장이 올 때까지 이 세션 차례는 비워 둠 (_running 유지 → 새 턴은 대기열에서 기다림)
+                self._await_parent(fut, audio_path, user_text, mark, time.monotonic() + PARENT_REPLY_TIMEOUT)
+                return
+            if user_text:
+                self.turns += 1
+            fut.set_result(user_text)
+
+    def _fail(self, fut: Future, audio_path: str, e: Exception):
+        self.errors += 1
+        print(f"[{self.id}] ❌ 턴 처리 실패({os.path.basename(audio_path)}): {e}")
+        fut.set_exception(e)
+
+    def _run_turn(self, audio_path: str):
+        """STT + 턴 앞부분 → (인식 텍스트, 수동모드 여부, 부모 답장 기준 커서)"""
+        run = self._orch.limiter.run
+        user_text = run("stt", transcribe_audio, audio_path)
+        print(f"\n[{self.id}] 👶 인식된 텍스트({os.path.basename(audio_path)}): {user_text}")
+        if not user_text or self.cancel.is_set():
+            return user_text, False, None
+        manual, mark = begin_turn(self.report, self._orch.voice_sync, user_text,
+                                  user_no=self.config.user_no, chat_no=self.config.chat_no,
+                                  mode_key=self.mode_key, speak=self.config.speak, run=run, tag=self.id)
+        return user_text, manual, mark
+
+    def _await_parent(self, fut: Future, audio_path: str, user_text: str, since, deadline: float,
+                      saved: bool = False):
+        """
+        이 대화(chatNo)의 부모 답장을 콜백으로 기다림 → 오면(또는 시간 초과/취소) 풀에서 _drain 재개
+        saved=False: 먼저 이번 턴 아이 메시지가 저장돼 돌아오길 기다려 그 id 이후 부모 메시지만 답장으로 봄
+        """
+        def on_child(rows):
+            child_id = own_child_id(rows, user_text)
+            if rows and time.monotonic() < deadline and not self.cancel.is_set():
+                self._await_parent(fut, audio_path, user_text, rows[-1]["id"] if child_id is None else child_id,
+                                   deadline, saved=child_id is not None)
+                return
+            self._orch.pool.submit(self._drain, (fut, audio_path, user_text, None))
+
+        def on_rows(rows):
+            msg = pick_parent_reply(rows, user_text)
+            if msg is None and rows and time.monotonic() < deadline and not self.cancel.is_set():
+                # 답장으로 안 치는 메시지(빈 내용/아이 말 되풀이)만 왔으면 그 뒤부터 계속 대기
+                self._await_parent(fut, audio_path, user_text, rows[-1]["id"], deadline, saved=True)
+                return
+            self._orch.pool.submit(self._drain, (fut, audio_path, user_text, msg))
+
+        self._orch.voice_sync.watch(since, on_rows if saved else on_child, chat=self.config.chat_no,
+                                    flag="PARENTS" if saved else "CHILD",
+                                    timeout=max(0.0, deadline - time.monotonic()), cancel=self.cancel)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        return self._idle.wait(timeout)
+
+    def close(self, report: bool = True, abort: bool = False):
+        """
+        새 턴은 받지 않고 남은 턴 처리 후 리포트 마무리 (report=False면 요약 생략)
+        abort: 남은 턴은 취소하고 진행 중인 부모 답장 대기도 중단
+        """
+        with self._lock:
+            self.closed = True
+            if abort:
+                self.cancel.set()
+                while self._pending:
+                    self._pending.popleft()[1].cancel()
+        self.wait_idle()
+        if report and self.report.text_log:
+            finish_report(self.report, tag=self.id)
+
+
+class SessionOrchestrator:
+    """
+    max_workers: 동시에 진행할 턴 수 (세션 수와 무관하게 스레드 수 고정)
+    limits: STAGE_LIMITS 덮어쓰기 (예: {"stt": 2})
+    """
+    def __init__(self, max_workers: int = MAX_TURN_WORKERS, limits: Optional[Dict[str, int]] = None):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="session")
+        self.limiter = StageLimiter(limits)
+        # 부모 답장은 chatNo로 구분 (세션마다 구독 연결을 따로 열지 않음)
+        self.voice_sync = MessageSync(modes=("VOICE",))
+        self.sessions: Dict[str, ConversationSession] = {}
+        self._lock = threading.Lock()
+
+    def open(self, config: SessionConfig) -> ConversationSession:
+        with self._lock:
+            if config.session_id in self.sessions:
+                return self.sessions[config.session_id]
+            sess = self.sessions[config.session_id] = ConversationSession(config, self)
+        print(f"🟢 세션 시작: {sess.id} (수동모드 키 {sess.mode_key})")
+        return sess
+
+    def submit_turn(self, session_id: str, audio_path: str) -> Future:
+        return self.sessions[session_id].submit(audio_path)
+
+    def close_session(self, session_id: str, report: bool = True, abort: bool = False):
+        with self._lock:
+            sess = self.sessions.pop(session_id, None)
+        if sess is not None:
+            sess.close(report, abort)
+            print(f"🔴 세션 종료: {sess.id} (턴 {sess.turns}개, 실패 {sess.errors}개)")
+
+    def shutdown(self, report: bool = True, abort: bool = False):
+        """모든 세션을 닫고(세션끼리는 동시에 마무리) 메시지 전송까지 정리"""
+        closing = [threading.Thread(target=self.close_session, args=(sid, report, abort))
+                   for sid in list(self.sessions)]
+        for t in closing:
+            t.start()
+        for t in closing:
+            t.join()
+        self.pool.shutdown(wait=True)
+        self.voice_sync.close()
+        if not get_writer().flush(timeout=10):
+            print(f"⏳ 미전송 메시지 {get_writer().pending()}건은 백그라운드/다음 실행에서 계속 전송")
+        print("⏱️ 단계별 사용량:", {k: {"calls": v["calls"], "wait": round(v["wait_sec"], 2), "run": round(v["run_sec"], 2)}
+                                  for k, v in self.limiter.stats.items() if v["calls"]})
+
+
+def run_sessions(sessions_dir: str, max_workers: int = MAX_TURN_WORKERS,
+                 limits: Optional[Dict[str, int]] = None):
+    """
+    sessions_dir 아래 폴더마다 세션 1개 (폴더명 = chatNo), 폴더 안 N.wav 를 번호 순서대로 턴으로 처리
+    세션들은 동시에, 한 세션 안의 턴은 순서대로
+    """
+    if not os.path.isdir(sessions_dir):
+        print(f"❌ 디렉토리 {sessions_dir} 가 존재하지 않습니다.")
+        return
+
+    orch = SessionOrchestrator(max_workers=max_workers, limits=limits)
+    t0 = time.perf_counter()
+    opened = 0
+    for name in sorted(os.listdir(sessions_dir)):
+        folder = os.path.join(sessions_dir, name)
+        if not (os.path.isdir(folder) and name.isdigit()):
+            continue
+        wavs = sorted((f for f in os.listdir(folder) if f.endswith(".wav")),
+                      key=lambda x: int(os.path.splitext(x)[0]))
+        sess = orch.open(SessionConfig(chat_no=int(name)))
+        opened += 1
+        for f in wavs:
+            sess.submit(os.path.join(folder, f))
+
+    abort = False
+    try:
+        for sess in list(orch.sessions.values()):
+            while not sess.wait_idle(0.5):   # Ctrl+C를 받을 수 있게 짧게 끊어 대기
+                pass
+    except KeyboardInterrupt:
+        print("\n👋 세션 종료 중...")
+        abort = True
+    orch.shutdown(abort=abort)
+    print(f"✅ 세션 {opened}개 처리 ({time.perf_counter() - t0:.1f}s)")
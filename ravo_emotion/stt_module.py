@@ -1,6 +1,293 @@
-import whisper
-
-def transcribe_audio(audio_path):
-    model = whisper.load_model("base")
-    result = model.transcribe(audio_path)
-    return result["text"]
\ No newline at end of file
+import os
+import time
+import wave
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Union
+
+import numpy as np
+import torch
+import whisper
+
+try:
+    import webrtcvad  # 있으면 VAD에 사용 (없으면 에너지 기반 VAD)
+except ImportError:
+    webrtcvad = None
+
+# Whisper 설정 (환경변수로 바꿀 수 있음)
+WHISPER_MODEL    = os.getenv("RAVO_WHISPER_MODEL", "base")  # tiny | base | small | medium | large-v3 ...
+WHISPER_DEVICE   = os.getenv("RAVO_WHISPER_DEVICE")         # None이면 cuda 있으면 cuda, 없으면 cpu
+WHISPER_FP16     = True     # GPU에서 fp16 디코딩 (CPU에선 무시, 항상 fp32)
+WHISPER_INT8     = os.getenv("RAVO_WHISPER_INT8") == "1"    # CPU에서 Linear 가중치 int8 동적 양자화
+WHISPER_LANGUAGE = os.getenv("RAVO_WHISPER_LANGUAGE")       # "ko"로 고정하면 언어 감지 생략
+STT_BATCH_SIZE   = 8        # transcribe_many: 30초 이하 파일을 몇 개씩 묶어 한 번에 디코딩할지
+STT_LOAD_WORKERS = 4        # transcribe_many: 오디오 로드(ffmpeg) + log-mel 계산 병렬 스레드 수
+
+# 스트리밍 인식: PCM 청크 → VAD로 발화 구간 검출 → 말하는 중 partial, 끝점에서 final
+VAD_FRAME_MS        = 30      # VAD 판정 단위
+VAD_AGGRESSIVENESS  = 2       # webrtcvad 모드 (0~3, 클수록 잡음에 엄격)
+VAD_ENERGY_DB       = -45.0   # 에너지 VAD: 이 dBFS 이상 + 잡음 바닥보다 VAD_SNR_DB 이상 크면 음성
+VAD_SNR_DB          = 10.0
+VAD_CALIBRATE_MS    = 300     # 스트림 앞부분 이 구간 dB 중앙값으로 잡음 바닥 초기화
+VAD_FLOOR_RISE_DB   = 0.1     # 이후 잡음 바닥 추적: 더 작은 프레임이면 바로 내려가고, 아니면 프레임당 이만큼만 올라감
+ENDPOINT_SILENCE_MS = 600     # 음성 뒤 이만큼 조용하면 발화 끝 → final
+MIN_SPEECH_MS       = 200     # 이보다 짧은 음성 구간은 잡음으로 보고 버림
+PRE_ROLL_MS         = 200     # 발화 시작 직전 오디오도 포함 (첫 음절 잘림 방지)
+PARTIAL_INTERVAL_MS = 1000    # 말하는 중 이 간격(새 오디오 기준)마다 지금까지 구간을 partial 인식
+MAX_UTTERANCE_SEC   = 25.0    # 이보다 긴 발화는 강제로 끊어 final (whisper 30초 창 안에서 처리)
+
+# 모델은 (이름, 장치, int8)별로 프로세스당 1번만 로드
+_MODELS = {}
+_LOCK = threading.Lock()
+
+
+def _quantize_int8(model):
+    """whisper.model.Linear(가중치를 입력 dtype으로 캐스팅하는 nn.Linear 서브클래스) → nn.Linear로 바꾼 뒤 int8 동적 양자화"""
+    for m in model.modules():
+        if isinstance(m, whisper.model.Linear):
+            m.__class__ = torch.nn.Linear  # 추가 상태 없음 (CPU fp32에선 forward도 동일)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def get_model(name: str = WHISPER_MODEL, device: Optional[str] = WHISPER_DEVICE, int8: bool = WHISPER_INT8):
+    """캐시된 Whisper 모델 (처음 호출 때만 로드, 스레드 안전)"""
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    int8 = int8 and device == "cpu"
+    key = (name, device, int8)
+    with _LOCK:
+        model = _MODELS.get(key)
+        if model is None:
+            model = whisper.load_model(name, device=device)
+            if int8:
+                model = _quantize_int8(model)
+            _MODELS[key] = model
+        return model
+
+
+def _fp16(model) -> bool:
+    return WHISPER_FP16 and model.device.type == "cuda"
+
+
+def transcribe_audio(audio_path):
+    model = get_model()
+    result = model.transcribe(audio_path, fp16=_fp16(model), language=WHISPER_LANGUAGE)
+    return result["text"]
+
+
+def _load_mel(path: str, n_mels: int):
+    """(오디오, 30초 패딩 log-mel). 30초 넘는 파일은 mel=None → 일반 transcribe로 처리"""
+    audio = whisper.load_audio(path)
+    if len(audio) > whisper.audio.N_SAMPLES:
+        return audio, None
+    return audio, whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels)
+
+
+def transcribe_many(audio_paths: List[str], batch_size: int = STT_BATCH_SIZE,
+                    workers: int = STT_LOAD_WORKERS) -> List[str]:
+    """
+    여러 파일을 한 번에 인식 → 입력 순서대로 텍스트
+    - 오디오 로드(ffmpeg 서브프로세스) + log-mel은 스레드 풀에서 미리 계산 (디코딩과 겹침)
+    - 30초 이하 파일(대화 한 턴)은 batch_size개씩 묶어 whisper.decode 1번 (temperature 0, 타임스탬프 없음)
+    - 30초 넘는 파일은 transcribe_audio와 같은 경로 (긴 오디오 분할/temperature fallback)
+    """
+    model = get_model()
+    opts = whisper.DecodingOptions(language=WHISPER_LANGUAGE, fp16=_fp16(model), without_timestamps=True)
+    texts: List[Optional[str]] = [None] * len(audio_paths)
+    batch_ids, batch_mels = [], []
+
+    def _flush():
+        results = whisper.decode(model, torch.stack(batch_mels).to(model.device), opts)
+        for i, r in zip(batch_ids, results):
+            texts[i] = r.text
+        batch_ids.clear(); batch_mels.clear()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        loaded = pool.map(lambda p: _load_mel(p, model.dims.n_mels), audio_paths)  # 순서 유지, 앞서서 계산
+        for i, (audio, mel) in enumerate(loaded):
+            if mel is None:
+                texts[i] = model.transcribe(audio, fp16=_fp16(model), language=WHISPER_LANGUAGE)["text"]
+                continue
+            batch_ids.append(i); batch_mels.append(mel)
+            if len(batch_mels) >= max(1, batch_size):
+                _flush()
+        if batch_mels:
+            _flush()
+    return texts
+
+
+def transcribe_ahead(audio_paths: List[str], batch_size: int = STT_BATCH_SIZE) -> Iterator[str]:
+    """
+    입력 순서대로 텍스트를 하나씩 — 받는 쪽이 한 턴을 처리하는 동안 다음 파일들을 백그라운드에서 인식
+    - 첫 파일은 혼자 인식 (첫 턴이 전체 인식을 기다리지 않게), 이후는 batch_size개씩 transcribe_many
+    - 항상 한 묶음만 앞서 인식 (턴 처리와 겹치는 정도로만, 미리 쌓아 두지 않음)
+    """
+    chunks = [audio_paths[:1]] + [audio_paths[i:i + max(1, batch_size)]
+                                  for i in range(1, len(audio_paths), max(1, batch_size))]
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-ahead")
+    try:
+        nxt = pool.submit(transcribe_many, chunks[0], batch_size) if audio_paths else None
+        for k in range(len(chunks) if audio_paths else 0):
+            texts = nxt.result()
+            nxt = pool.submit(transcribe_many, chunks[k + 1], batch_size) if k + 1 < len(chunks) else None
+            yield from texts
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# -----------------------------
+# 스트리밍 인식
+# -----------------------------
+@dataclass
+class SttEvent:
+    kind: str        # "partial" (말하는 중, 바뀔 수 있음) | "final" (발화 끝, 확정)
+    text: str
+    t_start: float   # 스트림 시작 기준 발화 구간 (초)
+    t_end: float
+
+
+def _to_mono_f32(pcm: Union[bytes, np.ndarray], channels: int) -> np.ndarray:
+    """bytes(int16 LE) 또는 int16/float 배열 → [-1, 1] float32 모노"""
+    if isinstance(pcm, (bytes, bytearray, memoryview)):
+        x = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    else:
+        x = np.asarray(pcm)
+        x = x.astype(np.float32) / 32768.0 if x.dtype == np.int16 else x.astype(np.float32)
+    if channels > 1:
+        x = x[: len(x) // channels * channels].reshape(-1, channels).mean(axis=1)
+    return x
+
+
+def _resample(x: np.ndarray, sr: int) -> np.ndarray:
+    """sr → 16 kHz (선형 보간, 발화 구간 단위로 한 번에)"""
+    if sr == whisper.audio.SAMPLE_RATE or len(x) == 0:
+        return x
+    n = int(round(len(x) * whisper.audio.SAMPLE_RATE / sr))
+    return np.interp(np.arange(n) * (sr / whisper.audio.SAMPLE_RATE), np.arange(len(x)), x).astype(np.float32)
+
+
+class StreamingTranscriber:
+    """
+    PCM 청크를 받는 대로 VAD → 발화 구간마다 partial/final SttEvent
+    - feed(chunk): 청크 크기 자유 (bytes int16 / int16·float 배열), 새로 생긴 이벤트 리스트 반환
+    - close(): 스트림 끝 (진행 중인 발화를 final로)
+    - 인식은 feed를 부른 스레드에서 바로 실행 (오디오 수신이 막히면 안 되면 별도 스레드에서 feed)
+    """
+    def __init__(self, sample_rate: int = whisper.audio.SAMPLE_RATE, channels: int = 1,
+                 partials: bool = True, model=None):
+        self.sr = sample_rate
+        self.channels = channels
+        self.partials = partials
+        self.model = model or get_model()
+        self.opts = whisper.DecodingOptions(language=WHISPER_LANGUAGE, fp16=_fp16(self.model),
+                                            without_timestamps=True)
+        self.frame = int(self.sr * VAD_FRAME_MS / 1000)
+        self._vad = webrtcvad.Vad(VAD_AGGRESSIVENESS) \
+            if webrtcvad is not None and self.sr in (8000, 16000, 32000, 48000) else None
+        self._noise_db: Optional[float] = None  # 에너지 VAD 잡음 바닥 (dBFS)
+        self._cal_db: List[float] = []
+        self._pending = np.zeros(0, np.float32)  # 아직 VAD 프레임 하나가 안 된 샘플
+        self._pre: List[np.ndarray] = []         # 발화 전 pre-roll 프레임
+        self._utt: List[np.ndarray] = []         # 현재 발화 프레임 (말하는 중이면 비어 있지 않음)
+        self._utt_start = 0                      # 발화 시작 샘플 위치
+        self._speech_frames = 0
+        self._silence_frames = 0
+        self._since_partial = 0
+        self._pos = 0                            # 처리한 샘플 수 (스트림 시간)
+
+    def _is_speech(self, fr: np.ndarray) -> bool:
+        if self._vad is not None:
+            return self._vad.is_speech((np.clip(fr, -1, 1) * 32767).astype(np.int16).tobytes(), self.sr)
+        db = 10 * np.log10(float(np.mean(fr * fr)) + 1e-10)
+        if db > -80:  # 디지털 무음(0 패딩)은 잡음 바닥 추정에서 제외
+            if len(self._cal_db) < max(1, VAD_CALIBRATE_MS // VAD_FRAME_MS):
+                self._cal_db.append(db)
+                self._noise_db = float(np.median(self._cal_db))
+            else:
+                self._noise_db = min(db, self._noise_db + VAD_FLOOR_RISE_DB)
+        return db >= VAD_ENERGY_DB and db >= (self._noise_db if self._noise_db is not None else -80) + VAD_SNR_DB
+
+    def _decode(self, audio: np.ndarray) -> str:
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(_resample(audio, self.sr)), self.model.dims.n_mels)
+        return whisper.decode(self.model, mel.to(self.model.device), self.opts).text
+
+    def _event(self, kind: str) -> Optional[SttEvent]:
+        audio = np.concatenate(self._utt)
+        text = self._decode(audio).strip()
+        if not text:
+            return None
+        return SttEvent(kind, text, round(self._utt_start / self.sr, 2),
+                        round((self._utt_start + len(audio)) / self.sr, 2))
+
+    def _finish(self) -> List[SttEvent]:
+        ev = self._event("final") if self._speech_frames * VAD_FRAME_MS >= MIN_SPEECH_MS else None
+        self._utt, self._speech_frames, self._silence_frames, self._since_partial = [], 0, 0, 0
+        return [ev] if ev else []
+
+    def feed(self, pcm: Union[bytes, np.ndarray]) -> List[SttEvent]:
+        x = np.concatenate([self._pending, _to_mono_f32(pcm, self.channels)])
+        n = len(x) // self.frame * self.frame
+        self._pending = x[n:]
+        out: List[SttEvent] = []
+        pre_max = max(1, PRE_ROLL_MS // VAD_FRAME_MS)
+        for off in range(0, n, self.frame):
+            fr = x[off:off + self.frame]
+            speech = self._is_speech(fr)
+            self._pos += self.frame
+            if not self._utt:
+                if not speech:
+                    self._pre = (self._pre + [fr])[-pre_max:]
+                    continue
+                # 발화 시작: pre-roll 포함
+                self._utt = self._pre + [fr]
+                self._utt_start = self._pos - self.frame * len(self._utt)
+                self._pre = []
+                self._speech_frames, self._silence_frames, self._since_partial = 1, 0, 1
+                continue
+            self._utt.append(fr)
+            self._since_partial += 1
+            if speech:
+                self._speech_frames += 1
+                self._silence_frames = 0
+            else:
+                self._silence_frames += 1
+            if (self._silence_frames * VAD_FRAME_MS >= ENDPOINT_SILENCE_MS
+                    or len(self._utt) * VAD_FRAME_MS >= MAX_UTTERANCE_SEC * 1000):
+                out += self._finish()
+            elif (self.partials and self._since_partial * VAD_FRAME_MS >= PARTIAL_INTERVAL_MS
+                  and self._speech_frames * VAD_FRAME_MS >= MIN_SPEECH_MS):
+                self._since_partial = 0
+                ev = self._event("partial")
+                if ev:
+                    out.append(ev)
+        return out
+
+    def close(self) -> List[SttEvent]:
+        if len(self._pending) and self._utt:
+            self._utt.append(self._pending)
+        self._pending = np.zeros(0, np.float32)
+        return self._finish() if self._utt else []
+
+
+def stream_wav_file(path: str, chunk_ms: int = 100, realtime: bool = True,
+                    partials: bool = True) -> Iterator[SttEvent]:
+    """
+    로컬 wav(PCM16)를 chunk_ms씩 실시간 속도로 흘려 넣으며 인식 (스트리밍 테스트/데모용)
+    realtime=False면 기다리지 않고 최대 속도로
+    """
+    with wave.open(path, "rb") as wf:
+        assert wf.getsampwidth() == 2, "16-bit PCM wav만 지원"
+        stt = StreamingTranscriber(wf.getframerate(), wf.getnchannels(), partials=partials)
+        per_chunk = max(1, int(wf.getframerate() * chunk_ms / 1000))
+        t0 = time.monotonic()
+        sent = 0
+        while True:
+            data = wf.readframes(per_chunk)
+            if not data:
+                break
+            sent += len(data) // (2 * wf.getnchannels())
+            if realtime:
+                # 청크가 "도착"하는 시각까지 대기 (마이크 입력처럼)
+                time.sleep(max(0.0, t0 + sent / wf.getframerate() - time.monotonic()))
+            yield from stt.feed(data)
+    yield from stt.close()
@@ -0,0 +1,138 @@
+# test_backend_client.py
+# 목적: 공용 백엔드 클라이언트(BackendClient / AsyncBackendClient)의 연결·타임아웃·재시도 동작 확인
+# - 로컬 http.server 스텁(HTTP/1.1 keep-alive)으로 실제 소켓을 통해 호출
+# - keep-alive 연결 재사용, 읽기 타임아웃, GET의 503 재시도, POST는 5xx에 재시도 안 함, asyncio API 동시 실행
+# 사용: cd ravo_emotion && python -m pytest -q test_backend_client.py
+
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from backend_client import AsyncBackendClient, BackendClient
+
+SLOW_SEC = 0.3   # /slow 응답 지연(초)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    disable_nagle_algorithm = True  # 헤더/본문을 따로 써도 지연 ACK에 안 걸리게
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None):
+        data = json.dumps(body or {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        if n:
+            self.rfile.read(n)
+        stub = self.server
+        with stub.lock:
+            stub.hits[(self.command, self.path)] += 1
+            stub.ports.add(self.client_address[1])
+            hit = stub.hits[(self.command, self.path)]
+        if self.path == "/slow":
+            time.sleep(SLOW_SEC)
+            return self._reply(200, {"ok": True})
+        if self.path == "/flaky":   # 처음 2번은 503, 그다음부터 200
+            return self._reply(503 if hit <= 2 else 200, {"hit": hit})
+        if self.path == "/error":
+            return self._reply(503, {"ok": False})
+        return self._reply(200, {"ok": True, "hit": hit})
+
+    do_GET = do_POST = _handle
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = Counter()
+    server.ports = set()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    server.base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub):
+    c = BackendClient(stub.base, backoff=0.01)
+    yield c
+    c.close()
+
+
+def test_keep_alive_reuses_connection(stub, client):
+    for _ in range(20):
+        assert client.get("/ping").status_code == 200
+        assert client.post("/ping", json={"a": 1}).status_code == 200
+    assert stub.hits[("GET", "/ping")] == 20
+    assert len(stub.ports) == 1   # 요청 40번이 연결 1개로
+
+
+def test_full_url_bypasses_base(stub):
+    c = BackendClient("http://127.0.0.1:9")   # 닫힌 포트: base로 가면 실패
+    try:
+        assert c.get(f"{stub.base}/ping").json()["ok"]
+    finally:
+        c.close()
+
+
+def test_default_read_timeout(stub):
+    c = BackendClient(stub.base, timeout=(1.0, SLOW_SEC / 3), retries=0)
+    try:
+        t0 = time.perf_counter()
+        # 읽기 타임아웃 → 재시도 0번이라 바로 예외 (urllib3 MaxRetryError → requests ConnectionError)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            c.get("/slow")
+        assert time.perf_counter() - t0 < SLOW_SEC
+        assert c.get("/slow", timeout=SLOW_SEC * 5).status_code == 200   # 호출별 timeout이 우선
+    finally:
+        c.close()
+
+
+def test_get_retries_on_503(stub, client):
+    r = client.get("/flaky")
+    assert r.status_code == 200 and r.json()["hit"] == 3
+    assert stub.hits[("GET", "/flaky")] == 3
+
+
+def test_get_returns_last_response_when_retries_run_out(stub, client):
+    r = client.get("/error")
+    assert r.status_code == 503
+    assert stub.hits[("GET", "/error")] == 1 + 3   # 처음 1번 + 재시도 RETRIES번
+
+
+def test_post_not_retried_after_5xx(stub, client):
+    r = client.post("/flaky", json={"content": "x"})
+    assert r.status_code == 503
+    assert stub.hits[("POST", "/flaky")] == 1   # 서버가 이미 저장했을 수 있음 → 다시 보내지 않음
+
+
+def test_async_client_runs_requests_concurrently(stub, client):
+    async def run():
+        async with AsyncBackendClient(client, workers=8) as api:
+            t0 = time.perf_counter()
+            rs = await asyncio.gather(*(api.get("/slow") for _ in range(8)),
+                                      api.post("/ping", json={"a": 1}))
+            return rs, time.perf_counter() - t0
+
+    rs, wall = asyncio.run(run())
+    assert [r.status_code for r in rs] == [200] * 9
+    assert stub.hits[("GET", "/slow")] == 8 and stub.hits[("POST", "/ping")] == 1
+    assert wall < SLOW_SEC * 4   # 순서대로였으면 8 × SLOW_SEC
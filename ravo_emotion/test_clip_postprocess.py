@@ -0,0 +1,278 @@
+# test_clip_postprocess.py
+# 목적: 클립 후처리 벡터화(_clip_arrays / _group_events_arr / _abnormal_runs / _action_time)가
+#      예전 리스트 기반 구현과 같은 결과를 내는지 확인
+# - 기준 구현: 예전 _group_events, 이상 run-length 루프(j 증가 누락 수정본), 예전 _summarize, 윈도우별 ClipPred 생성
+# - 10만 클립 이상의 합성 타임라인(라벨/확률/플래그)으로 이벤트·반복 플래그·이상 구간·요약 비교
+# - 모델은 안 씀: _analyze는 _read_meta/_infer_video를 합성 WindowPreds로 바꿔서 실행
+# - JSON 스트리밍 저장: 추론 중 on_rows 조각으로 쓴 클립이 load_report 결과와 같은지
+# 사용: cd ravo_emotion && python -m pytest -q test_clip_postprocess.py
+
+import json
+
+import numpy as np
+import pytest
+
+import ai_behavior_engine as abe
+from ai_behavior_engine import ClipPred, Event, WindowPreds, load_report
+
+N_CLIPS  = 120_000
+FPS      = 30.0
+WIN_STEP = 24      # 윈도우 시작 간격(원본 프레임): stride 8 × (30fps / 10fps)
+WIN_SPAN = 45      # 윈도우 첫~마지막 프레임 간격: (16 - 1) × 3
+
+ACTION_LABELS = ["walking the dog", "running on treadmill", "jogging", "sitting", "sleeping",
+                 "jumping jacks", "hopping", "standing", "dancing", "reading book", "eating", "clapping"]
+ABNORMAL_LABELS = ["non-violence", "violence"]
+
+
+# -----------------------------
+# 기준 구현 (벡터화 전 코드)
+# -----------------------------
+def ref_group_events(labels, confs, starts, ends):
+    if not labels: return []
+    res = []
+    cur = labels[0]; cur_s = starts[0]; buf = [confs[0]]
+    for i in range(1, len(labels)):
+        if labels[i] == cur:
+            buf.append(confs[i])
+        else:
+            res.append(Event(cur, cur_s, ends[i-1], float(np.mean(buf))))
+            cur = labels[i]; cur_s = starts[i]; buf = [confs[i]]
+    res.append(Event(cur, cur_s, ends[-1], float(np.mean(buf))))
+    return res
+
+
+def ref_abnormal_runs(flags, probs, starts, ends, min_consec):
+    abnormal_flags = []
+    i = 0
+    while i < len(flags):
+        if not flags[i]:
+            i += 1
+            continue
+        j = i
+        buf_conf = []
+        while j < len(flags) and flags[j]:
+            buf_conf.append(probs[j])
+            j += 1
+        if (j - i) >= min_consec:
+            abnormal_flags.append(Event("abnormal", starts[i], ends[j-1], float(np.mean(buf_conf))))
+        i = j
+    return abnormal_flags
+
+
+def ref_summarize(duration, action_events, rep_flags, ab_flags):
+    per_sec = {}
+    for ev in action_events:
+        per_sec.setdefault(ev.type, 0.0)
+        per_sec[ev.type] += (ev.t_end - ev.t_start)
+    total = sum(per_sec.values()) or 1e-6
+    dist = {k: round(v/total, 4) for k, v in per_sec.items()}
+    return {
+        "duration_sec": round(duration, 2),
+        "action_time_sec": {k: round(v,2) for k,v in per_sec.items()},
+        "action_time_ratio": dist,
+        "top_actions": sorted(dist.items(), key=lambda x:x[1], reverse=True)[:5],
+        "repetition_flags_count": len(rep_flags),
+        "abnormal_flags_count": len(ab_flags),
+    }
+
+
+def ref_clips(eng, preds):
+    """윈도우마다 예전 analyze() 루프와 같은 방식으로 ClipPred 생성"""
+    v_idx, n_idx = abe._abnormal_indices(preds.abnormal_labels)
+    clips = []
+    for w in range(len(preds.win_first)):
+        probs = preds.a_probs[w]
+        top = probs.argsort()[-5:][::-1]
+        a_topk = [(preds.action_labels[int(i)], float(probs[int(i)])) for i in top]
+        a_label, a_prob = a_topk[0]
+        coarse = abe._coarse(a_label)
+        if a_prob < eng.action_conf_thresh:
+            coarse = "other"
+        b_probs = preds.b_probs[w]
+        p_ab = float(b_probs[v_idx])
+        p_nm = float(b_probs[n_idx])
+        ab_flag = (p_ab >= eng.ab_thresh) and ((p_ab - p_nm) >= eng.ab_margin)
+        clips.append(ClipPred(
+            t_start=round(preds.win_first[w] / FPS, 2), t_end=round(preds.win_last[w] / FPS, 2),
+            action_topk=[(l, round(p, 4)) for l, p in a_topk],
+            action_top1=a_label, action_prob=float(round(a_prob, 4)),
+            coarse=coarse,
+            abnormal_label=preds.abnormal_labels[int(np.argmax(b_probs))], abnormal_prob=float(round(p_ab, 4)),
+            abnormal_flag=bool(ab_flag),
+        ))
+    return clips
+
+
+# -----------------------------
+# 합성 타임라인
+# -----------------------------
+def _runs_of(rng, n, mean_len, values):
+    """평균 길이 mean_len인 구간마다 values 중 하나 → 길이 n 타임라인"""
+    lens = rng.geometric(1.0 / mean_len, size=n // max(1, mean_len // 4) + 1)
+    vals = rng.choice(values, size=len(lens))
+    return np.repeat(vals, lens)[:n]
+
+
+def synthetic_preds(n, seed):
+    """구간 구조가 있는 윈도우 확률: 행동 주 클래스는 수십 클립씩 유지, 이상 구간도 뭉쳐서 발생"""
+    rng = np.random.default_rng(seed)
+    C = len(ACTION_LABELS)
+    cls = _runs_of(rng, n, 60, np.arange(C))
+    a = rng.random((n, C)) * 0.05
+    # 대부분은 확신(top-1 > ACTION_CONF_THRESH), 일부는 애매해서 other로 끊기게
+    a[np.arange(n), cls] += np.where(rng.random(n) < 0.95, rng.uniform(0.4, 1.0, n), rng.uniform(0.0, 0.15, n))
+    a = (a / a.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    state = _runs_of(rng, n, 30, np.array([False, False, True]))
+    p_ab = np.where(state, rng.uniform(0.6, 1.0, n), rng.uniform(0.0, 0.75, n))
+    b = np.stack([1.0 - p_ab, p_ab], axis=1).astype(np.float32)
+
+    first = np.arange(n, dtype=np.int64) * WIN_STEP
+    return WindowPreds(orig_fps=FPS, win_first=first, win_last=first + WIN_SPAN, a_probs=a, b_probs=b,
+                       action_labels=list(ACTION_LABELS), abnormal_labels=list(ABNORMAL_LABELS))
+
+
+def _assert_events_equal(got, ref):
+    assert len(got) == len(ref)
+    for g, r in zip(got, ref):
+        assert (g.type, g.t_start, g.t_end) == (r.type, r.t_start, r.t_end)
+        assert g.avg_conf == pytest.approx(r.avg_conf, rel=1e-9, abs=1e-12)   # 합산 순서만 다름
+
+
+def _assert_summary_equal(got, ref):
+    assert got["duration_sec"] == ref["duration_sec"]
+    assert got["repetition_flags_count"] == ref["repetition_flags_count"]
+    assert got["abnormal_flags_count"] == ref["abnormal_flags_count"]
+    for key in ("action_time_sec", "action_time_ratio"):
+        assert list(got[key]) == list(ref[key])   # 키 순서 = 타입이 처음 나온 순서
+        assert got[key] == pytest.approx(ref[key], abs=1e-9)
+    assert [k for k, _ in got["top_actions"]] == [k for k, _ in ref["top_actions"]]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return abe.AIBehaviorEngine(load_models=False, pred_cache_dir=None)
+
+
+# -----------------------------
+# 단위 함수
+# -----------------------------
+@pytest.mark.parametrize("seed", [0, 1])
+def test_group_events_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    labels = _runs_of(rng, 150_000, 8, np.array(abe.COARSE_LABELS)).tolist()
+    confs = np.round(rng.random(len(labels)), 4).tolist()
+    starts = np.round(np.arange(len(labels)) * 0.8, 2).tolist()
+    ends = np.round(np.arange(len(labels)) * 0.8 + 1.5, 2).tolist()
+    _assert_events_equal(abe._group_events(labels, confs, starts, ends),
+                         ref_group_events(labels, confs, starts, ends))
+
+
+@pytest.mark.parametrize("min_consec", [1, 3, abe.ABNORMAL_MIN_CONSEC])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_abnormal_runs_matches_reference(seed, min_consec):
+    rng = np.random.default_rng(seed)
+    n = 150_000
+    flags = _runs_of(rng, n, 12, np.array([False, True]))
+    flags[rng.random(n) < 0.05] ^= True   # 구간 중간 끊김/짧은 튐
+    probs = np.round(rng.random(n), 4)
+    starts = np.round(np.arange(n) * 0.8, 2)
+    ends = np.round(np.arange(n) * 0.8 + 1.5, 2)
+    got = abe._abnormal_runs(flags, probs, starts, ends, min_consec)
+    ref = ref_abnormal_runs(flags.tolist(), probs.tolist(), starts.tolist(), ends.tolist(), min_consec)
+    assert got
+    _assert_events_equal(got, ref)
+
+
+@pytest.mark.parametrize("flags", [[], [False] * 5, [True] * 12, [True], [True, False] * 6 + [True] * 10])
+def test_abnormal_runs_edges(flags):
+    flags = np.array(flags, dtype=bool)
+    n = len(flags)
+    probs, starts, ends = np.linspace(0, 1, n), np.arange(n, dtype=np.float64), np.arange(n) + 1.5
+    for min_consec in (1, 10):
+        _assert_events_equal(abe._abnormal_runs(flags, probs, starts, ends, min_consec),
+                             ref_abnormal_runs(flags.tolist(), probs.tolist(), starts.tolist(), ends.tolist(),
+                                               min_consec))
+
+
+def test_group_events_edges():
+    assert abe._group_events([], [], [], []) == []
+    _assert_events_equal(abe._group_events(["sitting"], [0.5], [0.0], [1.5]),
+                         ref_group_events(["sitting"], [0.5], [0.0], [1.5]))
+
+
+# -----------------------------
+# _clip_arrays + _analyze 후처리 전체
+# -----------------------------
+def test_clip_arrays_matches_reference(engine):
+    preds = synthetic_preds(N_CLIPS, seed=2)
+    assert engine._clip_arrays(preds).to_clips() == ref_clips(engine, preds)
+
+
+@pytest.mark.parametrize("seed", [3, 4])
+def test_analyze_postprocess_matches_reference(engine, monkeypatch, seed):
+    preds = synthetic_preds(N_CLIPS, seed)
+    frame_count = int(preds.win_last[-1]) + 1
+    monkeypatch.setattr(abe, "_read_meta", lambda path: (FPS, frame_count))
+    monkeypatch.setattr(engine, "_infer_video", lambda *a, **kw: (preds, {}))
+    rep, _ = engine._analyze("synthetic.mp4")
+
+    clips = ref_clips(engine, preds)
+    assert rep.clips == clips
+    action_events = ref_group_events([c.coarse for c in clips], [c.action_prob for c in clips],
+                                     [c.t_start for c in clips], [c.t_end for c in clips])
+    repetition_flags = [ev for ev in action_events
+                        if ev.type in engine.rep_targets and (ev.t_end - ev.t_start) >= engine.rep_min_sec]
+    abnormal_flags = ref_abnormal_runs([c.abnormal_flag for c in clips], [c.abnormal_prob for c in clips],
+                                       [c.t_start for c in clips], [c.t_end for c in clips], engine.ab_min_consec)
+    # 합성 데이터가 세 종류 이벤트를 모두 충분히 만드는지 (비교가 빈 목록끼리 통과하지 않게)
+    assert len(action_events) > 1000 and repetition_flags and abnormal_flags
+
+    _assert_events_equal(rep.action_events, action_events)
+    _assert_events_equal(rep.repetition_flags, repetition_flags)
+    _assert_events_equal(rep.abnormal_flags, abnormal_flags)
+    _assert_summary_equal(rep.summary, ref_summarize(frame_count / FPS, action_events, repetition_flags,
+                                                     abnormal_flags))
+
+
+def _slice_preds(preds, lo, hi):
+    return WindowPreds(orig_fps=preds.orig_fps, win_first=preds.win_first[lo:hi], win_last=preds.win_last[lo:hi],
+                       a_probs=preds.a_probs[lo:hi], b_probs=preds.b_probs[lo:hi],
+                       action_labels=preds.action_labels, abnormal_labels=preds.abnormal_labels)
+
+
+@pytest.mark.parametrize("streamed", [True, False])
+def test_analyze_streams_clips_to_json(engine, monkeypatch, tmp_path, streamed):
+    preds = synthetic_preds(20_000, seed=5)
+    frame_count = int(preds.win_last[-1]) + 1
+    calls = []
+
+    def fake_infer(path, fps, n, on_rows=None):
+        # 추론 루프처럼 배치 단위로 확정된 윈도우를 넘김 (on_rows=None이면 analyze가 끝에 기록)
+        if streamed and on_rows is not None:
+            for lo in range(0, len(preds.win_first), 777):
+                on_rows(_slice_preds(preds, lo, lo + 777))
+                calls.append(lo)
+        return preds, {}
+
+    video = tmp_path / "synthetic.mp4"
+    video.write_bytes(b"")
+    monkeypatch.setattr(abe, "_read_meta", lambda path: (FPS, frame_count))
+    monkeypatch.setattr(engine, "_infer_video", fake_infer)
+    if not streamed:
+        monkeypatch.setattr(engine, "_streams_rows", lambda: False)
+    out = tmp_path / "report.json"
+    rep = engine.analyze(str(video), save_json=str(out))
+
+    assert isinstance(rep.clips, abe.ClipList) and len(calls) == (26 if streamed else 0)
+    clips = ref_clips(engine, preds)
+    assert list(rep.clips) == clips
+    assert rep.clips[-1] == clips[-1] and rep.clips[100:103] == clips[100:103]
+    loaded = load_report(str(out))
+    assert loaded.clips == clips
+    assert (loaded.video_path, loaded.duration_sec) == (rep.video_path, rep.duration_sec)
+    assert loaded.summary == json.loads(json.dumps(rep.summary))   # top_actions 튜플 → JSON 리스트
+    for key in abe._EVENT_KEYS:
+        assert [e.__dict__ for e in getattr(loaded, key)] == [abe._ev2d(e) for e in getattr(rep, key)]
+    assert loaded.params == rep.params and loaded.timings == rep.timings
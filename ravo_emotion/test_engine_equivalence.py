@@ -0,0 +1,199 @@
+# test_engine_equivalence.py
+# 목적: 추론 최적화 옵션을 켜도 결과가 기준 실행(윈도우별 단건 추론, 순차 디코딩)과 같은지 확인
+# - 모델/영상: bench_behavior의 랜덤 가중치 스텁 모델 + 합성 영상 (다운로드 없음, 10초 단위 정적/동적 구간 교대)
+# - 배치 추론(batch_size 8 vs 1) → 윈도우별 확률이 같은지
+# - 공유 전처리(프레임 캐시) vs 모델별 HF processor → 윈도우별 확률이 같은지
+# - 스레드 리더(별도 스레드 디코딩) → 윈도우별 확률이 같은지
+# - 이상 모델 온디맨드 → 대상 윈도우 전수 추론과 같은 이상 구간 (+ AbnormalScheduler 단독 퍼즈)
+# - 적응형 stride → 행동 이벤트 경계가 촘촘한 실행과 fine stride 1개 이내
+# 사용: cd ravo_emotion && python -m pytest -q test_engine_equivalence.py
+
+import numpy as np
+import pytest
+
+import ai_behavior_engine as abe
+import bench_behavior
+
+VIDEO_SEC  = 40      # 합성 영상 길이(초) → 윈도우 약 50개
+PROB_ATOL  = 1e-5    # 윈도우별 확률 허용 오차 (배치/전처리 경로에 따른 float 합 순서 차이)
+
+
+@pytest.fixture(scope="module")
+def stub(tmp_path_factory):
+    root = tmp_path_factory.mktemp("stub")
+    models = bench_behavior.build_stub_models(str(root))
+    video = bench_behavior.make_synthetic_video(str(root / "video.mp4"), seconds=VIDEO_SEC, width=320, height=240)
+    return models, video
+
+
+def make_engine(stub, **kw):
+    models, _ = stub
+    return abe.AIBehaviorEngine(**{**models, "pred_cache_dir": None, **kw})
+
+
+def infer(stub, **kw):
+    """엔진 설정 kw로 영상 전체 추론 → (엔진, WindowPreds)"""
+    eng = make_engine(stub, **kw)
+    video = stub[1]
+    orig_fps, frame_count = abe._read_meta(video)
+    preds, _ = eng._infer_video(video, orig_fps, frame_count)
+    return eng, preds
+
+
+@pytest.fixture(scope="module")
+def baseline(stub):
+    """기준 실행: 윈도우별 단건 추론, 디코딩/추론 같은 스레드"""
+    return infer(stub, batch_size=1, pipeline=False, threaded_reader=False)[1]
+
+
+def assert_same_preds(got, ref):
+    np.testing.assert_array_equal(got.win_first, ref.win_first)
+    np.testing.assert_array_equal(got.win_last, ref.win_last)
+    np.testing.assert_allclose(got.a_probs, ref.a_probs, rtol=0, atol=PROB_ATOL)
+    np.testing.assert_allclose(got.b_probs, ref.b_probs, rtol=0, atol=PROB_ATOL)
+
+
+def split_threshold(values):
+    """값들을 둘로 나누는 임계값: 가운데(20~80%) 값들 사이 가장 넓은 틈의 중간 (float 오차로 판정이 안 뒤집히게)"""
+    v = np.unique(np.asarray(values, np.float64))
+    v = v[int(len(v) * 0.2):max(int(len(v) * 0.8), int(len(v) * 0.2) + 2)]
+    k = int(np.argmax(np.diff(v)))
+    return float((v[k] + v[k + 1]) / 2)
+
+
+def run_spans(events):
+    return [(e.t_start, e.t_end) for e in events]
+
+
+# -----------------------------
+# 배치 / 전처리 / 디코딩 경로
+# -----------------------------
+@pytest.mark.parametrize("batch_size", [2, 8])
+def test_batched_inference_matches_single(stub, baseline, batch_size):
+    _, preds = infer(stub, batch_size=batch_size, pipeline=False)
+    assert_same_preds(preds, baseline)
+
+
+def test_batched_pipeline_matches_single(stub, baseline):
+    _, preds = infer(stub, batch_size=8, pipeline=True)
+    assert_same_preds(preds, baseline)
+
+
+def test_shared_preprocess_matches_hf_processor(stub, baseline):
+    eng, preds = infer(stub, batch_size=1, pipeline=False, shared_preprocess=False)
+    assert not eng.shared_preprocess
+    assert_same_preds(preds, baseline)
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_threaded_reader_matches_sequential(stub, baseline, pipeline):
+    _, preds = infer(stub, batch_size=1, pipeline=pipeline, threaded_reader=True)
+    assert_same_preds(preds, baseline)
+
+
+# -----------------------------
+# 이상 모델 온디맨드
+# -----------------------------
+def ref_runs(flags, elig, min_consec):
+    """대상 윈도우 전수 추론 기준: (이상 플래그 & 대상)이 min_consec 이상 이어진 구간 [(시작, 끝)]"""
+    x = np.arange(len(flags))
+    return run_spans(abe._abnormal_runs(np.asarray(flags) & np.asarray(elig), np.zeros(len(x)), x, x, min_consec))
+
+
+def schedule(flags, elig, stride, rng):
+    """엔진처럼 윈도우를 배치 단위로 AbnormalScheduler에 넣고 → 이상 모델을 돌린 윈도우 집합"""
+    sched = abe.AbnormalScheduler(stride)
+    ran, i, n = set(), 0, len(flags)
+    while i < n:
+        j = min(n, i + int(rng.integers(1, 9)))
+        for k in range(i, j):
+            sched.add(k, bool(elig[k]))
+        for k in sched.sampled():
+            ran.add(k)
+            sched.set_flag(k, bool(flags[k]))
+        ran.update(sched.resolve())
+        i = j
+    ran.update(sched.finish())
+    return ran
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_abnormal_scheduler_matches_full_runs(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 300))
+    min_consec = int(rng.integers(1, 9))
+    stride = int(rng.integers(1, min_consec + 1))
+    # 이상 플래그는 길이가 제각각인 구간으로, 대상 여부는 윈도우마다 랜덤
+    flags = np.repeat(rng.random(n) < 0.4, rng.integers(1, 2 * min_consec + 2, n))[:n]
+    elig = rng.random(n) < rng.uniform(0.5, 1.0)
+
+    ran = schedule(flags, elig, stride, rng)
+    assert all(elig[i] for i in ran)               # 대상이 아닌 윈도우는 안 돌림
+    done = np.zeros(n, bool); done[list(ran)] = True
+    assert ref_runs(flags & done, elig, min_consec) == ref_runs(flags, elig, min_consec)
+
+
+@pytest.mark.parametrize("partial", [False, True])
+def test_abnormal_on_demand_matches_full(stub, baseline, partial):
+    """대상 전부(partial=False) / 행동 확신도로 절반쯤(True): 이상 구간이 대상 윈도우 전수 추론과 같음"""
+    p_ab, _ = abe._abnormal_pn(baseline.b_probs, baseline.abnormal_labels)
+    conf = baseline.a_probs.max(axis=1)
+    min_consec = 3
+    eng, preds = infer(stub, batch_size=4, abnormal_on_demand=True, abnormal_sparse_stride=min_consec,
+                       abnormal_prob_thresh=split_threshold(p_ab), abnormal_margin=-1.0,
+                       abnormal_min_consec=min_consec, abnormal_triggers=set(),
+                       abnormal_motion_min=float("inf"),
+                       abnormal_low_conf=split_threshold(conf) if partial else 2.0)
+    elig = eng._ab_eligible(baseline.a_probs, np.zeros(len(conf)))
+    assert (0 < elig.sum() < len(elig)) if partial else elig.all()
+    assert preds.b_done.sum() < len(elig)          # 이상 모델을 실제로 건너뛴 윈도우가 있음
+
+    full = eng._clip_arrays(baseline)
+    expected = abe._abnormal_runs(full.ab_flag & elig, full.ab_prob, full.t_start, full.t_end, min_consec)
+    assert expected                                # 비교할 이상 구간이 있어야 의미 있음
+    ca = eng._clip_arrays(preds)
+    got = abe._abnormal_runs(ca.ab_flag, ca.ab_prob, ca.t_start, ca.t_end, min_consec)
+    assert run_spans(got) == run_spans(expected)
+    np.testing.assert_allclose([e.avg_conf for e in got], [e.avg_conf for e in expected], atol=1e-4)
+
+
+# -----------------------------
+# 적응형 stride
+# -----------------------------
+def test_adaptive_stride_boundaries_within_fine_stride(stub):
+    # 정적 구간(모션 게이트 → other) / 동적 구간(stub 모델 top-1 → playing)이 번갈아 나오는 행동 타임라인
+    kw = dict(motion_gate=True, action_conf_thresh=0.0, batch_size=4)
+    video = stub[1]
+    dense = make_engine(stub, **kw).analyze(video)
+    eng = make_engine(stub, adaptive_stride=True, adaptive_factor=4, **kw)
+    adapt = eng.analyze(video)
+
+    info = adapt.params["adaptive"]
+    assert info["filled_windows"] > 0              # 실제로 윈도우를 건너뜀
+    assert len(dense.action_events) >= 4
+    tol = eng.stride / eng.sample_fps + 1e-6       # fine stride 1개(초)
+    assert [e.type for e in adapt.action_events] == [e.type for e in dense.action_events]
+    for a, d in zip(adapt.action_events, dense.action_events):
+        assert abs(a.t_start - d.t_start) <= tol and abs(a.t_end - d.t_end) <= tol
+
+
+# -----------------------------
+# 모델 레지스트리
+# -----------------------------
+def test_registry_warmup_recorded_when_backend_falls_back():
+    """GPU에선 요청한 CPU 백엔드가 무시됨(clf.backend = eager) → 로드 때 키와 워밍업 키가 같아야 warmup_sec 기록"""
+    from types import SimpleNamespace
+    import torch
+
+    reg = abe.ModelRegistry()
+    cuda, dtype = torch.device("cuda"), torch.float16
+    key = reg.key("videomae", "stub", cuda, dtype, "int8")   # get()이 로드할 때 쓰는 키 (요청값 int8)
+    reg._info[key] = {"load_sec": 0.0, "warmup_sec": None}
+    clf = SimpleNamespace(arch="videomae", model_name="stub", device=cuda, dtype=dtype, backend="eager",
+                          predict_proba_batch=lambda batch: None)
+    reg.warmup(clf)
+    assert [s["warmup_sec"] for s in reg.stats()] != [None]
+    assert reg.stats()[0]["backend"] == "eager"
+    # CPU에선 백엔드마다 다른 모델
+    cpu = torch.device("cpu")
+    assert reg.key("videomae", "stub", cpu, dtype, "int8") != reg.key("videomae", "stub", cpu, dtype, "eager")
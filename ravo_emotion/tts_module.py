@@ -1,10 +1,10 @@
-from gtts import gTTS
-import os
-import time
-
-def speak_text(text):
-    filename = f"response_{int(time.time())}.mp3"
-    
-    tts = gTTS(text=text, lang="ko")
-    tts.save(filename)
-    os.system(f"start {filename}")
+from gtts import gTTS
+import os
+import time
+
+def speak_text(text):
+    filename = f"response_{time.time_ns()}.mp3"  # 세션 여러 개가 같은 초에 말해도 파일이 겹치지 않게
+    
+    tts = gTTS(text=text, lang="ko")
+    tts.save(filename)
+    os.system(f"start {filename}")
@@ -0,0 +1,232 @@
+# video_worker.py
+# 목적: 분석 대기 영상 큐(/api/videos/next)를 계속 비우는 장기 실행 워커
+# - 엔진 프로세스 N개를 미리 띄워 모델은 프로세스당 1번만 로드
+# - 다운로드는 별도 스레드에서 미리 받아둠(추론과 겹침)
+# - 분석 결과는 /api/videos/:id/result 로 보고, JSON 리포트는 REPORT_DIR에 보관
+# - 분석 중인 영상은 주기적으로 임대 연장 (워커가 죽으면 백엔드가 임대 만료 후 다른 워커에 다시 배정)
+# 사용: python main.py --mode video-worker --workers 2
+
+import os
+import time
+import queue
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing as mp
+
+from backend_client import get_backend
+
+VIDEO_SERVER_BASE = "http://localhost:3000"   # 백엔드 주소/포트
+VIDEO_API_PREFIX  = "/api"
+
+DEFAULT_WORKERS = 2      # 엔진 프로세스 수
+PREFETCH        = 2      # 추론 대기 중 미리 받아둘 영상 수 (워커 수에 더해짐)
+IDLE_POLL_SEC   = 5.0    # 대기 영상 없을 때 재조회 간격
+LEASE_RENEW_SEC = 300.0  # 이 간격으로 가져간 영상의 임대 연장 (백엔드 VIDEO_LEASE_SEC보다 충분히 짧게)
+REPORT_DIR      = os.getenv("RAVO_VIDEO_REPORT_DIR", os.path.join(os.path.expanduser("~"), ".ravo", "video_reports"))
+
+
+def video_api(path: str) -> str:
+    return f"{VIDEO_SERVER_BASE}{VIDEO_API_PREFIX}{path}"
+
+
+def claim_next_video():
+    """대기 영상 하나를 processing 으로 바꾸면서 가져옴 (워커끼리 같은 영상 중복 방지)"""
+    try:
+        r = get_backend().get(video_api("/videos/next"), params={"claim": 1}, timeout=10)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        j = r.json()
+        if j.get("success") and j.get("data"):
+            return j["data"]
+    except Exception as e:
+        print("⚠️ 영상 메타 요청 예외:", e)
+    return None
+
+
+def download_to(file_url: str, save_path: str) -> str:
+    with get_backend().get(file_url, stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        with open(save_path, "wb") as f:
+            for chunk in resp.iter_content(1024 * 1024):
+                if chunk:
+                    f.write(chunk)
+    return save_path
+
+
+def post_result(vid_id, payload: dict):
+    try:
+        r = get_backend().post(video_api(f"/videos/{vid_id}/result"), json=payload, timeout=10)
+        if r.status_code not in (200, 201):
+            print(f"❌ 결과 보고 실패({vid_id}): {r.status_code}, {r.text}")
+    except Exception as e:
+        print(f"⚠️ 결과 보고 예외({vid_id}): {e}")
+
+
+# -----------------------------
+# 엔진 프로세스 (모델 상주)
+# -----------------------------
+_ENGINE = None
+
+def _init_engine(torch_threads: int, engine_kwargs: dict):
+    """프로세스 시작 시 1회: 스레드 수 제한 + 엔진(모델 2개) 로드 + 워밍업"""
+    global _ENGINE
+    import torch
+    torch.set_num_threads(max(1, torch_threads))
+    from ai_behavior_engine import AIBehaviorEngine
+    t0 = time.perf_counter()
+    _ENGINE = AIBehaviorEngine(**{"on_timings": _log_timings, **engine_kwargs})
+    load = {k: v["sec"] for k, v in _ENGINE.model_load.items()}
+    warm = _ENGINE.warmup()  # 첫 영상 첫 배치의 커널 초기화 비용을 미리 치름
+    print(f"🔥 [pid {os.getpid()}] 엔진 준비 완료 ({time.perf_counter() - t0:.1f}s, 로드 {load}, 워밍업 {warm})")
+
+
+def _log_timings(video_path: str, timings: dict):
+    """영상마다 단계별 소요 시간 한 줄 (어느 단계가 느린지 운영 로그로 확인)"""
+    from ai_behavior_engine import format_timings
+    print(f"⏱️ [pid {os.getpid()}] {os.path.basename(video_path)}: {format_timings(timings)}")
+
+
+def _analyze_one(video_path: str, json_path: str) -> dict:
+    from behavior_report import BehaviorReport
+    b_report = BehaviorReport(video_path, engine=_ENGINE, save_json=json_path)
+    rep = b_report.analyze()
+    return {
+        "status": "done",
+        "summary": rep.summary,
+        "report_text": b_report.generate_report_text(),
+        "report_path": os.path.abspath(json_path),
+    }
+
+
+# -----------------------------
+# 메인 루프
+# -----------------------------
+def _downloader(out_q: "queue.Queue", stop: threading.Event, work_dir: str):
+    """대기 영상 claim + 다운로드 → out_q (가득 차면 대기 = 추론보다 너무 앞서지 않음)"""
+    while not stop.is_set():
+        meta = claim_next_video()
+        if not meta:
+            stop.wait(IDLE_POLL_SEC)
+            continue
+        vid_id = meta.get("id", "next")
+        file_url = meta.get("signed_url") or meta.get("url")
+        path = os.path.join(work_dir, f"video_{vid_id}.mp4")
+        try:
+            print(f"⬇️ 다운로드: {file_url} -> {path}")
+            download_to(file_url, path)
+        except Exception as e:
+            post_result(vid_id, {"status": "failed", "error": f"download: {e}"})
+            continue
+        while not stop.is_set():
+            try:
+                out_q.put((meta, path), timeout=0.5); break
+            except queue.Full:
+                continue
+        else:
+            _release(meta, path)   # 큐에 넣기 전에 종료 → 이 영상도 반납
+
+
+def _release(meta: dict, path: str):
+    """분석 못 한 영상을 다시 queued 로 돌려놓고 받아 둔 파일 삭제"""
+    post_result(meta.get("id"), {"status": "queued"})
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _release_unprocessed(ready: "queue.Queue"):
+    """종료 시 받아만 두고 분석 못 한 영상은 다시 queued 로 돌려놓음"""
+    while True:
+        try:
+            meta, path = ready.get_nowait()
+        except queue.Empty:
+            return
+        _release(meta, path)
+
+
+def _renew_leases(inflight: dict, ready: "queue.Queue"):
+    """분석 중 + 받아 두고 대기 중인 영상의 임대 연장"""
+    with ready.mutex:
+        waiting = [meta for meta, _ in ready.queue]
+    for meta, _ in list(inflight.values()) + [(m, None) for m in waiting]:
+        post_result(meta.get("id"), {"status": "processing"})
+
+
+def run_video_worker(workers: int = DEFAULT_WORKERS, prefetch: int = PREFETCH,
+                     max_videos: int = 0, engine_kwargs: dict = None, report_dir: str = REPORT_DIR):
+    """
+    workers: 엔진 프로세스 수 (각 프로세스가 모델을 1번만 로드해 계속 재사용)
+    prefetch: 추론 중에 미리 받아둘 영상 수
+    max_videos: 0이면 무한 실행, 양수면 그 개수 처리 후 종료
+    report_dir: 영상별 JSON 리포트 보관 폴더 (다운로드 영상은 임시 폴더에서 지움)
+    """
+    workers = max(1, workers)
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)  # 프로세스끼리 코어 나눠 씀
+    work_dir = tempfile.mkdtemp(prefix="ravo_videos_")
+    os.makedirs(report_dir, exist_ok=True)
+    ready: "queue.Queue" = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    dl = threading.Thread(target=_downloader, args=(ready, stop, work_dir), daemon=True)
+
+    done = 0
+    inflight = {}
+    last_renew = time.monotonic()
+    print(f"🎬 영상 워커 시작: 프로세스 {workers}개, 미리받기 {prefetch}개, 작업폴더 {work_dir}")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                             initializer=_init_engine, initargs=(torch_threads, engine_kwargs or {})) as pool:
+        dl.start()
+        try:
+            while True:
+                # 빈 프로세스 수만큼 다운로드 끝난 영상 투입
+                while len(inflight) < workers:
+                    if max_videos and done + len(inflight) >= max_videos:
+                        break
+                    try:
+                        meta, path = ready.get(timeout=0.5 if not inflight else 0.05)
+                    except queue.Empty:
+                        break
+                    json_path = os.path.join(report_dir, f"video_{meta.get('id', 'next')}.json")
+                    inflight[pool.submit(_analyze_one, path, json_path)] = (meta, path)
+
+                if not inflight:
+                    if max_videos and done >= max_videos:
+                        break
+                    continue
+
+                if time.monotonic() - last_renew >= LEASE_RENEW_SEC:
+                    _renew_leases(inflight, ready)
+                    last_renew = time.monotonic()
+
+                finished, _ = wait(list(inflight), timeout=1.0, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    meta, path = inflight.pop(fut)
+                    vid_id = meta.get("id")
+                    try:
+                        result = fut.result()
+                        print(f"\n🎥 [{vid_id}] 분석 완료\n{result['report_text']}")
+                    except Exception as e:
+                        result = {"status": "failed", "error": str(e)}
+                        print(f"❌ [{vid_id}] 분석 실패: {e}")
+                    post_result(vid_id, result)
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    done += 1
+        except KeyboardInterrupt:
+            print("\n👋 워커 종료 중...")
+        finally:
+            stop.set()
+            # 분석 중이던 영상도 반납 (Ctrl+C면 엔진 프로세스도 같이 중단됨 → 결과 보고 X)
+            for fut, (meta, path) in inflight.items():
+                fut.cancel()
+                _release(meta, path)
+            inflight.clear()
+            dl.join(timeout=5)
+            _release_unprocessed(ready)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"✅ 처리 영상 {done}개")
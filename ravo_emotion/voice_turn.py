@@ -0,0 +1,345 @@
+# voice_turn.py
+# 목적: 음성 대화 한 턴 처리 + 감정 리포트 (main의 단일 대화 실행과 session_orchestrator의 다중 세션이 같이 씀)
+# - 수동모드 키는 대화(chatNo)별 "chat:<chatNo>" — 프론트 VoiceChat 토글과 같은 키, 백엔드는 없으면 "global" 값
+# - 턴 = begin_turn(감정 → 아이 메시지 저장 → 자동모드면 GPT 응답까지) → 수동모드면 부모 답장 대기 → finish_parent_turn
+#   (handle_turn은 그 자리에서 기다리고, 세션 오케스트레이터는 대기 동안 스레드를 놓고 MessageSync.watch로 이어감)
+# - 모델/외부 API 호출(감정 분류, GPT 응답/육아 팁/요약, TTS)은 run(stage, fn, *args)로 → 단계별 동시 실행 수 제한 가능
+# 사용: from voice_turn import EmotionReport, handle_turn, finish_report
+
+import re
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from emotion_module import classify_emotion, classify_emotions
+from chat_module import chat_with_gpt
+from tts_module import speak_text
+from backend_client import get_backend
+from write_behind import get_writer
+
+PARENT_REPLY_TIMEOUT = 300  # 수동모드에서 부모 답장을 기다리는 최대 시간(초), 지나면 다음 턴으로
+#음성 대화 모드 변경
+API_BASE = "http://localhost:3000"  # 백엔드 주소
+
+
+def mode_key_for(chat_no) -> str:
+    """대화별 수동모드 키 (프론트 VoiceChat의 토글 키와 같아야 함)"""
+    return f"chat:{chat_no}"
+
+
+def get_manual_mode(key="global") -> bool:
+    """백엔드에서 현재 수동모드 여부 조회 (프론트 버튼으로 토글한 값)"""
+    try:
+        r = get_backend().get(f"{API_BASE}/chatbot/mode", params={"key": key}, timeout=3)
+        return bool(r.json().get("manual"))
+    except Exception:
+        return False  # 실패 시 자동모드로 간주(원하면 True로 바꿔도 됨)
+
+
+def _direct(stage, fn, *args):
+    """run 기본값: 단계 제한 없이 바로 호출"""
+    return fn(*args)
+
+
+def pick_parent_reply(rows, last_child_text):
+    """새 부모 메시지들 중 답장으로 볼 첫 메시지 (없으면 None)"""
+    for row in rows:
+        mc = (row.get("m_content") or "").strip()
+        # ✅ 부모 메시지 판정: 직전 아이 메시지와 다른 내용
+        if mc and mc != (last_child_text or "").strip():
+            return row
+    return None
+
+
+def own_child_id(rows, last_child_text):
+    """아이(CHILD) 메시지들 중 이번 턴에 저장한 메시지(같은 내용)의 id (아직 없으면 None)"""
+    text = (last_child_text or "").strip()
+    for row in reversed(rows):
+        if (row.get("m_content") or "").strip() == text:
+            return row["id"]
+    return None
+
+
+def wait_for_parent_reply(sync, since_id, last_child_text, timeout=PARENT_REPLY_TIMEOUT, cancel=None, chat=None):
+    """
+    동기화 인덱스(sync)에서 부모(PARENTS) 메시지가 올 때까지 대기 (전체 목록 재조회 X)
+    since_id: 아이 메시지 저장 전에 잡아 둔 sync.cursor
+    → 먼저 이번 턴 아이 메시지가 저장돼 돌아오길 기다리고 그 id 이후 부모 메시지만 답장으로 봄
+      (sync가 아직 못 받은, 이 턴 전에 보낸 부모 메시지를 답장으로 잡지 않도록 — sync는 CHILD 메시지도 받아야 함)
+    chat: 인덱스의 대화 키 (여러 세션이 sync 하나를 같이 쓸 때 자기 대화 답장만)
+    timeout 초가 지나거나 cancel(threading.Event)이 set 되면 None
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    child_id = None
+    while child_id is None:
+        left = None if deadline is None else deadline - time.monotonic()
+        if left is not None and left <= 0:
+            return None
+        rows = sync.wait(since_id, chat=chat, flag="CHILD", timeout=left, cancel=cancel)
+        if not rows:
+            return None
+        child_id = own_child_id(rows, last_child_text)
+        since_id = rows[-1]["id"] if child_id is None else child_id
+    while True:
+        left = None if deadline is None else deadline - time.monotonic()
+        if left is not None and left <= 0:
+            return None
+        rows = sync.wait(since_id, chat=chat, flag="PARENTS", timeout=left, cancel=cancel)
+        if not rows:
+            return None
+        row = pick_parent_reply(rows, last_child_text)
+        if row is not None:
+            return row
+        since_id = rows[-1]["id"]
+
+
+def message_payload(text, emotion, mode="VOICE", user_no=1, chat_no=1, chat_flag="CHILD"):
+    return {
+        "content": text,
+        "mode": mode,
+        "summary": emotion,
+        "userNo": user_no,      # 항상 1 (고정)
+        "chatNo": chat_no,
+        "chatFlag": chat_flag   # ✅ 추가 — 메시지별 역할 스냅샷
+    }
+
+
+def queue_message(text, emotion, mode="VOICE", user_no=1, chat_no=1, chat_flag="CHILD"):
+    """save_message_to_api와 같은 메시지를 쓰기 지연 큐에 넣고 바로 반환 (전송/재시도/묶음 전송은 백그라운드)"""
+    get_writer().put(message_payload(text, emotion, mode, user_no, chat_no, chat_flag))
+
+
+# ✅ 감정 리포트 클래스
+class EmotionReport:
+    """run(stage, fn, *args): 감정 분류("emotion")/GPT("chat") 호출 실행기 (없으면 바로 호출)"""
+    def __init__(self, user_no=1, chat_no=1, run=None):
+        self.user_no = user_no
+        self.chat_no = chat_no
+        self.run = run or _direct
+        self.emotion_log = []
+        self.text_log = []
+        self.turn_count = 0  # 👉 대화 개수 카운트용
+        self._summary_pool = None  # 자동 요약(GPT 호출)은 대화 루프 밖 스레드에서
+        self._summary_jobs = []
+
+    def add_turn(self, text, emotion=None):
+        """emotion: 미리 분류해 둔 감정이 있으면 재사용 (스트리밍 인식 모드)"""
+        self.text_log.append(text)
+        emotion = emotion or self.run("emotion", classify_emotion, text)
+        self.emotion_log.append(emotion)
+        self.turn_count += 1
+
+        # ✅ 대화가 5개 쌓일 때마다 자동으로 요약 생성 + DB 저장 (백그라운드, 대화는 바로 진행)
+        if self.turn_count % 5 == 0:
+            print(f"\n🪄 대화 {self.turn_count}개 도달 — 자동 요약 생성 중...")
+            self.save_summary_async(chat_no=self.chat_no)
+
+        return emotion
+
+    def add_history(self, texts):
+        """지난 대화 기록으로 리포트 다시 만들기: 감정은 배치 1번(+캐시)으로 분류, 자동 요약/DB 저장은 안 함"""
+        emotions = self.run("emotion", classify_emotions, texts)
+        self.text_log.extend(texts)
+        self.emotion_log.extend(emotions)
+        self.turn_count += len(texts)
+        return emotions
+
+    def get_emotion_summary(self):
+        total = len(self.emotion_log)
+        # if total == 0:
+        #     return {}
+        counts = Counter(self.emotion_log)
+        return {
+            emotion: round((count / total) * 100, 1)
+            for emotion, count in counts.items()
+        }
+
+    def get_top_keywords(self, top_n=5):
+        all_text = ' '.join(self.text_log).lower()
+        words = re.findall(r'\b[가-힣a-zA-Z]+\b', all_text)
+        stopwords = set(['그리고', '그래서', '하지만', '그냥', '나는', '너는', '이건', '저건', '뭐지', '이게', '저게', '것'])
+        filtered = [w for w in words if w not in stopwords]
+        return [word for word, _ in Counter(filtered).most_common(top_n)]
+
+    def generate_parenting_tip(self):
+        emotion_summary = self.get_emotion_summary()
+        top_keywords = self.get_top_keywords()
+
+        prompt = f"""
+        당신은 아동 심리 전문가이자 부모 교육 전문가입니다.
+        다음은 아이와의 대화에서 분석된 감정 요약과 주요 키워드입니다.
+
+        감정 요약: {emotion_summary}
+        주요 키워드: {', '.join(top_keywords)}
+
+        위 내용을 바탕으로 아이의 감정 상태를 이해하고,
+        부모가 어떤 방식으로 접근하면 좋을지 한국어로 따뜻하고 실용적인 육아 팁을 3~5줄로 알려주세요.
+        """
+        return self.run("chat", chat_with_gpt, prompt, "neutral")
+    
+    # 🆕 텍스트(대화 내용) 기반 요약
+    def generate_summary_for_db(self, recent_turns: int = 5, texts=None) -> str:
+        """
+        최근 recent_turns개의 실제 대화 문장을 기반으로
+        30자 이내의 따뜻한 한 문장 요약을 생성한다.
+        texts: 요약할 문장 목록을 직접 지정 (백그라운드 요약은 요청 시점의 스냅샷 사용)
+        """
+        if texts is None:
+            texts = self.text_log[-recent_turns:]  # 최근 N턴만 사용(너무 길어지는 것 방지)
+        if not texts:
+            return ""
+
+        convo = "\n".join(texts)
+
+        prompt = f"""
+        아래는 아이와 부모의 실제 대화 내용입니다.
+        이  대화의 핵심을 따뜻하게 한 문장(30자 이내)으로 요약하세요.
+        문장 끝은 '~한 내용.' 또는 '~에 대한 이야기.' 형태로.
+
+        [대화]
+        {convo}
+        """
+
+        summary = self.run("chat", chat_with_gpt, prompt, "neutral")
+        # 따옴표/공백 정리
+        return (summary or "").strip().strip('"').strip("'")
+
+    
+
+    @staticmethod
+    def summary_payload(summary, chat_no=1, user_no=1):
+        return {
+            "chatNo": chat_no,
+            "mode": "SUMMARY",   # ✅ 구분용
+            "content": summary,  # 요약 내용
+            "userNo": user_no,   # AI 봇으로 설정
+            "chatFlag": "AI", 
+        }
+
+    def save_summary_async(self, chat_no=1, recent_turns: int = 5):
+        """
+        지금까지의 최근 대화로 요약 생성 + 저장을 백그라운드에서 (GPT 호출/DB 왕복을 기다리지 않음)
+        요약은 요청 시점 대화 기준, 저장은 쓰기 지연 큐로 → wait_summaries()로 완료 대기
+        """
+        if self._summary_pool is None:
+            self._summary_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        texts, turn = self.text_log[-recent_turns:], self.turn_count
+        job = self._summary_pool.submit(self._summary_job, texts, turn, chat_no)
+        self._summary_jobs = [j for j in self._summary_jobs if not j.done()]   # 끝난 작업은 버림 (긴 대화에서 계속 쌓이지 않게)
+        self._summary_jobs.append(job)
+        return job
+
+    def _summary_job(self, texts, turn, chat_no):
+        try:
+            summary = self.generate_summary_for_db(texts=texts)
+            if summary:
+                get_writer().put(self.summary_payload(summary, chat_no, self.user_no))
+                print(f"✅ ({turn}턴 시점) 요약 저장 예약 → {summary}")
+        except Exception as e:
+            print(f"❌ 요약 생성 중 오류 발생: {e}")
+
+    def wait_summaries(self):
+        """백그라운드 요약이 모두 끝날 때까지 대기 (저장 전송은 get_writer().flush()로)"""
+        for job in self._summary_jobs:
+            job.result()
+        self._summary_jobs.clear()
+        if self._summary_pool is not None:
+            self._summary_pool.shutdown()
+            self._summary_pool = None
+
+    # 🆕 요약 저장 (요약 생성까지 대기, 전송은 쓰기 지연 큐 — save_summary_async와 같은 경로)
+    def save_summary_to_db(self, chat_no=1):
+        self.save_summary_async(chat_no=chat_no).result()
+
+
+    
+def begin_turn(report, voice_sync, user_text, emotion=None, user_no=1, chat_no=1, mode_key=None,
+               speak=speak_text, run=None, tag=""):
+    """
+    아이 발화 1턴 앞부분: 감정 → 아이 메시지 저장(쓰기 지연) → 자동모드면 GPT 응답 → TTS → 저장까지
+    → (manual, mark): 수동모드면 (True, 아이 메시지 저장 전 커서 — 여기서부터 이번 아이 메시지를 찾고 그 뒤 답장 대기),
+      턴이 끝났으면 (False, None)
+    mode_key: 수동모드 키 (None이면 mode_key_for(chat_no))
+    """
+    run = run or report.run
+    p = f"[{tag}] " if tag else ""
+
+    emotion = report.add_turn(user_text, emotion or run("emotion", classify_emotion, user_text))
+    print(f"{p}🧠 감정 분석 결과: {emotion}")
+
+    # ✅ 수동모드(부모가 직접 답함) 여부 확인 — 아이 메시지 저장 전 커서를 기준으로 답장 대기
+    manual = get_manual_mode(key=mode_key or mode_key_for(chat_no))
+    mark = voice_sync.cursor
+
+    # ✅ 아이 메시지 저장 (항상 chat_flag='CHILD') — 쓰기 지연 큐, 전송을 기다리지 않음
+    queue_message(user_text, emotion, user_no=user_no, chat_no=chat_no, chat_flag="CHILD")
+
+    if manual:
+        print(f"{p}⏸️ 수동모드: 부모 발화를 대기 중...")
+        return True, mark  # 자동모드 GPT 응답은 생략
+
+    # ✅ 자동모드: AI 응답
+    reply = run("chat", chat_with_gpt, user_text, emotion)
+    print(f"{p}🤖 GPT 응답: {reply}")
+    run("tts", speak, reply)
+
+    report.add_turn(reply, run("emotion", classify_emotion, reply))
+
+    # ✅ AI 응답 저장 (chat_flag='AI') — 같은 chatNo 안에서는 넣은 순서대로 저장됨
+    queue_message(reply, "neutral", user_no=user_no, chat_no=chat_no, chat_flag="AI")
+    return False, None
+
+
+def finish_parent_turn(report, parent_msg, speak=speak_text, run=None, tag=""):
+    """수동모드 턴 뒷부분: 부모 답장 TTS + 리포트 반영 (parent_msg None = 시간 초과/취소)"""
+    run = run or report.run
+    p = f"[{tag}] " if tag else ""
+    if parent_msg is None:
+        print(f"{p}⌛ 부모 답장이 없어 다음 턴으로")
+    if parent_msg and parent_msg.get("m_content"):
+        run("tts", speak, parent_msg["m_content"])
+
+        report.add_turn(parent_msg["m_content"], run("emotion", classify_emotion, parent_msg["m_content"]))
+
+        # ✅ 부모 메시지도 저장 (chat_flag='PARENTS')
+        # save_message_to_api(parent_msg["m_content"], "neutral", chat_flag="PARENTS")
+
+
+def handle_turn(report, voice_sync, user_text, emotion=None, user_no=1, chat_no=1, mode_key=None,
+                reply_chat=None, speak=speak_text, run=None, cancel=None, tag=""):
+    """
+    아이 발화 1턴 처리: 감정 → (수동모드면 부모 답장 대기 / 자동모드면 GPT 응답) → TTS → 메시지 저장(쓰기 지연)
+    emotion: 미리 분류해 둔 감정 (없으면 여기서 분류)
+    reply_chat: voice_sync 인덱스에서 이 대화의 부모 답장을 고를 키 (chatNo, None이면 전체)
+    run(stage, fn, *args): 모델/외부 API 호출 실행기 (없으면 report.run)
+    cancel: set 되면 부모 답장 대기 중단
+    """
+    manual, mark = begin_turn(report, voice_sync, user_text, emotion, user_no, chat_no, mode_key,
+                              speak=speak, run=run, tag=tag)
+    if manual:
+        parent_msg = wait_for_parent_reply(voice_sync, mark, user_text, chat=reply_chat, cancel=cancel)
+        finish_parent_turn(report, parent_msg, speak=speak, run=run, tag=tag)
+
+
+def finish_report(report, tag=""):
+    """대화 끝: 감정 요약/키워드/육아 팁 출력 + 전체 대화 요약 저장 (저장 전송은 쓰기 지연 큐가 이어서)"""
+    p = f"[{tag}] " if tag else ""
+
+    # ✅ 전체 요약 및 솔루션 출력
+    print(f"\n📊 {p}전체 감정 요약:")
+    for emo, perc in report.get_emotion_summary().items():
+        print(f"- {emo}: {perc}%")
+
+    print(f"\n🔑 {p}주요 키워드:")
+    for i, kw in enumerate(report.get_top_keywords(), 1):
+        print(f"{i}. {kw}")
+
+    # ✅ 대화 요약 저장 (육아 팁 생성과 동시에)
+    print(f"\n💾 {p}전체 대화 요약 저장 중...")
+    report.save_summary_async(chat_no=report.chat_no)
+
+    print(f"\n👨‍👩‍👧 {p}육아 솔루션 제안:")
+    print(report.generate_parenting_tip())
+
+    report.wait_summaries()
+
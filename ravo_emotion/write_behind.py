@@ -0,0 +1,326 @@
+# write_behind.py
+# 목적: 메시지/요약 저장을 대화 루프에서 떼어내는 쓰기 지연(write-behind) 큐
+# - put()은 로컬 스풀 파일에 한 줄 쓰고 바로 반환 → 아이는 DB 왕복을 기다리지 않고 답을 들음
+# - 백그라운드 스레드 1개가 chatNo 별 순서를 지키며 전송 (쌓여 있으면 /messages/send-batch 로 묶어서 1번에)
+# - 백엔드가 죽어 있으면 chatNo 별로 지수 백오프 재시도, 프로세스가 죽어도 스풀에 남아 다음 실행 때 이어서 전송
+# - 400 같은 영구 오류는 dead.jsonl 로 옮기고 다음 메시지 진행 (한 건 때문에 대화 전체가 막히지 않게)
+# - 스풀은 프로세스마다 따로: outbox.jsonl을 다른 프로세스가 쓰는 중(.lock 배타 잠금)이면 outbox-1.jsonl, ...
+#   시작할 때 잠금이 풀린(주인이 죽은) 다른 스풀의 미전송분도 가져와 이어서 전송
+# 사용: from write_behind import get_writer
+#      get_writer().put({"content": ..., "chatNo": 1, ...})
+#      get_writer().flush(timeout=10)   # 종료 전 (남은 건 스풀에 유지)
+
+import os
+import glob
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict, deque
+from typing import Optional
+
+from backend_client import BackendClient, get_backend
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:   # Windows
+    import msvcrt
+
+SPOOL_DIR           = os.getenv("RAVO_SPOOL_DIR", os.path.join(os.path.expanduser("~"), ".ravo", "spool"))
+SEND_PATH           = "/messages/send"
+BATCH_PATH          = "/messages/send-batch"
+BATCH_MAX           = 20       # 요청 1번에 묶을 최대 메시지 수
+LINGER_SEC          = 0.05     # 새 메시지가 오면 이만큼 더 모았다가 전송 (연달아 들어온 메시지 묶기)
+RETRY_BASE_SEC      = 0.5      # 실패 후 첫 재시도 대기, 연속 실패마다 2배
+RETRY_MAX_SEC       = 30.0
+FLUSH_TIMEOUT       = 10.0     # close() 때 남은 메시지 전송을 기다리는 시간
+SPOOL_COMPACT_BYTES = 1 << 20  # 스풀 파일이 이보다 커지면 미전송분만 남겨 다시 씀
+SPOOL_SLOTS         = 64       # 동시에 쓸 수 있는 스풀 파일 수 (프로세스 수 상한)
+
+
+def _try_lock(path: str):
+    """잠금 파일 배타 잠금 (비차단) → 열린 파일(잠금 유지) 또는 다른 프로세스가 잡고 있으면 None"""
+    f = open(path, "a+")
+    try:
+        if msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def _unlock(f):
+    if msvcrt is not None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    f.close()
+
+
+def _read_unsent(path: str):
+    """스풀 파일 → (미전송 [(seq, body)] seq 순, 최대 seq): 기록(seq)에서 전송 완료(ack)를 뺀 나머지"""
+    adds, acked = {}, set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # 쓰다 죽은 마지막 줄
+            if "ack" in rec:
+                acked.update(rec["ack"])
+            else:
+                adds[rec["seq"]] = rec["body"]
+    return [(seq, adds[seq]) for seq in sorted(adds) if seq not in acked], max(adds, default=0)
+
+
+class _Lane:
+    """chatNo 하나의 전송 대기열 (앞에서부터 순서대로만 전송)"""
+    __slots__ = ("items", "fails", "next_try")
+
+    def __init__(self):
+        self.items = deque()   # (seq, body)
+        self.fails = 0
+        self.next_try = 0.0
+
+
+class WriteBehindQueue:
+    def __init__(self, client: Optional[BackendClient] = None, spool_dir: str = SPOOL_DIR,
+                 batch_max: int = BATCH_MAX, linger: float = LINGER_SEC):
+        self.client = client or get_backend()
+        self.batch_max = max(1, batch_max)
+        self.linger = linger
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+        self._lock = None
+        for slot in range(SPOOL_SLOTS):
+            name = "outbox" if slot == 0 else f"outbox-{slot}"
+            self._lock = _try_lock(os.path.join(spool_dir, name + ".lock"))
+            if self._lock is not None:
+                break
+        if self._lock is None:
+            raise RuntimeError(f"스풀 파일 {SPOOL_SLOTS}개가 모두 사용 중입니다: {spool_dir}")
+        self._spool_path = os.path.join(spool_dir, name + ".jsonl")
+        self._dead_path = os.path.join(spool_dir, "dead.jsonl")
+
+        self._cond = threading.Condition()
+        self._lanes: "OrderedDict[str, _Lane]" = OrderedDict()
+        self._pending = 0
+        self._seq = 0
+        self._stop = False
+        self._batch_ok = True   # 백엔드에 send-batch 가 없으면(404) 한 건씩 전송으로 전환
+        self.stats = {"sent": 0, "requests": 0, "retries": 0, "dead": 0, "recovered": 0}
+
+        self._recover()
+        self._spool = open(self._spool_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    # ---------- 공개 API ----------
+    def put(self, body: dict) -> int:
+        """전송할 메시지 1건 등록 (스풀에 기록 후 바로 반환) → seq"""
+        with self._cond:
+            if self._stop:
+                raise RuntimeError("write-behind 큐가 이미 닫혔습니다")
+            self._seq += 1
+            seq = self._seq
+            self._spool_write({"seq": seq, "body": body})
+            self._lane(body).items.append((seq, body))
+            self._pending += 1
+            self._cond.notify_all()
+        return seq
+
+    def pending(self) -> int:
+        with self._cond:
+            return self._pending
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """지금까지 넣은 메시지가 모두 전송(또는 dead 처리)될 때까지 대기 → 다 비었으면 True"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+            return True
+
+    def close(self, timeout: float = FLUSH_TIMEOUT):
+        """남은 메시지를 timeout 동안 보내 보고 종료 (못 보낸 건 스풀에 남아 다음 실행 때 전송)"""
+        if self._thread.is_alive():
+            self.flush(timeout)
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+        with self._cond:
+            if not self._spool.closed:
+                self._spool.close()
+                _unlock(self._lock)
+            left = self._pending
+        if left:
+            print(f"💾 미전송 메시지 {left}건은 스풀에 보관: {self._spool_path}")
+
+    # ---------- 스풀 ----------
+    def _spool_write(self, rec: dict):
+        self._spool.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._spool.flush()
+
+    def _recover(self):
+        """
+        이전 실행에서 못 보낸 메시지 복구: 내 스풀 + 주인 없는(잠금이 풀린) 다른 스풀의 미전송분
+        다른 스풀 것은 내 seq 뒤로 붙여 내 스풀에 옮겨 적은 뒤 원본 삭제 (그 사이 죽으면 중복 전송될 수 있음)
+        """
+        items, self._seq = _read_unsent(self._spool_path) if os.path.exists(self._spool_path) else ([], 0)
+        orphans = []
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "outbox*.jsonl"))):
+            if path == self._spool_path:
+                continue
+            lock = _try_lock(path[:-len(".jsonl")] + ".lock")
+            if lock is None:
+                continue   # 살아 있는 다른 프로세스의 스풀
+            orphans.append((path, lock))
+            for _, body in _read_unsent(path)[0]:
+                self._seq += 1
+                items.append((self._seq, body))
+        for seq, body in items:
+            self._lane(body).items.append((seq, body))
+        self._pending = self.stats["recovered"] = len(items)
+        self._rewrite_spool()
+        for path, lock in orphans:
+            os.remove(path)
+            _unlock(lock)
+        if self._pending:
+            print(f"♻️ 이전 실행의 미전송 메시지 {self._pending}건 재전송 예정")
+
+    def _rewrite_spool(self):
+        """미전송분만 남긴 스풀로 교체 (임시 파일에 쓰고 rename → 중간에 죽어도 원본 유지)"""
+        tmp = self._spool_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            items = sorted(it for lane in self._lanes.values() for it in lane.items)
+            for seq, body in items:
+                f.write(json.dumps({"seq": seq, "body": body}, ensure_ascii=False) + "\n")
+        os.replace(tmp, self._spool_path)
+
+    def _ack(self, lane: _Lane, n: int):
+        """lane 앞쪽 n건 전송 완료 처리 (lock 안에서 호출)"""
+        seqs = [lane.items.popleft()[0] for _ in range(n)]
+        self._pending -= n
+        self._spool_write({"ack": seqs})
+        if not self._pending:
+            self._spool.truncate(0)   # 다 보냈으면 스풀 비우기
+        elif self._spool.tell() > SPOOL_COMPACT_BYTES:
+            self._spool.close()
+            self._rewrite_spool()
+            self._spool = open(self._spool_path, "a", encoding="utf-8")
+        self._cond.notify_all()
+
+    def _dead(self, body: dict, reason: str):
+        with open(self._dead_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"body": body, "error": reason, "at": time.time()}, ensure_ascii=False) + "\n")
+        self.stats["dead"] += 1
+        print(f"🪦 메시지 저장 포기({reason}) → {self._dead_path}")
+
+    # ---------- 전송 ----------
+    def _lane(self, body: dict) -> _Lane:
+        key = str(body.get("chatNo"))
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane()
+        return lane
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stop:
+                        return
+                    now = time.monotonic()
+                    ready = [ln for ln in self._lanes.values() if ln.items and ln.next_try <= now]
+                    if ready:
+                        break
+                    waits = [ln.next_try - now for ln in self._lanes.values() if ln.items]
+                    self._cond.wait(min(waits) if waits else None)
+            if self.linger:
+                time.sleep(self.linger)
+            for lane in ready:
+                with self._cond:
+                    batch = list(lane.items)[:self.batch_max]
+                sent, retry, dead = self._send([b for _, b in batch])
+                with self._cond:
+                    if sent:
+                        self._ack(lane, sent)
+                        self.stats["sent"] += sent
+                    if dead is not None:
+                        self._dead(lane.items[0][1], dead)
+                        self._ack(lane, 1)
+                    if retry:
+                        lane.fails += 1
+                        lane.next_try = time.monotonic() + min(RETRY_MAX_SEC, RETRY_BASE_SEC * 2 ** (lane.fails - 1))
+                        self.stats["retries"] += 1
+                    else:
+                        lane.fails = 0
+                        lane.next_try = 0.0
+
+    def _send(self, bodies):
+        """
+        bodies를 순서대로 전송 → (보낸 개수, 재시도 필요 여부, 맨 앞 건의 영구 실패 사유 또는 None)
+        2건 이상이면 send-batch 1번, 배치가 거부(4xx)되면 한 건씩 보내 문제 메시지만 골라냄
+        """
+        if len(bodies) > 1 and self._batch_ok:
+            try:
+                r = self.client.post(BATCH_PATH, json={"messages": bodies})
+                self.stats["requests"] += 1
+            except Exception as e:
+                print(f"⚠️ 메시지 배치 전송 실패(재시도 예정): {e}")
+                return 0, True, None
+            if r.status_code in (200, 201):
+                return len(bodies), False, None
+            if r.status_code == 404:
+                print("ℹ️ 백엔드에 send-batch 가 없어 한 건씩 전송합니다")
+                self._batch_ok = False
+            elif not _permanent(r.status_code):
+                print(f"⚠️ 메시지 배치 전송 실패(재시도 예정): {r.status_code}")
+                return 0, True, None
+
+        sent = 0
+        for body in bodies:
+            try:
+                r = self.client.post(SEND_PATH, json=body)
+                self.stats["requests"] += 1
+            except Exception as e:
+                print(f"⚠️ 메시지 전송 실패(재시도 예정): {e}")
+                return sent, True, None
+            if r.status_code in (200, 201):
+                sent += 1
+                continue
+            if _permanent(r.status_code):
+                # 앞의 성공분은 ack, 이 건은 dead → 다음 라운드에서 나머지 계속
+                return sent, False, f"{r.status_code} {r.text[:200]}"
+            print(f"⚠️ 메시지 전송 실패(재시도 예정): {r.status_code}")
+            return sent, True, None
+        return sent, False, None
+
+
+def _permanent(status: int) -> bool:
+    """다시 보내도 같은 결과인 응답 (요청 자체가 잘못됨)"""
+    return 400 <= status < 500 and status not in (404, 408, 429)
+
+
+_WRITER: Optional[WriteBehindQueue] = None
+_WRITER_LOCK = threading.Lock()
+
+
+def get_writer() -> WriteBehindQueue:
+    """프로세스 공용 쓰기 지연 큐 (처음 호출 때 생성, 스풀 복구 포함)"""
+    global _WRITER
+    if _WRITER is None:
+        with _WRITER_LOCK:
+            if _WRITER is None:
+                _WRITER = WriteBehindQueue()
+                atexit.register(_WRITER.close)
+    return _WRITER
@@ -0,0 +1,60 @@
+// config/schema.js
+// 기존 테이블에 추가된 컬럼 마이그레이션 (서버 시작 시 1번 + 수동 실행: npm run migrate)
+// - information_schema 로 컬럼 유무를 확인하고 없으면 ALTER TABLE
+// - ALTER 권한이 없거나 실패하면 경고만 남기고 계속 → 레포지토리는 hasColumn() 으로 확인해 예전 쿼리 사용
+//   (컬럼이 없는 DB에서도 메시지 저장/구독, 영상 조회가 지금처럼 동작)
+import { fileURLToPath } from "node:url";
+import { pool } from "./db.js";
+
+export const MIGRATIONS = [
+  // 음성 대화 메시지를 대화(chatNo)별로 구분 (파이썬 세션이 자기 대화의 부모 답장만 받음)
+  { table: "chat",  column: "chat_no",    ddl: "ALTER TABLE chat ADD COLUMN chat_no INT NULL" },
+  // 영상 분석 워커 임대(lease): processing 으로 가져간(또는 연장한) 시각
+  { table: "video", column: "claimed_at", ddl: "ALTER TABLE video ADD COLUMN claimed_at DATETIME NULL" },
+  // 영상 분석 결과 { summary, report_text, report_path } / { error }
+  { table: "video", column: "result",     ddl: "ALTER TABLE video ADD COLUMN result JSON NULL" },
+];
+
+const present = new Set(); // "table.column"
+let ready = null;
+
+const columnExists = async (table, column) => {
+  const [rows] = await pool.execute(
+    `SELECT 1 FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? AND COLUMN_NAME = ? LIMIT 1`, [table, column]
+  );
+  return rows.length > 0;
+};
+
+// 없는 컬럼 추가 → 실제로 있는 컬럼 목록 기록 (여러 번 불러도 1번만 실행)
+export const ensureSchema = () => {
+  if (!ready) {
+    ready = (async () => {
+      for (const m of MIGRATIONS) {
+        try {
+          if (!(await columnExists(m.table, m.column))) {
+            await pool.query(m.ddl);
+            console.log(`[schema] ${m.table}.${m.column} 추가`);
+          }
+          present.add(`${m.table}.${m.column}`);
+        } catch (e) {
+          console.warn(`[schema] ${m.table}.${m.column} 마이그레이션 실패 → 이 컬럼 없이 동작: ${e.message}`);
+        }
+      }
+    })();
+  }
+  return ready;
+};
+
+// 마이그레이션된(또는 원래 있던) 컬럼인지
+export const hasColumn = async (table, column) => {
+  await ensureSchema();
+  return present.has(`${table}.${column}`);
+};
+
+// node src/config/schema.js → 마이그레이션만 실행하고 종료
+if (process.argv[1] === fileURLToPath(import.meta.url)) {
+  ensureSchema()
+    .then(() => console.log("[schema] 완료:", [...present].join(", ") || "(추가된 컬럼 없음)"))
+    .finally(() => pool.end());
+}
@@ -1,248 +1,386 @@
-import { sendMessage } from '../services/message.service.js'; //메시지 전송
-import { getAllMessages } from '../services/message.service.js'; //메시지 조회
-import { readMessage } from '../services/message.service.js'; //메시지 읽음 처리
-import { deleteMessage } from '../services/message.service.js'; //메시지 삭제
-import { fetchChatDateList } from '../services/message.service.js'; //대화 목록 조회
-import { fetchMessagesByDate } from '../services/message.service.js'; //대화 상세 조회
-import { deleteMessagesByDate } from '../services/message.service.js'; //특정 날짜 대화 삭제
-import { searchChatMessages } from '../services/message.service.js'; //대화 내용 검색
-
-//메시지 전송
-// export const sendMessageController = async (req, res) => {
-//   try {
-//     const { content, mode, summary, userNo, chatNo } = req.body;
-
-//     // 누락된 필드 체크
-//     const missingFields = [];
-//     if (!content) missingFields.push("content");
-//     if (!mode) missingFields.push("mode");
-//     if (!userNo) missingFields.push("userNo");
-//     if (!chatNo) missingFields.push("chatNo");
-
-//     if (missingFields.length > 0) {
-//       return res.status(400).json({
-//         success: false,
-//         message: `필수 항목 누락: ${missingFields.join(", ")}`
-//       });
-//     }
-
-//     const result = await sendMessage({ content, mode, summary, userNo, chatNo });
-//     res.status(201).json({ success: true, data: result });
-
-//   } catch (error) {
-//     console.error('메시지 전송 오류:', error);
-//     res.status(500).json({ success: false, message: '서버 내부 오류입니다.' });
-//   }
-// };
-export const sendMessageController = async (req, res) => {
-  try {
-    let { content, mode, summary, userNo, chatNo, chatFlag } = req.body;
-
-    const missing = [];
-    if (!content) missing.push("content");
-    if (!mode) missing.push("mode");
-    if (!userNo) missing.push("userNo");
-    if (!chatNo) missing.push("chatNo");
-    if (!chatFlag) missing.push("chatFlag");
-    if (missing.length) {
-      return res.status(400).json({ success:false, message:`필수 항목 누락: ${missing.join(", ")}` });
-    }
-
-    // ✅ 대소문자/공백 보정 + 허용셋 검증
-    chatFlag = String(chatFlag).trim().toUpperCase();
-    const ALLOWED = new Set(["AI","PARENTS","CHILD"]);
-    if (!ALLOWED.has(chatFlag)) {
-      return res.status(400).json({ success:false, message:`chatFlag 값이 유효하지 않습니다: ${chatFlag}` });
-    }
-
-    // (디버그) 실제 들어온 값 로그
-    console.log("[sendMessage] flag:", chatFlag, "body:", req.body);
-
-    const dto = {
-      m_content: content,
-      m_mode: mode,
-      m_summary: summary || null,
-      user_no: userNo,
-      chat_no: chatNo,
-      chat_flag: chatFlag,
-    };
-
-    const result = await sendMessage({ content, mode, summary, userNo, chatNo, chatFlag });
-    res.status(201).json({ success:true, data: result });
-  } catch (e) {
-    console.error("메시지 전송 오류:", e);
-    res.status(500).json({ success:false, message:"서버 내부 오류입니다." });
-  }
-};
-
-
-
-//메시지 조회
-export const getMessagesController = async (req, res) => {
-  try {
-    const messages = await getAllMessages();
-    const filtered = messages.filter(m => m.m_mode === 'VOICE');
-    res.status(200).json({ success: true, data: filtered });
-  } catch (error) {
-    console.error('메시지 조회 오류:', error);
-    res.status(500).json({ success: false, message: '서버 오류입니다.' });
-  }
-};
-
-//메시지 읽음 처리
-export const markMessageReadController = async (req, res) => {
-  try {
-    const messageId = req.params.message_no;
-
-    if (!messageId) {
-      return res.status(400).json({ success: false, message: 'message_no가 필요합니다.' });
-    }
-
-    const success = await readMessage(messageId);
-
-    if (!success) {
-      return res.status(404).json({ success: false, message: '해당 메시지를 찾을 수 없습니다.' });
-    }
-
-    res.status(200).json({ success: true, message: '메시지가 읽음 처리되었습니다.' });
-
-  } catch (error) {
-    console.error('읽음 처리 오류:', error);
-    res.status(500).json({ success: false, message: '서버 오류입니다.' });
-  }
-};
-
-//메시지 삭제(소프트 딜리트)
-export const deleteMessageController = async (req, res) => {
-  try {
-    const messageId = req.params.message_no;
-
-    if (!messageId) {
-      return res.status(400).json({ success: false, message: 'message_no가 필요합니다.' });
-    }
-
-    const success = await deleteMessage(messageId);
-
-    if (!success) {
-      return res.status(404).json({ success: false, message: '해당 메시지를 찾을 수 없습니다.' });
-    }
-
-    res.status(200).json({ success: true, message: '메시지가 삭제되었습니다.' });
-
-  } catch (error) {
-    console.error('메시지 삭제 오류:', error);
-    res.status(500).json({ success: false, message: '서버 오류입니다.' });
-  }
-};
-
-//대화 목록 조회
-export const getChatDateListController = async (req, res) => {
-  try {
-    const dateList = await fetchChatDateList();
-    res.status(200).json({ success: true, data: dateList });
-  } catch (error) {
-    console.error('대화 날짜 목록 조회 오류:', error);
-    res.status(500).json({ success: false, message: '서버 오류입니다.' });
-  }
-};
-
-//대화 상세 조회
-export const getChatDetailByDateController = async (req, res) => {
-  try {
-    const date = req.params.date;
-
-    if (!date) {
-      return res.status(400).json({ success: false, message: 'date가 필요합니다.' });
-    }
-
-    const messages = await fetchMessagesByDate(date);
-    const filtered = messages.filter(m => m.m_mode === 'VOICE');
-
-    if (!filtered || filtered.length === 0) {
-      return res.status(404).json({ success: false, message: '해당 날짜에 대화가 없습니다.' });
-    }
-
-    res.status(200).json({ success: true, data: filtered });
-
-  } catch (error) {
-    console.error('대화 상세 조회 오류:', error);
-    res.status(500).json({ success: false, message: '서버 오류입니다.' });
-  }
-};
-
-//특정 날짜 대화 삭제
-export const deleteChatByDateController = async (req, res) => {
-  try {
-    const date = req.params.date;
-
-    if (!date) {
-      return res.status(400).json({ success: false, message: 'date가 필요합니다.' });
-    }
-
-    const deletedCount = await deleteMessagesByDate(date);
-
-    if (deletedCount === 0) {
-      return res.status(404).json({ success: false, message: '해당 날짜에 삭제할 메시지가 없습니다.' });
-    }
-
-    res.status(200).json({
-      success: true,
-      message: `총 ${deletedCount}개의 메시지를 삭제했습니다.`,
-    });
-
-  } catch (error) {
-    console.error('대화 삭제 오류:', error);
-    res.status(500).json({ success: false, message: '서버 오류입니다.' });
-  }
-};
-
-//대화 내용 검색
-export const searchChatMessagesController = async (req, res) => {
-  try {
-    const query = req.query.query;
-
-    if (!query) {
-      return res.status(400).json({ success: false, message: 'query 파라미터가 필요합니다.' });
-    }
-
-    const results = await searchChatMessages(query);
-    const filtered = results.filter(m => m.m_mode === 'VOICE');
-
-    res.status(200).json({
-      success: true,
-      count: filtered.length,
-      data: filtered
-    });
-
-  } catch (error) {
-    console.error('대화 검색 오류:', error);
-    res.status(500).json({ success: false, message: '서버 오류입니다.' });
-  }
-};
-
-//요약 메시지만 조회
-export const getSummaryMessagesController = async (req, res) => {
-  try {
-    const messages = await getAllMessages();
-    const summaries = messages.filter(m => m.m_mode === 'SUMMARY');
-
-    if (!summaries.length) {
-      return res.status(404).json({
-        success: false,
-        message: '요약 메시지가 없습니다.'
-      });
-    }
-
-    res.status(200).json({
-      success: true,
-      count: summaries.length,
-      data: summaries
-    });
-  } catch (error) {
-    console.error('요약 조회 오류:', error);
-    res.status(500).json({
-      success: false,
-      message: '서버 오류입니다.'
-    });
-  }
-};
+import { sendMessage } from '../services/message.service.js'; //메시지 전송
+import { sendMessages } from '../services/message.service.js'; //메시지 일괄 전송
+import { getAllMessages } from '../services/message.service.js'; //메시지 조회
+import { readMessage } from '../services/message.service.js'; //메시지 읽음 처리
+import { deleteMessage } from '../services/message.service.js'; //메시지 삭제
+import { fetchChatDateList } from '../services/message.service.js'; //대화 목록 조회
+import { fetchMessagesByDate } from '../services/message.service.js'; //대화 상세 조회
+import { deleteMessagesByDate } from '../services/message.service.js'; //특정 날짜 대화 삭제
+import { searchChatMessages } from '../services/message.service.js'; //대화 내용 검색
+import { getLatestCursor, waitForMessages } from '../services/message.stream.service.js'; //새 메시지 구독
+
+//메시지 전송
+// export const sendMessageController = async (req, res) => {
+//   try {
+//     const { content, mode, summary, userNo, chatNo } = req.body;
+
+//     // 누락된 필드 체크
+//     const missingFields = [];
+//     if (!content) missingFields.push("content");
+//     if (!mode) missingFields.push("mode");
+//     if (!userNo) missingFields.push("userNo");
+//     if (!chatNo) missingFields.push("chatNo");
+
+//     if (missingFields.length > 0) {
+//       return res.status(400).json({
+//         success: false,
+//         message: `필수 항목 누락: ${missingFields.join(", ")}`
+//       });
+//     }
+
+//     const result = await sendMessage({ content, mode, summary, userNo, chatNo });
+//     res.status(201).json({ success: true, data: result });
+
+//   } catch (error) {
+//     console.error('메시지 전송 오류:', error);
+//     res.status(500).json({ success: false, message: '서버 내부 오류입니다.' });
+//   }
+// };
+// 메시지 1건 검증 → { error } 또는 { chatFlag } (대소문자/공백 보정된 값)
+const ALLOWED_CHAT_FLAGS = new Set(["AI","PARENTS","CHILD"]);
+const validateMessage = ({ content, mode, userNo, chatNo, chatFlag } = {}) => {
+  const missing = [];
+  if (!content) missing.push("content");
+  if (!mode) missing.push("mode");
+  if (!userNo) missing.push("userNo");
+  if (!chatNo) missing.push("chatNo");
+  if (!chatFlag) missing.push("chatFlag");
+  if (missing.length) {
+    return { error: `필수 항목 누락: ${missing.join(", ")}` };
+  }
+
+  // ✅ 대소문자/공백 보정 + 허용셋 검증
+  chatFlag = String(chatFlag).trim().toUpperCase();
+  if (!ALLOWED_CHAT_FLAGS.has(chatFlag)) {
+    return { error: `chatFlag 값이 유효하지 않습니다: ${chatFlag}` };
+  }
+  return { chatFlag };
+};
+
+export const sendMessageController = async (req, res) => {
+  try {
+    let { content, mode, summary, userNo, chatNo, chatFlag } = req.body;
+
+    const checked = validateMessage(req.body);
+    if (checked.error) {
+      return res.status(400).json({ success:false, message: checked.error });
+    }
+    chatFlag = checked.chatFlag;
+
+    // (디버그) 실제 들어온 값 로그
+    console.log("[sendMessage] flag:", chatFlag, "body:", req.body);
+
+    const dto = {
+      m_content: content,
+      m_mode: mode,
+      m_summary: summary || null,
+      user_no: userNo,
+      chat_no: chatNo,
+      chat_flag: chatFlag,
+    };
+
+    const result = await sendMessage({ content, mode, summary, userNo, chatNo, chatFlag });
+    res.status(201).json({ success:true, data: result });
+  } catch (e) {
+    console.error("메시지 전송 오류:", e);
+    res.status(500).json({ success:false, message:"서버 내부 오류입니다." });
+  }
+};
+
+//메시지 일괄 전송 (쓰기 지연 큐가 쌓인 메시지를 순서대로 한 번에 보냄)
+// body: { messages: [{ content, mode, summary, userNo, chatNo, chatFlag }, ...] }
+export const sendMessagesBatchController = async (req, res) => {
+  try {
+    const { messages } = req.body;
+    if (!Array.isArray(messages) || messages.length === 0) {
+      return res.status(400).json({ success:false, message:"messages 배열이 필요합니다." });
+    }
+
+    const list = [];
+    for (const [index, m] of messages.entries()) {
+      const checked = validateMessage(m);
+      if (checked.error) {
+        // 하나라도 잘못되면 전체 거부 (부분 저장 시 순서가 어긋나지 않게)
+        return res.status(400).json({ success:false, index, message: checked.error });
+      }
+      list.push({ ...m, chatFlag: checked.chatFlag });
+    }
+
+    const result = await sendMessages(list);
+    res.status(201).json({ success:true, count: result.length, data: result });
+  } catch (e) {
+    console.error("메시지 일괄 전송 오류:", e);
+    res.status(500).json({ success:false, message:"서버 내부 오류입니다." });
+  }
+};
+
+
+
+//메시지 조회
+export const getMessagesController = async (req, res) => {
+  try {
+    const messages = await getAllMessages();
+    const filtered = messages.filter(m => m.m_mode === 'VOICE');
+    res.status(200).json({ success: true, data: filtered });
+  } catch (error) {
+    console.error('메시지 조회 오류:', error);
+    res.status(500).json({ success: false, message: '서버 오류입니다.' });
+  }
+};
+
+//메시지 읽음 처리
+export const markMessageReadController = async (req, res) => {
+  try {
+    const messageId = req.params.message_no;
+
+    if (!messageId) {
+      return res.status(400).json({ success: false, message: 'message_no가 필요합니다.' });
+    }
+
+    const success = await readMessage(messageId);
+
+    if (!success) {
+      return res.status(404).json({ success: false, message: '해당 메시지를 찾을 수 없습니다.' });
+    }
+
+    res.status(200).json({ success: true, message: '메시지가 읽음 처리되었습니다.' });
+
+  } catch (error) {
+    console.error('읽음 처리 오류:', error);
+    res.status(500).json({ success: false, message: '서버 오류입니다.' });
+  }
+};
+
+//메시지 삭제(소프트 딜리트)
+export const deleteMessageController = async (req, res) => {
+  try {
+    const messageId = req.params.message_no;
+
+    if (!messageId) {
+      return res.status(400).json({ success: false, message: 'message_no가 필요합니다.' });
+    }
+
+    const success = await deleteMessage(messageId);
+
+    if (!success) {
+      return res.status(404).json({ success: false, message: '해당 메시지를 찾을 수 없습니다.' });
+    }
+
+    res.status(200).json({ success: true, message: '메시지가 삭제되었습니다.' });
+
+  } catch (error) {
+    console.error('메시지 삭제 오류:', error);
+    res.status(500).json({ success: false, message: '서버 오류입니다.' });
+  }
+};
+
+//대화 목록 조회
+export const getChatDateListController = async (req, res) => {
+  try {
+    const dateList = await fetchChatDateList();
+    res.status(200).json({ success: true, data: dateList });
+  } catch (error) {
+    console.error('대화 날짜 목록 조회 오류:', error);
+    res.status(500).json({ success: false, message: '서버 오류입니다.' });
+  }
+};
+
+//대화 상세 조회
+export const getChatDetailByDateController = async (req, res) => {
+  try {
+    const date = req.params.date;
+
+    if (!date) {
+      return res.status(400).json({ success: false, message: 'date가 필요합니다.' });
+    }
+
+    const messages = await fetchMessagesByDate(date);
+    const filtered = messages.filter(m => m.m_mode === 'VOICE');
+
+    if (!filtered || filtered.length === 0) {
+      return res.status(404).json({ success: false, message: '해당 날짜에 대화가 없습니다.' });
+    }
+
+    res.status(200).json({ success: true, data: filtered });
+
+  } catch (error) {
+    console.error('대화 상세 조회 오류:', error);
+    res.status(500).json({ success: false, message: '서버 오류입니다.' });
+  }
+};
+
+//특정 날짜 대화 삭제
+export const deleteChatByDateController = async (req, res) => {
+  try {
+    const date = req.params.date;
+
+    if (!date) {
+      return res.status(400).json({ success: false, message: 'date가 필요합니다.' });
+    }
+
+    const deletedCount = await deleteMessagesByDate(date);
+
+    if (deletedCount === 0) {
+      return res.status(404).json({ success: false, message: '해당 날짜에 삭제할 메시지가 없습니다.' });
+    }
+
+    res.status(200).json({
+      success: true,
+      message: `총 ${deletedCount}개의 메시지를 삭제했습니다.`,
+    });
+
+  } catch (error) {
+    console.error('대화 삭제 오류:', error);
+    res.status(500).json({ success: false, message: '서버 오류입니다.' });
+  }
+};
+
+//대화 내용 검색
+export const searchChatMessagesController = async (req, res) => {
+  try {
+    const query = req.query.query;
+
+    if (!query) {
+      return res.status(400).json({ success: false, message: 'query 파라미터가 필요합니다.' });
+    }
+
+    const results = await searchChatMessages(query);
+    const filtered = results.filter(m => m.m_mode === 'VOICE');
+
+    res.status(200).json({
+      success: true,
+      count: filtered.length,
+      data: filtered
+    });
+
+  } catch (error) {
+    console.error('대화 검색 오류:', error);
+    res.status(500).json({ success: false, message: '서버 오류입니다.' });
+  }
+};
+
+//요약 메시지만 조회
+export const getSummaryMessagesController = async (req, res) => {
+  try {
+    const messages = await getAllMessages();
+    const summaries = messages.filter(m => m.m_mode === 'SUMMARY');
+
+    if (!summaries.length) {
+      return res.status(404).json({
+        success: false,
+        message: '요약 메시지가 없습니다.'
+      });
+    }
+
+    res.status(200).json({
+      success: true,
+      count: summaries.length,
+      data: summaries
+    });
+  } catch (error) {
+    console.error('요약 조회 오류:', error);
+    res.status(500).json({
+      success: false,
+      message: '서버 오류입니다.'
+    });
+  }
+};
+
+// 구독 조건 파싱: ?mode=VOICE,SUMMARY&flag=PARENTS,USER (쉼표 구분, 없으면 전체)
+const parseList = (v) => String(v || "")
+  .split(",")
+  .map((s) => s.trim().toUpperCase())
+  .filter(Boolean);
+
+const parseCursor = (v) => {
+  if (v === undefined || v === null || v === "") return null;
+  const n = Number(v);
+  return Number.isInteger(n) && n >= 0 ? n : NaN;
+};
+
+const POLL_MAX_SEC = 60;      // 롱폴링 최대 대기
+const SSE_HEARTBEAT_MS = 15000; // SSE 연결 유지용 주석 줄 주기
+
+//새 메시지 롱폴링
+// GET /messages/poll?since=<id>&mode=VOICE&flag=PARENTS&timeout=25
+// - since 없으면 바로 { cursor: 최신 id } 반환 (구독 시작점)
+// - since 이후 메시지가 생기면 즉시, 없으면 timeout 초 후 빈 배열로 응답
+export const pollMessagesController = async (req, res) => {
+  try {
+    const since = parseCursor(req.query.since);
+    if (Number.isNaN(since)) {
+      return res.status(400).json({ success: false, message: 'since는 0 이상의 정수여야 합니다.' });
+    }
+    if (since === null) {
+      return res.status(200).json({ success: true, data: [], cursor: await getLatestCursor() });
+    }
+
+    const timeoutSec = Math.min(Math.max(Number(req.query.timeout ?? 25) || 0, 0), POLL_MAX_SEC);
+    const ac = new AbortController();
+    res.on('close', () => ac.abort()); // 클라이언트가 끊으면 대기 중단
+
+    const rows = await waitForMessages({
+      since,
+      modes: parseList(req.query.mode),
+      flags: parseList(req.query.flag),
+      timeoutMs: timeoutSec * 1000,
+      signal: ac.signal,
+    });
+    if (ac.signal.aborted) return;
+
+    const cursor = rows.length ? rows[rows.length - 1].id : since;
+    res.status(200).json({ success: true, data: rows, cursor });
+  } catch (error) {
+    console.error('메시지 롱폴링 오류:', error);
+    if (!res.headersSent) {
+      res.status(500).json({ success: false, message: '서버 오류입니다.' });
+    }
+  }
+};
+
+//새 메시지 스트림 (SSE)
+// GET /messages/stream?since=<id>&mode=VOICE&flag=PARENTS  (재연결 시 Last-Event-ID 헤더도 인식)
+// - 처음에 event: ready (data: { cursor }) 한 번, 이후 메시지마다 id: <id> / data: <row JSON>
+export const streamMessagesController = async (req, res) => {
+  let cursor = parseCursor(req.query.since ?? req.get('Last-Event-ID'));
+  if (Number.isNaN(cursor)) {
+    return res.status(400).json({ success: false, message: 'since는 0 이상의 정수여야 합니다.' });
+  }
+
+  const ac = new AbortController();
+  res.on('close', () => ac.abort());
+  try {
+    if (cursor === null) cursor = await getLatestCursor();
+    res.set({
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      Connection: 'keep-alive',
+      'X-Accel-Buffering': 'no', // 프록시 버퍼링 끄기
+    });
+    res.flushHeaders();
+    res.write(`event: ready\ndata: ${JSON.stringify({ cursor })}\n\n`);
+
+    const modes = parseList(req.query.mode);
+    const flags = parseList(req.query.flag);
+    while (!ac.signal.aborted) {
+      const rows = await waitForMessages({
+        since: cursor, modes, flags, timeoutMs: SSE_HEARTBEAT_MS, signal: ac.signal,
+      });
+      if (ac.signal.aborted) break;
+      if (!rows.length) {
+        res.write(': ping\n\n');
+        continue;
+      }
+      for (const row of rows) {
+        res.write(`id: ${row.id}\ndata: ${JSON.stringify(row)}\n\n`);
+        cursor = row.id;
+      }
+    }
+  } catch (error) {
+    console.error('메시지 스트림 오류:', error);
+    if (!res.headersSent) {
+      return res.status(500).json({ success: false, message: '서버 오류입니다.' });
+    }
+  }
+  res.end();
+};
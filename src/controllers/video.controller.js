@@ -1,29 +1,66 @@
-// controllers/video.controller.js
-import { findNextQueuedVideo, findVideoById } from "../services/video.service.js";
-import { buildVideoAccess } from "../services/video.access.service.js"; // S3 or Local URL 생성
-
-export const getNextVideoController = async (req, res) => {
-  try {
-    const v = await findNextQueuedVideo(); // {id, file_key, mime}
-    if (!v) return res.status(404).json({ success:false, message:"no queued video" });
-
-    const access = await buildVideoAccess(v); // { url } or { signed_url }
-    return res.json({ success:true, data: { ...v, ...access }});
-  } catch (e) {
-    console.error(e);
-    res.status(500).json({ success:false, message:"server error" });
-  }
-};
-
-export const getVideoByIdController = async (req, res) => {
-  try {
-    const v = await findVideoById(req.params.id);
-    if (!v) return res.status(404).json({ success:false, message:"not found" });
-
-    const access = await buildVideoAccess(v);
-    return res.json({ success:true, data: { ...v, ...access }});
-  } catch (e) {
-    console.error(e);
-    res.status(500).json({ success:false, message:"server error" });
-  }
-};
+// controllers/video.controller.js
+import { findNextQueuedVideo, findVideoById, claimNextVideo, finishVideo, renewVideo } from "../services/video.service.js";
+import { buildVideoAccess } from "../services/video.access.service.js"; // S3 or Local URL 생성
+
+export const getNextVideoController = async (req, res) => {
+  try {
+    // ?claim=1 이면 queued → processing 으로 바꾸면서 가져감 (분석 워커 동시 실행용)
+    const claim = req.query.claim === "1" || req.query.claim === "true";
+    const v = claim ? await claimNextVideo() : await findNextQueuedVideo(); // {id, file_key, mime}
+    if (!v) return res.status(404).json({ success:false, message:"no queued video" });
+
+    const access = await buildVideoAccess(v); // { url } or { signed_url }
+    return res.json({ success:true, data: { ...v, ...access }});
+  } catch (e) {
+    console.error(e);
+    res.status(500).json({ success:false, message:"server error" });
+  }
+};
+
+export const getVideoByIdController = async (req, res) => {
+  try {
+    const v = await findVideoById(req.params.id);
+    if (!v) return res.status(404).json({ success:false, message:"not found" });
+
+    const access = await buildVideoAccess(v);
+    return res.json({ success:true, data: { ...v, ...access }});
+  } catch (e) {
+    console.error(e);
+    res.status(500).json({ success:false, message:"server error" });
+  }
+};
+
+// 분석 결과 보고: body { status: 'done' | 'failed' | 'queued'(반납) | 'processing'(임대 연장),
+//                       summary?, report_text?, report_path?, error? }
+const RESULT_STATUSES = ["done", "failed", "queued", "processing"];
+
+export const postVideoResultController = async (req, res) => {
+  try {
+    const { status, summary, report_text, report_path, error } = req.body || {};
+    if (!RESULT_STATUSES.includes(status)) {
+      return res.status(400).json({ success:false, message:`status는 ${RESULT_STATUSES.join(" | ")} 중 하나여야 합니다.` });
+    }
+
+    let ok;
+    if (status === "processing") {
+      ok = await renewVideo(req.params.id);
+    } else {
+      const result = status === "done" ? { summary: summary ?? null, report_text: report_text ?? null, report_path: report_path ?? null }
+                   : status === "failed" ? { error: error ?? null }
+                   : null;
+      ok = await finishVideo(req.params.id, status, result);
+    }
+    if (!ok) {
+      // 없는 영상 → 404, 이미 끝났거나 반납된(processing 이 아닌) 영상 → 409
+      const v = await findVideoById(req.params.id);
+      if (!v) return res.status(404).json({ success:false, message:"not found" });
+      return res.status(409).json({ success:false, message:`processing 상태가 아닙니다 (현재 ${v.status})` });
+    }
+
+    if (status === "failed") console.warn(`[video] ${req.params.id} 분석 실패:`, req.body?.error);
+    return res.json({ success:true, data: { id: req.params.id, status }});
+  } catch (e) {
+    console.error(e);
+    res.status(500).json({ success:false, message:"server error" });
+  }
+};
@@ -1,194 +1,283 @@
-import { pool } from '../config/db.js';
-
-//메시지 전송
-// export const saveMessage = async (messageDTO) => {
-//   const query = `
-//     INSERT INTO chat (
-//       createdDate,
-//       modifiedDate,
-//       m_content,
-//       m_mode,
-//       m_read,
-//       m_del,
-//       m_summary,
-//       user_no
-//     ) VALUES (NOW(), NOW(), ?, ?, 'N', 'N', ?, ?)
-//   `;
-
-//   const values = [
-//     messageDTO.m_content,
-//     messageDTO.m_mode,
-//     messageDTO.m_summary,
-//     messageDTO.user_no
-//   ];
-
-//   const [result] = await pool.execute(query, values);
-
-//   return {
-//     id: result.insertId,
-//     ...messageDTO,
-//     m_read: 'N',
-//     m_del: 'N',
-//     createdDate: new Date()
-//   };
-// };
-// 메시지 전송 (스냅샷 저장)
-// 저장 시 flag 스냅샷으로 기록 (조인/서브쿼리 X)
-export const saveMessage = async (messageDTO) => {
-  const query = `
-    INSERT INTO chat (
-      createdDate, modifiedDate,
-      m_content, m_mode,
-      m_read, m_del,
-      m_summary,
-      user_no,
-      chat_flag
-    ) VALUES (
-      NOW(), NOW(),
-      ?, ?, 'N', 'N',
-      ?,
-      ?,
-      ?
-    )
-  `;
-
-  const values = [
-    messageDTO.m_content,
-    messageDTO.m_mode,
-    messageDTO.m_summary,
-    messageDTO.user_no,
-    messageDTO.chat_flag,
-  ];
-
-  // (디버그) 실제 바인딩되는 값 찍기
-  console.log("[saveMessage] values:", values);
-
-  const [result] = await pool.execute(query, values);
-  return {
-    id: result.insertId,
-    ...messageDTO,
-    m_read: 'N',
-    m_del: 'N',
-    createdDate: new Date(),
-    chat_flag: messageDTO.chat_flag,
-  };
-};
-
-
-
-
-
-//메시지 조회
-// export const findAllMessages = async () => {
-//   const query = `
-//     SELECT 
-//       createdDate,
-//       m_content,
-//       m_mode,
-//       m_read,
-//       m_del,
-//       m_summary,
-//       user_no
-//     FROM chat
-//     WHERE m_del = 'N'
-//   `;
-//   const [rows] = await pool.execute(query);
-//   return rows;
-// };
-// 메시지 조회
-export const findAllMessages = async () => {
-  const query = `
-    SELECT 
-      createdDate,
-      m_content,
-      m_mode,
-      m_read,
-      m_del,
-      m_summary,
-      user_no,
-      chat_flag AS chatFlag   -- 스냅샷 사용
-    FROM chat
-    WHERE m_del = 'N'
-    ORDER BY createdDate DESC
-  `;
-  const [rows] = await pool.execute(query);
-  return rows;
-};
-
-
-  
-
-// 메시지 읽음 처리
-export const markMessageAsRead = async (messageId) => {
-  const query = `
-    UPDATE chat
-    SET m_read = 'Y'
-    WHERE id = ?
-  `;
-  const [result] = await pool.execute(query, [messageId]);
-  return result.affectedRows > 0;
-};
-
-//메시지 삭제(소프트 딜리트)
-export const softDeleteMessageById = async (messageId) => {
-  const query = `
-    UPDATE chat
-    SET m_del = 'Y'
-    WHERE id = ?
-  `;
-  const [result] = await pool.execute(query, [messageId]);
-  return result.affectedRows > 0;
-};
-
-//대화 목록 조회
-export const getChatDateList = async () => {
-  const query = `
-    SELECT DATE(createdDate) as chat_date
-    FROM chat
-    WHERE m_del = 'N'
-    GROUP BY DATE(createdDate)
-    ORDER BY chat_date DESC
-  `;
-
-  const [rows] = await pool.execute(query);
-  return rows.map(row => row.chat_date); // 날짜만 배열로 반환
-};
-
-//대화 상세 조회(특정 날짜 대화 모아보기)
-export const getMessagesByDate = async (date) => {
-  const query = `
-    SELECT *
-    FROM chat
-    WHERE DATE(createdDate) = ? AND m_del = 'N'
-    ORDER BY createdDate ASC
-  `;
-  const [rows] = await pool.execute(query, [date]);
-  return rows;
-};
-
-//특정 날짜 대화 몽땅 삭제
-export const softDeleteMessagesByDate = async (date) => {
-  const query = `
-    UPDATE chat
-    SET m_del = 'Y'
-    WHERE DATE(createdDate) = ? AND m_del = 'N'
-  `;
-  const [result] = await pool.execute(query, [date]);
-  return result.affectedRows; // 삭제된 행 수 반환
-};
-
-//대화 내용 검색
-export const searchMessages = async (query) => {
-  const sql = `
-    SELECT createdDate, m_content, m_mode, m_read, m_summary, user_no
-    FROM chat
-    WHERE m_del = 'N'
-      AND (
-        m_content LIKE CONCAT('%', ?, '%') OR
-        DATE_FORMAT(createdDate, '%Y-%m-%d') LIKE CONCAT('%', ?, '%')
-      )
-    ORDER BY createdDate DESC
-  `;
-  const [rows] = await pool.execute(sql, [query, query]);
-  return rows;
-};
+import { pool } from '../config/db.js';
+import { hasColumn } from '../config/schema.js';
+
+// 음성 대화 메시지를 대화(chatNo)별로 구분하기 위한 chat_no 컬럼 (config/schema.js 가 서버 시작 시 추가)
+// - 상담 메시지 등 대화 번호 없는 메시지는 NULL
+// - 구독(/messages/poll, /messages/stream) 응답에 chatNo 로 실어 보냄 → 파이썬 세션이 자기 대화의 부모 답장만 받음
+// - 마이그레이션이 안 된 DB(ALTER 권한 없음 등)에서는 chat_no 없이 예전 쿼리 그대로
+const chatNoColumn = () => hasColumn("chat", "chat_no");
+
+//메시지 전송
+// export const saveMessage = async (messageDTO) => {
+//   const query = `
+//     INSERT INTO chat (
+//       createdDate,
+//       modifiedDate,
+//       m_content,
+//       m_mode,
+//       m_read,
+//       m_del,
+//       m_summary,
+//       user_no
+//     ) VALUES (NOW(), NOW(), ?, ?, 'N', 'N', ?, ?)
+//   `;
+
+//   const values = [
+//     messageDTO.m_content,
+//     messageDTO.m_mode,
+//     messageDTO.m_summary,
+//     messageDTO.user_no
+//   ];
+
+//   const [result] = await pool.execute(query, values);
+
+//   return {
+//     id: result.insertId,
+//     ...messageDTO,
+//     m_read: 'N',
+//     m_del: 'N',
+//     createdDate: new Date()
+//   };
+// };
+// 메시지 전송 (스냅샷 저장)
+// 저장 시 flag 스냅샷으로 기록 (조인/서브쿼리 X)
+export const saveMessage = async (messageDTO) => {
+  const withChatNo = await chatNoColumn();
+  const query = `
+    INSERT INTO chat (
+      createdDate, modifiedDate,
+      m_content, m_mode,
+      m_read, m_del,
+      m_summary,
+      user_no,
+      chat_flag${withChatNo ? ",\n      chat_no" : ""}
+    ) VALUES (
+      NOW(), NOW(),
+      ?, ?, 'N', 'N',
+      ?,
+      ?,
+      ?${withChatNo ? ",\n      ?" : ""}
+    )
+  `;
+
+  const values = [
+    messageDTO.m_content,
+    messageDTO.m_mode,
+    messageDTO.m_summary,
+    messageDTO.user_no,
+    messageDTO.chat_flag,
+  ];
+  if (withChatNo) values.push(messageDTO.chat_no ?? null);
+
+  // (디버그) 실제 바인딩되는 값 찍기
+  console.log("[saveMessage] values:", values);
+
+  const [result] = await pool.execute(query, values);
+  return {
+    id: result.insertId,
+    ...messageDTO,
+    m_read: 'N',
+    m_del: 'N',
+    createdDate: new Date(),
+    chat_flag: messageDTO.chat_flag,
+  };
+};
+
+// 메시지 여러 건 한 번에 저장 (트랜잭션 1번, 배열 순서대로 INSERT → 각자의 insertId)
+// - 여러 행 INSERT 1번은 innodb_autoinc_lock_mode=2 에서 id가 연속이라는 보장이 없어 행마다 insertId를 받음
+// - 커밋은 1번이라 건별 요청보다 디스크 flush/왕복이 적고, 중간에 실패하면 전부 롤백 (클라이언트가 통째로 재전송)
+export const saveMessages = async (messageDTOs) => {
+  const withChatNo = await chatNoColumn();
+  const query = `
+    INSERT INTO chat (
+      createdDate, modifiedDate,
+      m_content, m_mode,
+      m_read, m_del,
+      m_summary,
+      user_no,
+      chat_flag${withChatNo ? ", chat_no" : ""}
+    ) VALUES (NOW(), NOW(), ?, ?, 'N', 'N', ?, ?, ?${withChatNo ? ", ?" : ""})
+  `;
+  const conn = await pool.getConnection();
+  try {
+    await conn.beginTransaction();
+    const saved = [];
+    for (const m of messageDTOs) {
+      const values = [m.m_content, m.m_mode, m.m_summary, m.user_no, m.chat_flag];
+      if (withChatNo) values.push(m.chat_no ?? null);
+      const [result] = await conn.execute(query, values);
+      saved.push({
+        ...m,
+        id: result.insertId,
+        m_read: 'N',
+        m_del: 'N',
+        createdDate: new Date(),
+      });
+    }
+    await conn.commit();
+    return saved;
+  } catch (e) {
+    await conn.rollback();
+    throw e;
+  } finally {
+    conn.release();
+  }
+};
+
+
+
+
+
+//메시지 조회
+// export const findAllMessages = async () => {
+//   const query = `
+//     SELECT 
+//       createdDate,
+//       m_content,
+//       m_mode,
+//       m_read,
+//       m_del,
+//       m_summary,
+//       user_no
+//     FROM chat
+//     WHERE m_del = 'N'
+//   `;
+//   const [rows] = await pool.execute(query);
+//   return rows;
+// };
+// 메시지 조회
+export const findAllMessages = async () => {
+  const query = `
+    SELECT 
+      createdDate,
+      m_content,
+      m_mode,
+      m_read,
+      m_del,
+      m_summary,
+      user_no,
+      chat_flag AS chatFlag   -- 스냅샷 사용
+    FROM chat
+    WHERE m_del = 'N'
+    ORDER BY createdDate DESC, id DESC   -- 같은 초에 저장된 메시지는 저장 순서로
+  `;
+  const [rows] = await pool.execute(query);
+  return rows;
+};
+
+// 커서(id) 이후 새 메시지 조회 (구독용)
+// - PK 범위 조회라 전체 기록이 쌓여도 비용이 새 메시지 수에만 비례
+// - modes/flags 가 비어 있으면 해당 조건 없이 전체
+export const findMessagesAfter = async ({ afterId = 0, modes = [], flags = [], limit = 100 }) => {
+  const withChatNo = await chatNoColumn();
+  const where = ["id > ?", "m_del = 'N'"];
+  const values = [afterId];
+  if (modes.length) {
+    where.push(`m_mode IN (${modes.map(() => "?").join(", ")})`);
+    values.push(...modes);
+  }
+  if (flags.length) {
+    where.push(`chat_flag IN (${flags.map(() => "?").join(", ")})`);
+    values.push(...flags);
+  }
+  const query = `
+    SELECT
+      id,
+      createdDate,
+      m_content,
+      m_mode,
+      m_read,
+      m_summary,
+      user_no,
+      chat_flag AS chatFlag${withChatNo ? ",\n      chat_no AS chatNo" : ""}
+    FROM chat
+    WHERE ${where.join(" AND ")}
+    ORDER BY id ASC
+    LIMIT ${Math.max(1, Math.min(Number(limit) || 100, 500))}
+  `;
+  const [rows] = await pool.execute(query, values);
+  return rows;
+};
+
+// 가장 최근 메시지 id (구독 시작 커서)
+export const findLatestMessageId = async () => {
+  const [rows] = await pool.execute(`SELECT COALESCE(MAX(id), 0) AS id FROM chat`);
+  return Number(rows[0].id);
+};
+
+  
+
+// 메시지 읽음 처리
+export const markMessageAsRead = async (messageId) => {
+  const query = `
+    UPDATE chat
+    SET m_read = 'Y'
+    WHERE id = ?
+  `;
+  const [result] = await pool.execute(query, [messageId]);
+  return result.affectedRows > 0;
+};
+
+//메시지 삭제(소프트 딜리트)
+export const softDeleteMessageById = async (messageId) => {
+  const query = `
+    UPDATE chat
+    SET m_del = 'Y'
+    WHERE id = ?
+  `;
+  const [result] = await pool.execute(query, [messageId]);
+  return result.affectedRows > 0;
+};
+
+//대화 목록 조회
+export const getChatDateList = async () => {
+  const query = `
+    SELECT DATE(createdDate) as chat_date
+    FROM chat
+    WHERE m_del = 'N'
+    GROUP BY DATE(createdDate)
+    ORDER BY chat_date DESC
+  `;
+
+  const [rows] = await pool.execute(query);
+  return rows.map(row => row.chat_date); // 날짜만 배열로 반환
+};
+
+//대화 상세 조회(특정 날짜 대화 모아보기)
+export const getMessagesByDate = async (date) => {
+  const query = `
+    SELECT *
+    FROM chat
+    WHERE DATE(createdDate) = ? AND m_del = 'N'
+    ORDER BY createdDate ASC
+  `;
+  const [rows] = await pool.execute(query, [date]);
+  return rows;
+};
+
+//특정 날짜 대화 몽땅 삭제
+export const softDeleteMessagesByDate = async (date) => {
+  const query = `
+    UPDATE chat
+    SET m_del = 'Y'
+    WHERE DATE(createdDate) = ? AND m_del = 'N'
+  `;
+  const [result] = await pool.execute(query, [date]);
+  return result.affectedRows; // 삭제된 행 수 반환
+};
+
+//대화 내용 검색
+export const searchMessages = async (query) => {
+  const sql = `
+    SELECT createdDate, m_content, m_mode, m_read, m_summary, user_no
+    FROM chat
+    WHERE m_del = 'N'
+      AND (
+        m_content LIKE CONCAT('%', ?, '%') OR
+        DATE_FORMAT(createdDate, '%Y-%m-%d') LIKE CONCAT('%', ?, '%')
+      )
+    ORDER BY createdDate DESC
+  `;
+  const [rows] = await pool.execute(sql, [query, query]);
+  return rows;
+};
@@ -1,18 +1,96 @@
-// repositories/video.repository.js
-import { pool } from "../config/db.js";
-
-export const getNextQueuedRow = async () => {
-  const [rows] = await pool.execute(
-    `SELECT id, file_key, mime, status, created_at
-     FROM video WHERE status='queued' ORDER BY created_at ASC LIMIT 1`
-  );
-  return rows[0] || null;
-};
-
-export const getVideoRowById = async (id) => {
-  const [rows] = await pool.execute(
-    `SELECT id, file_key, mime, status, created_at
-     FROM video WHERE id = ? LIMIT 1`, [id]
-  );
-  return rows[0] || null;
-};
+// repositories/video.repository.js
+import { pool } from "../config/db.js";
+import { hasColumn } from "../config/schema.js";
+
+// 분석 워커 임대(lease) + 결과 보관용 컬럼 (config/schema.js 가 서버 시작 시 추가)
+//   claimed_at DATETIME NULL  -- processing 으로 가져간(또는 연장한) 시각
+//   result     JSON     NULL  -- 분석 결과 { summary, report_text, report_path } / { error }
+// 워커가 죽어 processing 에 남은 영상은 claimed_at 이 이 시간보다 오래되면 다른 워커가 다시 가져감
+// 마이그레이션이 안 된 DB(ALTER 권한 없음 등)에서는 없는 컬럼 없이 예전처럼 (queued 만 가져감, 결과는 저장 X)
+export const VIDEO_LEASE_SEC = Number(process.env.VIDEO_LEASE_SEC || 3600);
+
+export const getNextQueuedRow = async () => {
+  const [rows] = await pool.execute(
+    `SELECT id, file_key, mime, status, created_at
+     FROM video WHERE status='queued' ORDER BY created_at ASC LIMIT 1`
+  );
+  return rows[0] || null;
+};
+
+export const getVideoRowById = async (id) => {
+  const extra = [];
+  if (await hasColumn("video", "claimed_at")) extra.push("claimed_at");
+  if (await hasColumn("video", "result")) extra.push("result");
+  const [rows] = await pool.execute(
+    `SELECT id, file_key, mime, status, created_at${extra.map((c) => `, ${c}`).join("")}
+     FROM video WHERE id = ? LIMIT 1`, [id]
+  );
+  return rows[0] || null;
+};
+
+// 워커 여러 개가 동시에 가져가도 한 영상은 한 워커만 받도록 queued → processing 원자적 전환
+// 임대가 만료된 processing 영상(워커 비정상 종료)도 같이 대상
+export const claimNextQueuedRow = async (leaseSec = VIDEO_LEASE_SEC) => {
+  const lease = await hasColumn("video", "claimed_at");
+  const conn = await pool.getConnection();
+  try {
+    await conn.beginTransaction();
+    const [rows] = lease
+      ? await conn.execute(
+          `SELECT id, file_key, mime, status, created_at
+           FROM video
+           WHERE status='queued'
+              OR (status='processing' AND (claimed_at IS NULL OR claimed_at < NOW() - INTERVAL ? SECOND))
+           ORDER BY created_at ASC LIMIT 1 FOR UPDATE`, [leaseSec]
+        )
+      : await conn.execute(
+          `SELECT id, file_key, mime, status, created_at
+           FROM video WHERE status='queued' ORDER BY created_at ASC LIMIT 1 FOR UPDATE`
+        );
+    const row = rows[0];
+    if (row) {
+      if (row.status === "processing") console.warn(`[video] ${row.id} 임대 만료 → 다시 분석`);
+      await conn.execute(
+        `UPDATE video SET status='processing'${lease ? ", claimed_at=NOW()" : ""} WHERE id = ?`, [row.id]
+      );
+    }
+    await conn.commit();
+    return row ? { ...row, status: "processing" } : null;
+  } catch (e) {
+    await conn.rollback();
+    throw e;
+  } finally {
+    conn.release();
+  }
+};
+
+// 분석 끝(done/failed) 또는 반납(queued): 임대 해제 + 결과 저장
+// processing 인 영상만 (이미 끝났거나 반납된 영상을 늦게 온 보고가 덮어쓰지 않도록)
+export const updateVideoStatus = async (id, status, result = null) => {
+  const set = ["status = ?"];
+  const values = [status];
+  if (await hasColumn("video", "claimed_at")) set.push("claimed_at = NULL");
+  if (await hasColumn("video", "result")) {
+    set.push("result = ?");
+    values.push(result === null ? null : JSON.stringify(result));
+  }
+  const [res] = await pool.execute(
+    `UPDATE video SET ${set.join(", ")} WHERE id = ? AND status = 'processing'`, [...values, id]
+  );
+  return res.affectedRows > 0;
+};
+
+// 분석 중인 워커의 임대 연장 (processing 인 영상만)
+// claimed_at 이 없으면 연장할 것 없이 processing 인지만 확인
+export const renewVideoLease = async (id) => {
+  if (!(await hasColumn("video", "claimed_at"))) {
+    const [rows] = await pool.execute(
+      `SELECT 1 FROM video WHERE id = ? AND status = 'processing' LIMIT 1`, [id]
+    );
+    return rows.length > 0;
+  }
+  const [res] = await pool.execute(
+    `UPDATE video SET claimed_at = NOW() WHERE id = ? AND status = 'processing'`, [id]
+  );
+  return res.affectedRows > 0;
+};
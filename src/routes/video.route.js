@@ -1,8 +1,9 @@
-import { Router } from "express";
-import { getNextVideoController, getVideoByIdController } from "../controllers/video.controller.js";
-
-const router = Router();
-router.get("/next", getNextVideoController);
-router.get("/:id", getVideoByIdController);
-
-export default router;
+import { Router } from "express";
+import { getNextVideoController, getVideoByIdController, postVideoResultController } from "../controllers/video.controller.js";
+
+const router = Router();
+router.get("/next", getNextVideoController);
+router.get("/:id", getVideoByIdController);
+router.post("/:id/result", postVideoResultController);
+
+export default router;
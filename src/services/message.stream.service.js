@@ -0,0 +1,46 @@
+// services/message.stream.service.js
+// 새 메시지 구독 (롱폴링 / SSE 공용)
+// - 저장 서비스가 notifyNewMessages() 를 부르면 대기 중인 구독자를 바로 깨움
+// - 깨어나면 커서(id) 이후만 조회 → 매번 전체 메시지를 읽어 정렬하지 않음
+// - 다른 프로세스가 DB에 직접 넣은 메시지도 놓치지 않도록 RECHECK_MS 마다 한 번씩 재조회
+import { EventEmitter } from 'node:events';
+import { findMessagesAfter, findLatestMessageId } from '../repositories/message.repository.js';
+
+const RECHECK_MS = 5000;
+
+const bus = new EventEmitter();
+bus.setMaxListeners(0); // 구독자 수만큼 리스너가 붙음
+
+// 메시지 저장 직후 호출
+export const notifyNewMessages = () => {
+  bus.emit('saved');
+};
+
+// 구독 시작 커서 (지금까지의 마지막 메시지 id)
+export const getLatestCursor = async () => {
+  return await findLatestMessageId();
+};
+
+// 저장 알림, 재조회 주기, 구독 취소 중 먼저 오는 것까지 대기
+const waitForSave = (ms, signal) => new Promise((resolve) => {
+  const done = () => {
+    clearTimeout(timer);
+    bus.off('saved', done);
+    signal?.removeEventListener('abort', done);
+    resolve();
+  };
+  const timer = setTimeout(done, Math.min(ms, RECHECK_MS));
+  bus.on('saved', done);
+  signal?.addEventListener('abort', done);
+});
+
+// since 이후 조건에 맞는 메시지가 생길 때까지 최대 timeoutMs 대기 → 메시지 배열 (시간 초과/취소 시 빈 배열)
+export const waitForMessages = async ({ since, modes = [], flags = [], timeoutMs = 25000, signal }) => {
+  const deadline = Date.now() + timeoutMs;
+  for (;;) {
+    const rows = await findMessagesAfter({ afterId: since, modes, flags });
+    const left = deadline - Date.now();
+    if (rows.length || left <= 0 || signal?.aborted) return rows;
+    await waitForSave(left, signal);
+  }
+};
@@ -1,5 +1,8 @@
-// services/video.service.js
-import { getNextQueuedRow, getVideoRowById } from "../repositories/video.repository.js";
-
-export const findNextQueuedVideo = () => getNextQueuedRow();
-export const findVideoById       = (id) => getVideoRowById(id);
+// services/video.service.js
+import { getNextQueuedRow, getVideoRowById, claimNextQueuedRow, updateVideoStatus, renewVideoLease } from "../repositories/video.repository.js";
+
+export const findNextQueuedVideo = () => getNextQueuedRow();
+export const findVideoById       = (id) => getVideoRowById(id);
+export const claimNextVideo      = () => claimNextQueuedRow();
+export const finishVideo         = (id, status, result) => updateVideoStatus(id, status, result);
+export const renewVideo          = (id) => renewVideoLease(id);